@@ -0,0 +1,160 @@
+"""Measure the encounter simulator, and check it against the rules.
+
+Simulates encounters of one, three and six enemies against a starting player
+with `simulate_encounter`, and the same fights one attack at a time with
+`rules.roll_initiative` and `rules.resolve_attack` as a reference, reporting
+the fights per second of both and how far their results are apart. Then
+balances a synthetic adventure of 3 acts of 2 chapters of 4 scenes, half of
+them encounters, some of them too hard, with `balance_adventure`.
+
+    python -m benchmarks.encounter_simulation [--fights 2000] [--reference-fights 1000]
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+import time
+
+from roleplaygent_agent import rules
+from roleplaygent_agent.simulation import MAX_ROUNDS, balance_adventure, simulate_encounter, start_health
+from roleplaygent_agent.types import Act, Adventure, Chapter, Enemy, Scene
+
+
+def enemy(name: str, health: int, strength: int, agility: int) -> Enemy:
+    return Enemy(
+        name=name,
+        health=health,
+        strength=strength,
+        agility=agility,
+        intelligence=1,
+        charisma=1,
+        endurance=2,
+    )
+
+
+ENCOUNTERS = {
+    "1 enemy": [enemy("Ogre", 60, 9, 1)],
+    "3 enemies": [enemy(f"Bandit {i}", 20, 7, 0) for i in range(3)],
+    "6 enemies": [enemy(f"Wolf {i}", 12, 8, 1) for i in range(6)],
+}
+
+
+def reference_fight(player, enemies, rng: random.Random) -> tuple[bool, bool, int, int]:
+    """A fight played with the rules, one attack at a time."""
+    health = start_health(player)
+    player = Enemy(name="Player", **player.model_dump(exclude={"health"}), health=health)
+    enemies = [e.model_copy(update={"health": start_health(e)}) for e in enemies]
+    by_name = {c.name: c for c in [player, *enemies]}
+    order = [by_name[r.name] for r in rules.roll_initiative([player, *enemies], rng)]
+    for round in range(1, MAX_ROUNDS + 1):
+        for actor in order:
+            if actor.health <= 0:
+                continue
+            if actor is player:
+                target = next(e for e in enemies if e.health > 0)
+            else:
+                target = player
+            rules.resolve_attack(actor, target, rng=rng)
+            if player.health <= 0 or all(e.health <= 0 for e in enemies):
+                won = player.health > 0
+                return won, False, round, health - max(player.health, 0)
+    return False, True, MAX_ROUNDS, health - max(player.health, 0)
+
+
+def reference(player, enemies, fights: int) -> dict:
+    rng = random.Random(0)
+    results = [reference_fight(player, enemies, rng) for _ in range(fights)]
+    return {
+        "win_probability": sum(r[0] for r in results) / fights,
+        "expected_rounds": sum(r[2] for r in results) / fights,
+        "expected_hp_loss": sum(r[3] for r in results) / fights,
+    }
+
+
+def make_adventure() -> Adventure:
+    scene_count = 0
+
+    def scene(index: int) -> Scene:
+        nonlocal scene_count
+        scene_count += 1
+        # Every encounter is different, from easy ones to a dragon
+        enemies = []
+        if index % 2:
+            enemies = [
+                enemy(f"Enemy {i}", 8 + 6 * scene_count, 5 + scene_count % 5, scene_count % 4)
+                for i in range(1 + scene_count % 4)
+            ]
+        return Scene(
+            title=f"Scene {scene_count}",
+            description="A scene",
+            goal="Survive",
+            characters=[],
+            encounter=bool(enemies),
+            enemies=enemies,
+            challenges=[] if enemies else ["Find the way"],
+        )
+
+    return Adventure(
+        title="Benchmark",
+        description="An adventure with many encounters",
+        characters=[],
+        acts=[
+            Act(
+                title=f"Act {act}",
+                description="An act",
+                chapters=[
+                    Chapter(
+                        title=f"Chapter {chapter}",
+                        description="A chapter",
+                        scenes=[scene(index) for index in range(4)],
+                    )
+                    for chapter in range(2)
+                ],
+            )
+            for act in range(3)
+        ],
+    )
+
+
+def main(fights: int, reference_fights: int) -> dict:
+    player = rules.STARTING_ATTRIBUTES
+    results = {"fights": fights, "reference_fights": reference_fights, "encounters": {}}
+    for name, enemies in ENCOUNTERS.items():
+        started = time.perf_counter()
+        stats = simulate_encounter(player, enemies, fights, seed=0)
+        seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        expected = reference(player, enemies, reference_fights)
+        reference_seconds = time.perf_counter() - started
+        results["encounters"][name] = {
+            "simulated": stats.model_dump(),
+            "reference": expected,
+            "win_probability_difference": round(
+                abs(stats.win_probability - expected["win_probability"]), 4
+            ),
+            "fights_per_second": round(fights / seconds),
+            "reference_fights_per_second": round(reference_fights / reference_seconds),
+        }
+
+    adventure = make_adventure()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        scores = balance_adventure(adventure, player, fights=fights)
+    results["adventure"] = {
+        "encounters": len(scores),
+        "rebalanced": sum(score.health_scale < 1 for score in scores),
+        "seconds": round(time.perf_counter() - started, 4),
+        "win_probabilities": [round(score.stats.win_probability, 3) for score in scores],
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fights", type=int, default=2000)
+    parser.add_argument("--reference-fights", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(main(args.fights, args.reference_fights), indent=2))
@@ -0,0 +1,75 @@
+"""Measure how long saving a large game blocks the event loop.
+
+Saves a game with many history and log entries once with the blocking
+`GameStore.save` and once with `GameStore.asave`, while a ticker task measures
+how late it is woken up. With `asave` the lag stays around the tick interval.
+
+    python -m benchmarks.event_loop_blocking [--entries 20000] [--backend filesystem]
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from roleplaygent_agent.storage import FileSystemGameStore, GameStore, SQLiteGameStore
+from tests.conftest import make_game
+
+TICK = 0.005
+
+
+async def measure(save) -> dict:
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 4)
+    started = time.perf_counter()
+    await save()
+    duration = time.perf_counter() - started
+    await asyncio.sleep(TICK * 4)
+    done = True
+    await task
+    return {"save_seconds": round(duration, 4), "max_loop_lag_seconds": round(max(lags), 4)}
+
+
+async def main(entries: int, backend: str) -> None:
+    with tempfile.TemporaryDirectory() as games_dir:
+        store: GameStore
+        if backend == "sqlite":
+            store = SQLiteGameStore(Path(games_dir) / "games.sqlite3")
+        else:
+            store = FileSystemGameStore(Path(games_dir))
+        game_state = make_game(entries)
+
+        async def blocking_save():
+            game_state._storage_cursor = None
+            store.save(game_state)
+
+        async def async_save():
+            game_state._storage_cursor = None
+            await store.asave(game_state)
+
+        results = {
+            "backend": backend,
+            "entries": entries,
+            "blocking": await measure(blocking_save),
+            "async": await measure(async_save),
+        }
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--backend", choices=["filesystem", "sqlite"], default="filesystem")
+    args = parser.parse_args()
+    asyncio.run(main(args.entries, args.backend))
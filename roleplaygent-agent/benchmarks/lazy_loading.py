@@ -0,0 +1,93 @@
+"""Measure loading and saving game states of growing size, lazily and eagerly.
+
+Saves synthetic games, see `tests.conftest.make_game`, with adventures of
+3 acts of 4 chapters of `scenes` scenes each and `entries` history and log
+entries each, then times, with the
+filesystem store in snapshot mode:
+
+- `eager`: the whole document parsed and validated and written back, as
+  before lazy loading: `json.load`, `GameState.model_validate`, touching the
+  player and `json.dumps(..., indent=2)`.
+- `tool`: `load`, touching the player and `save`, like a tool call that only
+  changes the player, which leaves the adventure, history and log unparsed.
+- `turn`: `load`, adding a history and a log entry and `save`, like a turn,
+  which parses the history and log but not the adventure.
+
+    python -m benchmarks.lazy_loading [--sizes 4:100,8:1000,16:5000] [--repeat 20]
+"""
+
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from roleplaygent_agent.storage import codec
+from roleplaygent_agent.storage.filesystem import FileSystemGameStore
+from roleplaygent_agent.storage.journal import snapshot_path
+from roleplaygent_agent.types import GameState
+from tests.conftest import make_game
+
+
+def eager(store: FileSystemGameStore) -> None:
+    path = snapshot_path(store.games_dir, "benchmark")
+    with open(path, "rb") as f:
+        # The file is in the current format until the first run rewrites it
+        game_state = GameState.model_validate(json.loads(codec.decode(f.read())[0]))
+    game_state.player.health -= 1
+    path.write_text(json.dumps(game_state.model_dump(), indent=2))
+
+
+def tool(store: FileSystemGameStore) -> None:
+    game_state = store.load("benchmark")
+    game_state.player.health -= 1
+    store.save(game_state)
+
+
+def turn(store: FileSystemGameStore) -> None:
+    game_state = store.load("benchmark")
+    game_state.add_log_entry("The player opened the gate")
+    game_state.add_history_entry("Open the gate", "The gate opens.")
+    store.save(game_state)
+
+
+def measure(scenes: int, entries: int, repeat: int) -> dict:
+    results: dict = {"scenes": 3 * 4 * scenes, "entries": entries}
+    for name, run in (("eager", eager), ("tool", tool), ("turn", turn)):
+        with tempfile.TemporaryDirectory() as games_dir:
+            store = FileSystemGameStore(Path(games_dir))
+            store.save(make_game(entries, scenes, game_id="benchmark"))
+            run(store)
+            results[f"{name}_bytes"] = snapshot_path(store.games_dir, "benchmark").stat().st_size
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run(store)
+                times.append(time.perf_counter() - start)
+            results[f"{name}_ms"] = round(statistics.median(times) * 1000, 3)
+    results["tool_speedup"] = round(results["eager_ms"] / results["tool_ms"], 1)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="4:100,8:1000,16:5000",
+        help="Comma separated sizes, scenes per chapter and entries, e.g. 4:100",
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [tuple(int(part) for part in size.split(":")) for size in args.sizes.split(",")]
+    # The stores log every load and save
+    with contextlib.redirect_stdout(sys.stderr):
+        results = [measure(scenes, entries, args.repeat) for scenes, entries in sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
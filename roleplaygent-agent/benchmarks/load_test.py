@@ -0,0 +1,393 @@
+"""Load test the API with simulated players.
+
+Runs `api.app` in process, with its lifespan, behind an httpx ASGI transport.
+Every player creates a game, waits for its creation job, and plays a number of
+turns, with a pause to think between them, streaming some of them, and now and
+then reloading the game and the list of games like the UI does. The agents
+answer from the offline model script (`MODEL_MODE=scripted`) with a simulated
+latency, so the load test runs without an OpenAI key and measures the server
+rather than the model.
+
+Reports as JSON: turns per second, the p50/p95/p99 latency per endpoint, the
+growth of the saved games per turn, the RSS of the process over time and the
+lag of the event loop.
+
+    python -m benchmarks.load_test [--players 20] [--turns 5] [--latency 0.5]
+        [--backend filesystem] [--output results.json]
+
+The settings are read from the environment when the app is imported, so
+STORAGE_MODE, CACHE_MODE, TURN_COALESCE_WINDOW and the others can be set as
+usual. GAMES_DIR is a new temporary directory unless --games-dir is given.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+TICK = 0.01
+
+PROMPTS = [
+    "I look around",
+    "I talk to the guard",
+    "I search the room for anything useful",
+    "I try to climb the wall",
+    "I ask about the crown",
+    "I follow the tracks into the fog",
+    "I attack",
+    "I rest for a moment and check my gear",
+    "What does the village look like?",
+    "Who lives here?",
+]
+
+CHARACTER = {
+    "name": "Aria",
+    "race": "Elf",
+    "class": "Ranger",
+    "description": "A calm ranger who grew up in the woods",
+}
+
+WORLD = {
+    "setting": "fantasy",
+    "matureThemes": False,
+    "description": "A kingdom lost in the fog",
+}
+
+
+def percentiles(values: list[float], scale: float = 1000, unit: str = "ms") -> dict:
+    """The count, mean, p50, p95, p99 and max of `values`, seconds in ms by default."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+        return round(ordered[index] * scale, 2)
+
+    return {
+        "count": len(ordered),
+        f"mean_{unit}": round(sum(ordered) / len(ordered) * scale, 2),
+        f"p50_{unit}": at(0.50),
+        f"p95_{unit}": at(0.95),
+        f"p99_{unit}": at(0.99),
+        f"max_{unit}": round(ordered[-1] * scale, 2),
+    }
+
+
+def rss_bytes() -> int:
+    """The resident set size of the process, its peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def storage_bytes(games_dir: Path) -> int:
+    """The size of everything saved in the games directory."""
+    return sum(path.stat().st_size for path in games_dir.rglob("*") if path.is_file())
+
+
+def game_bytes(games_dir: Path, game_id: str) -> Optional[int]:
+    """The size of the files of one game, None for the SQLite backend."""
+    paths = [games_dir / f"{game_id}.json", games_dir / f"{game_id}.journal.jsonl"]
+    if not any(path.exists() for path in paths):
+        return None
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, games_dir: Path, args: argparse.Namespace):
+        self.client = client
+        self.games_dir = games_dir
+        self.args = args
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.turns = 0
+        self.games_created = 0
+        self.turn_growth: list[int] = []
+        self.samples: list[dict] = []
+        self.lags: list[float] = []
+        self.started = time.perf_counter()
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Make a request, recording its latency under `endpoint`."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            print(f"[load_test] {endpoint} failed: {e}", file=sys.stderr)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return None
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return None
+        return response
+
+    async def stream(self, endpoint: str, url: str, **kwargs) -> bool:
+        """Stream a turn, recording the time to the first and the last event."""
+        started = time.perf_counter()
+        first = None
+        try:
+            async with self.client.stream("POST", url, **kwargs) as response:
+                if response.status_code >= 400:
+                    self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                    return False
+                async for line in response.aiter_lines():
+                    if first is None and line.startswith("event:"):
+                        first = time.perf_counter() - started
+                    if line == "event: error":
+                        self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                        return False
+        except Exception as e:
+            print(f"[load_test] {endpoint} failed: {e}", file=sys.stderr)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return False
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if first is not None:
+            self.latencies.setdefault(f"{endpoint} (first event)", []).append(first)
+        return True
+
+    async def create_game(self) -> Optional[str]:
+        response = await self.request(
+            "POST /api/games",
+            "POST",
+            "/api/games",
+            json={"character": CHARACTER, "world": WORLD},
+        )
+        if response is None:
+            return None
+        job_id = response.json()["job_id"]
+        started = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.args.poll_interval)
+            response = await self.request(
+                "GET /api/jobs/{job_id}", "GET", f"/api/jobs/{job_id}"
+            )
+            if response is None:
+                return None
+            job = response.json()
+            if job["status"] == "done":
+                self.latencies.setdefault("create game job", []).append(
+                    time.perf_counter() - started
+                )
+                self.games_created += 1
+                return job["game_id"]
+            if job["status"] == "failed":
+                self.errors["create game job"] = self.errors.get("create game job", 0) + 1
+                return None
+
+    async def play(self, player: int) -> None:
+        rng = random.Random(player)
+        await asyncio.sleep(rng.uniform(0, self.args.ramp_up))
+        game_id = await self.create_game()
+        if game_id is None:
+            return
+        await self.request("GET /api/games/{game_id}", "GET", f"/api/games/{game_id}")
+
+        size = game_bytes(self.games_dir, game_id)
+        for _ in range(self.args.turns):
+            await asyncio.sleep(rng.uniform(0, 2 * self.args.think_time))
+            body = {"message": rng.choice(PROMPTS)}
+            if rng.random() < self.args.stream_ratio:
+                played = await self.stream(
+                    "POST /api/games/{game_id}/agent/stream",
+                    f"/api/games/{game_id}/agent/stream",
+                    json=body,
+                )
+            else:
+                played = (
+                    await self.request(
+                        "POST /api/games/{game_id}/agent",
+                        "POST",
+                        f"/api/games/{game_id}/agent",
+                        json=body,
+                    )
+                    is not None
+                )
+            if not played:
+                continue
+            self.turns += 1
+
+            new_size = game_bytes(self.games_dir, game_id)
+            if size is not None and new_size is not None:
+                self.turn_growth.append(new_size - size)
+            size = new_size
+
+            if rng.random() < self.args.reload_ratio:
+                await self.request(
+                    "GET /api/games/{game_id}",
+                    "GET",
+                    f"/api/games/{game_id}",
+                    params={"fields": "history,log,current_scene,player", "limit": 20},
+                )
+                await self.request("GET /api/games", "GET", "/api/games")
+
+    async def ticker(self) -> None:
+        """Measure how late the event loop wakes up a sleeping task."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            self.lags.append(time.perf_counter() - started - TICK)
+
+    async def sampler(self) -> None:
+        """Sample the RSS, the saved games and the turns played over time."""
+        while True:
+            self.samples.append(
+                {
+                    "seconds": round(time.perf_counter() - self.started, 2),
+                    "rss_mb": round(rss_bytes() / 2**20, 1),
+                    "storage_bytes": storage_bytes(self.games_dir),
+                    "turns": self.turns,
+                }
+            )
+            await asyncio.sleep(self.args.sample_interval)
+
+    async def server_stats(self) -> dict:
+        stats = {}
+        for name in ("cache", "turns", "memory", "jobs", "routing"):
+            response = await self.request(f"GET /api/{name}", "GET", f"/api/{name}")
+            if response is not None:
+                stats[name] = response.json()
+        return stats
+
+    async def run(self) -> dict:
+        background = [
+            asyncio.create_task(self.ticker()),
+            asyncio.create_task(self.sampler()),
+        ]
+        self.started = time.perf_counter()
+        await asyncio.gather(*(self.play(player) for player in range(self.args.players)))
+        duration = time.perf_counter() - self.started
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        self.samples.append(
+            {
+                "seconds": round(duration, 2),
+                "rss_mb": round(rss_bytes() / 2**20, 1),
+                "storage_bytes": storage_bytes(self.games_dir),
+                "turns": self.turns,
+            }
+        )
+
+        lags = sorted(self.lags)
+        return {
+            "config": {
+                "players": self.args.players,
+                "turns_per_player": self.args.turns,
+                "think_time": self.args.think_time,
+                "stream_ratio": self.args.stream_ratio,
+                "model_latency": self.args.latency,
+                "model_latency_per_token": self.args.latency_per_token,
+                "backend": os.environ["STORAGE_BACKEND"],
+                "storage_mode": os.environ.get("STORAGE_MODE", "snapshot"),
+                "cache_mode": os.environ.get("CACHE_MODE", "write-through"),
+                "routing_mode": os.environ.get("ROUTING_MODE", "off"),
+            },
+            "duration_seconds": round(duration, 2),
+            "games_created": self.games_created,
+            "turns": self.turns,
+            "turns_per_second": round(self.turns / duration, 3) if duration else 0.0,
+            "errors": self.errors,
+            "latency": {
+                endpoint: percentiles(values)
+                for endpoint, values in sorted(self.latencies.items())
+            },
+            "save_growth": {
+                # Per game files of the filesystem backend, measured after each turn
+                "bytes_per_turn": percentiles(self.turn_growth, scale=1, unit="bytes"),
+                # Everything in the games directory, e.g. the SQLite database
+                "storage_bytes_total": self.samples[-1]["storage_bytes"],
+                "storage_bytes_per_game": (
+                    round(self.samples[-1]["storage_bytes"] / self.games_created)
+                    if self.games_created
+                    else None
+                ),
+            },
+            "rss_mb": {
+                "start": self.samples[0]["rss_mb"],
+                "end": self.samples[-1]["rss_mb"],
+                "max": max(sample["rss_mb"] for sample in self.samples),
+            },
+            "event_loop_lag": {
+                "tick_ms": TICK * 1000,
+                **percentiles(lags),
+            },
+            "samples": self.samples,
+            "server": await self.server_stats(),
+        }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    games_dir = Path(os.environ["GAMES_DIR"])
+    # Imported here, the settings are read from the environment on import
+    from roleplaygent_agent.api import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test", timeout=None
+        ) as client:
+            return await LoadTest(client, games_dir, args).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="turns per player")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="seconds the model takes to answer"
+    )
+    parser.add_argument(
+        "--latency-per-token", type=float, default=0.0, help="seconds per output token"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="mean seconds between turns"
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=5.0, help="seconds over which players join"
+    )
+    parser.add_argument("--stream-ratio", type=float, default=0.25)
+    parser.add_argument("--reload-ratio", type=float, default=0.2)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--backend", choices=["filesystem", "sqlite"], default="filesystem")
+    parser.add_argument("--model-mode", choices=["scripted", "replay"], default="scripted")
+    parser.add_argument("--games-dir", type=Path)
+    parser.add_argument("--output", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        games_dir = args.games_dir or Path(
+            stack.enter_context(tempfile.TemporaryDirectory(prefix="load-test-"))
+        )
+        os.environ["GAMES_DIR"] = str(games_dir)
+        os.environ.pop("SQLITE_PATH", None)
+        os.environ["STORAGE_BACKEND"] = args.backend
+        os.environ["MODEL_MODE"] = args.model_mode
+        os.environ["MODEL_LATENCY"] = str(args.latency)
+        os.environ["MODEL_LATENCY_PER_TOKEN"] = str(args.latency_per_token)
+        os.environ.setdefault("STORY_SUMMARIZER", "extractive")
+        os.environ["SENTRY_DSN"] = ""
+
+        # The app logs every request and tool call, keep stdout for the results
+        with contextlib.redirect_stdout(sys.stderr):
+            results = asyncio.run(main(args))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + "\n")
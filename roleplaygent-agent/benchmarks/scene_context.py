@@ -0,0 +1,130 @@
+"""Measure the model round trips and tokens of a turn of the game master.
+
+Runs a typical turn, a check, a log entry and the narration, with scripted
+models on a game with a long log, getting the story and scene context:
+
+- "separate": with a tool call each for `get_story`, `get_player_info`,
+  `get_next_challenge` and `get_current_goal`, one after another.
+- "batched": with `get_story` and `get_scene_context` in one model response.
+- "injected": from the instructions (SCENE_CONTEXT=instructions), no calls.
+
+Every model call is sent the instructions and the whole turn so far, the
+input tokens are estimated from their length.
+
+    python -m benchmarks.scene_context [--entries 200] [--turns 5] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import os
+import sys
+import time
+
+
+CHECK = {
+    "tool": "resolve_check",
+    "arguments": {"attribute": "charisma", "difficulty": "normal", "skill_bonus": 0, "die": 6},
+}
+LOG = {"tool": "add_log_entry", "arguments": {"message": "The player talked to the guard."}}
+NARRATION = {"text": "The guard shrugs and steps aside. The gate creaks open into the fog."}
+
+SCRIPTS = {
+    "separate": [
+        [{"tool": "get_story", "arguments": {}}],
+        [{"tool": "get_player_info", "arguments": {}}],
+        [{"tool": "get_next_challenge", "arguments": {}}],
+        [{"tool": "get_current_goal", "arguments": {}}],
+        [CHECK],
+        [LOG],
+        [NARRATION],
+    ],
+    "batched": [
+        [
+            {"tool": "get_story", "arguments": {}},
+            {"tool": "get_scene_context", "arguments": {}},
+        ],
+        [CHECK],
+        [LOG],
+        [NARRATION],
+    ],
+    "injected": [[CHECK], [LOG], [NARRATION]],
+}
+
+
+async def run_variant(variant: str, game_state, turns: int) -> dict:
+    from agents import Runner
+
+    from roleplaygent_agent.agents.game_master import get_agent, system_prompt
+    from roleplaygent_agent.models import ScriptedModel
+    from roleplaygent_agent.tools.game_state import get_current_goal
+
+    agent = get_agent()
+    game_master = agent.clone(
+        instructions=agent.instructions if variant == "injected" else system_prompt,
+        tools=[*agent.tools, get_current_goal],
+        model=ScriptedModel("Game Master", {"Game Master": SCRIPTS[variant]}),
+    )
+    calls, input_tokens, output_tokens, seconds = [], [], [], []
+    for _ in range(turns):
+        context = copy.deepcopy(game_state)
+        started = time.perf_counter()
+        result = await Runner.run(
+            game_master, input="I ask the guard to open the gate", context=context
+        )
+        seconds.append(time.perf_counter() - started)
+        calls.append(len(result.raw_responses))
+        input_tokens.append(result.context_wrapper.usage.input_tokens)
+        output_tokens.append(result.context_wrapper.usage.output_tokens)
+    return {
+        "model_calls": sum(calls) / turns,
+        "input_tokens": sum(input_tokens) / turns,
+        "output_tokens": sum(output_tokens) / turns,
+        "seconds": round(sum(seconds) / turns, 4),
+    }
+
+
+async def main(entries: int, turns: int) -> dict:
+    from agents import set_tracing_disabled
+
+    from tests.conftest import make_game
+
+    set_tracing_disabled(True)
+    game_state = make_game(entries, scenes=4, history=False, spread=True)
+    game_state.current_scene.characters = ["Guard"]
+    game_state.current_scene.challenges = ["Talk the guard into opening the gate"]
+
+    results = {"entries": entries, "turns": turns}
+    for variant in SCRIPTS:
+        results[variant] = await run_variant(variant, game_state, turns)
+    separate = results["separate"]
+    for variant in ("batched", "injected"):
+        variant_results = results[variant]
+        variant_results["model_calls_saved"] = (
+            separate["model_calls"] - variant_results["model_calls"]
+        )
+        variant_results["input_tokens_saved"] = round(
+            1 - variant_results["input_tokens"] / separate["input_tokens"], 3
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200, help="log entries of the game")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds the model takes to answer"
+    )
+    args = parser.parse_args()
+
+    # Read by the settings on import
+    os.environ["SCENE_CONTEXT"] = "instructions"
+    os.environ["MODEL_LATENCY"] = str(args.latency)
+
+    # The tools log every call, keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(main(args.entries, args.turns))
+    print(json.dumps(results, indent=2))
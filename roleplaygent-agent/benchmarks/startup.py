@@ -0,0 +1,150 @@
+"""Measure the cold start of the API.
+
+Starts a new Python process for every run, like a machine started from zero,
+which imports `api.app`, runs its lifespan behind an httpx ASGI transport and
+measures, in seconds since the process was spawned:
+
+- "import": importing the app.
+- "first_response": the first response, listing the games.
+- "ready": `GET /readyz` reporting ready, with the agents built.
+- "first_turn": the first turn on a game created before the run.
+
+The agents answer from the offline model script (`MODEL_MODE=scripted`), and
+Sentry is off unless --sentry is given. Reports the median and maximum of the
+runs as JSON, and exits with 1 if the median time to the first response is over
+--budget seconds, to fail a CI job on a regression.
+
+    python -m benchmarks.startup [--runs 5] [--warm-up background] [--budget 1.5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CHARACTER = {
+    "name": "Mira",
+    "race": "Human",
+    "class": "Ranger",
+    "description": "A quiet tracker from the northern woods.",
+}
+WORLD = {"setting": "fantasy", "matureThemes": False, "description": ""}
+MILESTONES = ("import", "first_response", "ready", "first_turn")
+
+
+async def create_game() -> str:
+    """Create the game of the runs, in a warm process."""
+    from roleplaygent_agent.agent import create_game_state
+
+    game_state = await create_game_state("Create a short adventure.", CHARACTER)
+    return game_state.id
+
+
+async def child(spawned: float, game_id: str) -> dict:
+    """A single cold start, run in its own process."""
+    import httpx
+
+    since_spawn = lambda: round(time.time() - spawned, 4)  # noqa: E731
+    from roleplaygent_agent.api import app
+
+    results = {"import": since_spawn()}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://startup", timeout=None
+        ) as client:
+            (await client.get("/api/games")).raise_for_status()
+            results["first_response"] = since_spawn()
+
+            turn = asyncio.create_task(
+                client.post(f"/api/games/{game_id}/agent", json={"message": "I look around"})
+            )
+            while (await client.get("/readyz")).status_code != 200:
+                await asyncio.sleep(0.01)
+            results["ready"] = since_spawn()
+            (await turn).raise_for_status()
+            results["first_turn"] = since_spawn()
+    return results
+
+
+def run(args: argparse.Namespace, game_id: str) -> dict:
+    spawned = time.time()
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", game_id, str(spawned)],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+    )
+    if process.returncode:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f"Startup run failed with exit code {process.returncode}")
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {
+        milestone: {
+            "median": round(statistics.median(run[milestone] for run in runs), 4),
+            "max": round(max(run[milestone] for run in runs), 4),
+        }
+        for milestone in MILESTONES
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", choices=["background", "eager"], default="background")
+    parser.add_argument("--sentry", action="store_true", help="keep SENTRY_DSN")
+    parser.add_argument(
+        "--budget", type=float, help="most seconds to the first response, as a median"
+    )
+    parser.add_argument("--output", type=Path, help="also write the results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("GAME_ID", "SPAWNED"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        game_id, spawned = args.child
+        # The app logs every request and tool call, keep stdout for the results
+        with contextlib.redirect_stdout(sys.stderr):
+            results = asyncio.run(child(float(spawned), game_id))
+        print(json.dumps(results))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory(prefix="startup-") as games_dir:
+        os.environ["GAMES_DIR"] = games_dir
+        os.environ["MODEL_MODE"] = "scripted"
+        os.environ.setdefault("STORY_SUMMARIZER", "extractive")
+        os.environ["STARTUP_WARM_UP"] = args.warm_up
+        if not args.sentry:
+            os.environ["SENTRY_DSN"] = ""
+
+        with contextlib.redirect_stdout(sys.stderr):
+            game_id = asyncio.run(create_game())
+        runs = [run(args, game_id) for _ in range(args.runs)]
+
+    results = {
+        "runs": args.runs,
+        "warm_up": args.warm_up,
+        "sentry": args.sentry,
+        "seconds": summarize(runs),
+        "samples": runs,
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + "\n")
+    first_response = results["seconds"]["first_response"]["median"]
+    if args.budget is not None and first_response > args.budget:
+        print(
+            f"[startup] First response after {first_response:.2f}s, over the budget of {args.budget:.2f}s",
+            file=sys.stderr,
+        )
+        sys.exit(1)
@@ -0,0 +1,124 @@
+"""Measure the snapshot format: bytes on disk and load and save times.
+
+Writes small, medium and very large synthetic games, see
+`tests.conftest.make_game`, as snapshots of the older indented format
+(`legacy`: `json.dumps(..., indent=2)`, `json.load` and
+`GameState.model_validate`) and of the current format without compression,
+with gzip and with zstd if the zstandard package is installed, and reports
+for each:
+
+- `bytes`: the size of the snapshot file.
+- `save_us`: writing the snapshot of a fully parsed game state.
+- `load_us`: loading it, trusted by its checksum, so the adventure, history
+  and log are left unparsed.
+- `load_parsed_us`: loading it and parsing the adventure, history and log.
+- `load_validated_us`: loading it validated whole, as after a checksum mismatch.
+
+    python -m benchmarks.storage_codec [--sizes small=2:10,medium=8:500,large=16:10000] [--repeat 10]
+"""
+
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from roleplaygent_agent.storage import codec, journal
+from roleplaygent_agent.storage.base import write_atomic
+from roleplaygent_agent.types import GameState
+from tests.conftest import make_game
+
+
+def median_us(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1e6, 1)
+
+
+def measure_legacy(games_dir: Path, game_state: GameState, repeat: int) -> dict:
+    path = journal.snapshot_path(games_dir, game_state.id)
+
+    def save():
+        write_atomic(path, json.dumps(game_state.model_dump(), indent=2).encode())
+
+    def load():
+        with open(path, "rb") as f:
+            return GameState.model_validate(json.load(f))
+
+    save_us = median_us(save, repeat)
+    load_us = median_us(load, repeat)
+    return {
+        "bytes": path.stat().st_size,
+        "save_us": save_us,
+        "load_us": load_us,
+        "load_parsed_us": load_us,
+        "load_validated_us": load_us,
+    }
+
+
+def measure_codec(games_dir: Path, game_state: GameState, compression: str, repeat: int) -> dict:
+    path = journal.snapshot_path(games_dir, game_state.id)
+
+    def load_parsed():
+        loaded = journal.load_game_state(games_dir, game_state.id)
+        loaded.load_fields()
+
+    def load_validated():
+        with open(path, "rb") as f:
+            GameState.model_validate_json(codec.decode(f.read())[0])
+
+    save_us = median_us(
+        lambda: journal.write_snapshot(games_dir, game_state, compression=compression), repeat
+    )
+    return {
+        "bytes": path.stat().st_size,
+        "save_us": save_us,
+        "load_us": median_us(lambda: journal.load_game_state(games_dir, game_state.id), repeat),
+        "load_parsed_us": median_us(load_parsed, repeat),
+        "load_validated_us": median_us(load_validated, repeat),
+    }
+
+
+def measure(name: str, scenes: int, entries: int, repeat: int) -> dict:
+    game_state = make_game(entries, scenes)
+    results: dict = {"size": name, "scenes": 3 * 4 * scenes, "entries": entries}
+    compressions = [c for c in codec.COMPRESSIONS if c != "zstd" or codec.zstandard is not None]
+    with tempfile.TemporaryDirectory() as games_dir:
+        results["legacy"] = measure_legacy(Path(games_dir), game_state, repeat)
+    for compression in compressions:
+        with tempfile.TemporaryDirectory() as games_dir:
+            results[compression] = measure_codec(Path(games_dir), game_state, compression, repeat)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="small=2:10,medium=8:500,large=16:10000",
+        help="Comma separated sizes, a name and scenes per chapter and entries, e.g. small=2:10",
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    sizes = []
+    for size in args.sizes.split(","):
+        name, _, counts = size.partition("=")
+        scenes, entries = (int(count) for count in counts.split(":"))
+        sizes.append((name, scenes, entries))
+    # The storage logs every load and save
+    with contextlib.redirect_stdout(sys.stderr):
+        results = [measure(name, scenes, entries, args.repeat) for name, scenes, entries in sizes]
+    if codec.zstandard is None:
+        print("zstandard is not installed, skipping zstd", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
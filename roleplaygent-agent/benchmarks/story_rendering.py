@@ -0,0 +1,102 @@
+"""Measure rendering the story of a game with a long log.
+
+Renders a synthetic game, with its log spread over all scenes up to the last
+one, with `collect_story_history` scanning the whole log for every scene (as it
+did before the log index), with `collect_story_history` reading the log index,
+and with the story memory of `get_story`, also after every added log entry.
+
+    python -m benchmarks.story_rendering [--entries 10000] [--scenes 4] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+
+from roleplaygent_agent.memory import StoryMemory
+from roleplaygent_agent.types import GameState
+from roleplaygent_agent.utils import collect_story_history
+from tests.conftest import make_game
+
+
+def scanning_story_history(game_state: GameState) -> str:
+    """`collect_story_history` as it was, scanning the whole log for every scene."""
+    story = ["This is the story of the adventure so far:"]
+    story.append(f"# {game_state.adventure.title}\n")
+    story.append(f"{game_state.adventure.description}\n")
+    story.append(f"## Player: {game_state.player.name}\n")
+    story.append(f"{game_state.player.description}\n")
+    for act_idx, act in enumerate(game_state.adventure.acts):
+        if act_idx > game_state.current_scene.act:
+            break
+        story.append(f"\n## Act {act_idx + 1}: {act.title}\n")
+        story.append(f"{act.description}\n")
+        for chapter_idx, chapter in enumerate(act.chapters):
+            if (
+                act_idx == game_state.current_scene.act
+                and chapter_idx > game_state.current_scene.chapter
+            ):
+                break
+            story.append(f"\n### Chapter {chapter_idx + 1}: {chapter.title}\n")
+            story.append(f"{chapter.description}\n")
+            for scene_idx, scene in enumerate(chapter.scenes):
+                if (
+                    act_idx == game_state.current_scene.act
+                    and chapter_idx == game_state.current_scene.chapter
+                    and scene_idx > game_state.current_scene.scene
+                ):
+                    break
+                story.append(f"\n#### Scene {scene_idx + 1}: {scene.title}\n")
+                story.append(f"{scene.description}\n")
+                scene_logs = [
+                    log
+                    for log in game_state.log
+                    if (
+                        log.act == act_idx
+                        and log.chapter == chapter_idx
+                        and log.scene == scene_idx
+                    )
+                ]
+                if scene_logs:
+                    story.append("\n**Scene Events:**\n")
+                    for log in scene_logs:
+                        story.append(f"- {log.message}\n")
+    return "\n".join(story)
+
+
+def timed(func, repeat: int) -> float:
+    """The mean milliseconds of a call of `func`."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def main(entries: int, scenes: int, repeat: int) -> None:
+    game_state = make_game(entries, scenes, history=False, spread=True)
+    assert scanning_story_history(game_state) == collect_story_history(
+        make_game(entries, scenes, history=False, spread=True)
+    )
+
+    def add_and_render():
+        game_state.add_log_entry("The player waited")
+        memory.render(game_state)
+
+    memory = StoryMemory(summarizer="extractive")
+    results = {
+        "entries": entries,
+        "scenes": 3 * 4 * scenes,
+        "scanning_ms": timed(lambda: scanning_story_history(game_state), repeat),
+        "indexed_ms": timed(lambda: collect_story_history(game_state), repeat),
+        "story_memory_ms": timed(lambda: memory.render(game_state), repeat),
+        "story_memory_after_new_entry_ms": timed(add_and_render, repeat),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--scenes", type=int, default=4, help="scenes per chapter")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.entries, args.scenes, args.repeat)
@@ -1,28 +1,200 @@
+import asyncio
 from agents import Runner
-from typing import Optional, List
+from agents.stream_events import StreamEvent
+from typing import AsyncIterator, Callable, Optional, List
 
-from .agents.game_master import agent as game_master_agent
-from .agents.adventure_generator import agent as adventure_generator_agent
-from .agents.player_creator import agent as player_creator_agent
-from .utils import load_game, save_game
-from .types import GameState, Player
+from .agents.adventure_generator import get_agent as get_adventure_generator_agent
+from .memory import get_story_memory
+from .metrics import TurnRecorder, record_turn
+from .routing import get_turn_router
+from .rules import STARTING_ATTRIBUTES
+from .simulation import balance_adventure
+from .storage.base import run_io
+from .storage.codec import dump_snapshot
+from .tools.middleware import tool_cache
+from .turns import get_turn_queue
+from .utils import aload_game, asave_game
+from .types import Adventure, GameState, Player
+from . import settings
 
 
 async def run_agent(game_id: str, prompt: str) -> Optional[str]:
-    game_state = load_game(game_id)
-    if not game_state:
-        return None
-    result = await Runner.run(game_master_agent, input=prompt, context=game_state)
+    """Run a turn of the game master, after the turns already queued for the game."""
+    return await get_turn_queue().submit(
+        game_id, prompt, lambda prompt: _run_turn(game_id, prompt)
+    )
+
+
+async def _run_turn(game_id: str, prompt: str) -> Optional[str]:
+    with record_turn() as turn, tool_cache():
+        with turn.phase("load"):
+            game_state = await aload_game(game_id)
+        if not game_state:
+            turn.status = "not_found"
+            return None
+        router = get_turn_router()
+        tier = router.route(prompt)
+        with turn.phase("agent"):
+            result = await Runner.run(router.agent(tier), input=prompt, context=game_state)
+        router.record(tier, result, turn.phases["agent"])
+        get_story_memory().record_turn(result.context_wrapper.usage.input_tokens)
+
+        await _save_turn(game_state, prompt, result.final_output, turn)
+
+        return result.final_output
+
+
+async def _save_turn(
+    game_state: GameState, prompt: str, response: str, turn: TurnRecorder
+) -> None:
+    """Add the history entry of a turn, with its metrics, and save the game state."""
+    game_state.add_history_entry(prompt, response, metrics=turn.metrics())
+    turn.state_bytes = await run_io(lambda: len(dump_snapshot(game_state)))
+    game_state.history[-1].metrics.state_bytes = turn.state_bytes
+    with turn.phase("save"):
+        await asave_game(game_state)
+
+
+# An event of a streamed turn: its name and its data
+TurnEvent = tuple[str, dict]
+
+# How much of a tool output is sent with a `tool_end` event
+TOOL_OUTPUT_PREVIEW = 500
+
+
+async def stream_agent(game_id: str, prompt: str) -> AsyncIterator[TurnEvent]:
+    """Run a turn of the game master and yield its events while it runs.
 
-    game_state.add_history_entry(prompt, result.final_output)
+    Yields `token` events with the narration as it is generated, `tool_start`
+    and `tool_end` events around tool calls, `agent` events on handoffs and
+    finally a `done` event with the response and the new version of the game
+    state, or an `error` event.
 
-    save_game(game_state)
+    The turn runs in its own task, so that closing the iterator (e.g. because
+    the client went away) cancels the turn but still lets it persist the game
+    state. It is persisted exactly once, when the turn completes or is
+    cancelled.
+    """
+    events: asyncio.Queue[Optional[TurnEvent]] = asyncio.Queue()
+    turn = asyncio.create_task(_stream_turn(game_id, prompt, events.put_nowait))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        if not turn.done():
+            turn.cancel()
 
-    return result.final_output
+
+async def _stream_turn(
+    game_id: str, prompt: str, emit: Callable[[Optional[TurnEvent]], None]
+) -> None:
+    try:
+        async with get_turn_queue().exclusive(game_id):
+            with record_turn() as turn, tool_cache():
+                with turn.phase("load"):
+                    game_state = await aload_game(game_id)
+                if not game_state:
+                    turn.status = "not_found"
+                    emit(("error", {"detail": "Game not found"}))
+                    return
+
+                router = get_turn_router()
+                tier = router.route(prompt)
+                result = Runner.run_streamed(
+                    router.agent(tier), input=prompt, context=game_state
+                )
+                narration: list[str] = []
+                tool_names: dict[str, str] = {}
+                try:
+                    with turn.phase("agent"):
+                        async for event in result.stream_events():
+                            turn_event = _turn_event(event, tool_names)
+                            if turn_event is None:
+                                continue
+                            if turn_event[0] == "token":
+                                narration.append(turn_event[1]["text"])
+                            emit(turn_event)
+                except asyncio.CancelledError:
+                    print(f"[stream_agent] Turn of game {game_id} cancelled")
+                    result.cancel()
+                    await _save_turn(game_state, prompt, "".join(narration), turn)
+                    raise
+
+                router.record(tier, result, turn.phases["agent"])
+                get_story_memory().record_turn(result.context_wrapper.usage.input_tokens)
+                await _save_turn(game_state, prompt, result.final_output, turn)
+                emit(
+                    (
+                        "done",
+                        {"response": result.final_output, "version": game_state.version},
+                    )
+                )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"[stream_agent] Error in turn of game {game_id}: {e}")
+        emit(("error", {"detail": str(e)}))
+    finally:
+        emit(None)
+
+
+def _turn_event(event: StreamEvent, tool_names: dict[str, str]) -> Optional[TurnEvent]:
+    if event.type == "raw_response_event":
+        if event.data.type == "response.output_text.delta":
+            return ("token", {"text": event.data.delta})
+    elif event.type == "agent_updated_stream_event":
+        return ("agent", {"name": event.new_agent.name})
+    elif event.name == "tool_called":
+        raw_item = event.item.raw_item
+        call_id = getattr(raw_item, "call_id", None) or getattr(raw_item, "id", "")
+        name = getattr(raw_item, "name", raw_item.type)
+        tool_names[call_id] = name
+        return (
+            "tool_start",
+            {
+                "call_id": call_id,
+                "name": name,
+                "arguments": getattr(raw_item, "arguments", None),
+            },
+        )
+    elif event.name == "tool_output":
+        raw_item = event.item.raw_item
+        call_id = (
+            raw_item.get("call_id", "")
+            if isinstance(raw_item, dict)
+            else getattr(raw_item, "call_id", "")
+        )
+        return (
+            "tool_end",
+            {
+                "call_id": call_id,
+                "name": tool_names.get(call_id),
+                "output": str(event.item.output)[:TOOL_OUTPUT_PREVIEW],
+            },
+        )
+    return None
 
 
 async def run_create_game_agent(prompt: str, character: dict) -> Optional[tuple[GameState, str]]:
-    adventure = (await Runner.run(adventure_generator_agent, input=prompt)).final_output
+    game_state = await create_game_state(prompt, character)
+    initial = await run_agent(game_state.id, OPENING_PROMPT)
+    return game_state, initial
+
+
+# The prompt of the first turn of a new game
+OPENING_PROMPT = "Start the story"
+
+
+async def create_game_state(
+    prompt: str, character: dict, adventure: Optional[Adventure] = None
+) -> GameState:
+    """Save a new game, without starting the story.
+
+    Its adventure is generated from the prompt, unless one is given, e.g. from
+    the adventure pool, and its encounters are balanced against the player.
+    """
+    if adventure is None:
+        adventure = (await Runner.run(get_adventure_generator_agent(), input=prompt)).final_output
 
     player = Player(
         name=character.get("name", ""),
@@ -31,15 +203,19 @@ async def run_create_game_agent(prompt: str, character: dict) -> Optional[tuple[
         personality=character.get("personality", ""),
         backstory=character.get("backstory", ""),
         goals=character.get("goals", ""),
-        health=100,
-        strength=5,
-        agility=5,
-        intelligence=5,
-        charisma=5,
-        endurance=5,
+        **STARTING_ATTRIBUTES.model_dump(),
         inventory=[],
     )
+    if settings.ENCOUNTER_BALANCE != "off":
+        await asyncio.to_thread(
+            balance_adventure,
+            adventure,
+            player,
+            rebalance=settings.ENCOUNTER_BALANCE == "rebalance",
+            min_win_probability=settings.ENCOUNTER_MIN_WIN_PROBABILITY,
+            fights=settings.ENCOUNTER_SIMULATION_FIGHTS,
+            verbose=settings.ENCOUNTER_LOG == "on",
+        )
     game_state = GameState(adventure=adventure, player=player)
-    save_game(game_state)
-    initial  = await run_agent(game_state.id, "Start the story")
-    return game_state, initial
+    await asave_game(game_state)
+    return game_state
@@ -1,6 +1,9 @@
+import functools
+
 from agents import Agent
 
 from ..types import Adventure
+from ..models import get_model
 
 
 system_prompt = """
@@ -19,9 +22,13 @@ The JSON format should be as follows:
 
 """
 
-agent = Agent(
-    name="Story Generator",
-    instructions=system_prompt,
-    output_type=Adventure,
-    model="gpt-4o-mini"
-)
+
+@functools.cache
+def get_agent() -> Agent:
+    """The adventure generator agent, built on first use."""
+    return Agent(
+        name="Story Generator",
+        instructions=system_prompt,
+        output_type=Adventure,
+        model=get_model("Story Generator", "gpt-4o-mini")
+    )
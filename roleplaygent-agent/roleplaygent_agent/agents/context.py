@@ -0,0 +1,48 @@
+from typing import Callable
+
+from agents import Agent, RunContextWrapper
+
+from ..memory import get_story_memory
+from ..types import GameState
+from .. import settings, utils
+
+
+context_prompt = """
+The story so far and the context of the current scene are given below. They are updated on every step of the turn, so they always show the current game state. Do not call `get_story`, `get_scene_context`, `get_player_info` or `get_next_challenge` to get them.
+
+Current scene context, as JSON:
+{scene_context}
+
+{story}
+"""
+
+
+def read_story(hint: str) -> str:
+    """A hint of the instructions to read the story with `get_story` first.
+
+    Left out unless SCENE_CONTEXT is "tools", as the story is in the instructions.
+    """
+    return hint if settings.SCENE_CONTEXT == "tools" else ""
+
+
+def with_scene_context(
+    system_prompt: str,
+) -> str | Callable[[RunContextWrapper[GameState], Agent[GameState]], str]:
+    """The instructions of an agent, with the story and scene context of the turn added.
+
+    Saves the model round trips to the tools getting them, unless SCENE_CONTEXT
+    is "tools".
+    """
+    if settings.SCENE_CONTEXT == "tools":
+        return system_prompt
+    if settings.SCENE_CONTEXT != "instructions":
+        raise ValueError(f"Unknown scene context mode: {settings.SCENE_CONTEXT}")
+
+    def instructions(wrapper: RunContextWrapper[GameState], agent: Agent[GameState]) -> str:
+        game_state = wrapper.context
+        return system_prompt + context_prompt.format(
+            scene_context=utils.dump_scene_context(game_state),
+            story=get_story_memory().render(game_state),
+        )
+
+    return instructions
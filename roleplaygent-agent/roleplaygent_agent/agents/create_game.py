@@ -1,21 +1,29 @@
-from agents import Agent
-
-from .adventure_generator import agent as adventure_generator_agent
+import functools
 
-from ..tools.create_game import create_game
+from agents import Agent
 
-agent = Agent(
-    name="Create Game",
+from ..models import get_model
 
-    instructions="""
+system_prompt = """
     You are an export role playing game designer. 
     You have a tool to generate a story for the players to play in. Use it to create the planned story arc for this adventure.
     Use the output of that story and persist it by using the `create_game` tool.
     Respond only with the identifier of the created game.
-    """,
-    tools=[
-        adventure_generator_agent.as_tool(None, None),
-        create_game,
-    ],
-    model="gpt-4o-mini",
-)
+    """
+
+
+@functools.cache
+def get_agent() -> Agent:
+    """The create game agent, built on first use."""
+    from .adventure_generator import get_agent as get_adventure_generator_agent
+    from ..tools.create_game import create_game
+
+    return Agent(
+        name="Create Game",
+        instructions=system_prompt,
+        tools=[
+            get_adventure_generator_agent().as_tool(None, None),
+            create_game,
+        ],
+        model=get_model("Create Game", "gpt-4o-mini"),
+    )
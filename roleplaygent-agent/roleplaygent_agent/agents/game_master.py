@@ -1,20 +1,11 @@
-from agents import Agent, handoff
+import functools
 
+from agents import Agent, handoff
 
-from ..tools.game_state import (
-    add_log_entry,
-    close_scene,
-    get_story,
-    get_next_challenge,
-    close_next_challenge,
-    get_player_info
-)
-from ..tools.dice import roll_dice
 from ..types import GameState
+from ..models import get_model
 
-from .rules_engine import agent as rules_engine_agent
-from .create_game import agent as create_game_agent
-from .story_manager import agent as story_manager_agent
+from .context import read_story, with_scene_context
 
 
 system_prompt = """
@@ -29,24 +20,29 @@ You control the game world and all non-player characters.
 Do not hallucinate, only use information from the story.
 
 Your responsibilities:
-- If the player wants to know about the rules of the game, handoff to the `rules_engine_agent`.
+- If the player wants to know about the rules of the game, handoff to the `rules_engine_agent`. Do not ask it to resolve checks or attacks, use the rules tools for that.
 - Describe the world and events in words. Do not use markdown or other formatting. 
 - When running a scene, the player should only be provided with the information obtained from the current log and the scenes description and the characters within. They should not be able to read the planned adventure. Do not share information about places, characters and events that the players have not discovered.
 - The log is the main source of truth for the game world and overrides what is planned in the adventure.
 - Interpret player actions. Apply the rules of the game to the player's actions.
 - In the current scene, the player has to overcome challenges. Use the `get_next_challenge` tool to get the next challenge.
-- The player can try to overcome a challenge with an action. Use `get_player_info` to get the player description and his attribute values. Retrieve the rules on how to make checks and roll dice using the `rules_engine_agent`. Apply the rules to make a check using the players attributes and use dice rolls via the `roll_dice` tool. When the player has passed the check, use the `close_next_challenge` tool to close the challenge and continue the story. If the check failed, report this to the player.
+- The player can try to overcome a challenge with an action. Pick the attribute that fits the action and the difficulty of the challenge, and make the check with the `resolve_check` tool. When the player has passed the check, use the `close_next_challenge` tool to close the challenge and continue the story. If the check failed, report this to the player.
+- When a fight starts, use the `roll_initiative` tool to get the order in which the player and the enemies act. Resolve every attack, of the player and of the enemies, with the `resolve_attack` tool. It already deals the damage, an enemy with no health left is defeated.
 - When a player has overcome a challenge, use the `close_next_challenge` tool to close it.
 - The player should not be allowed to leave the place of the current scene. He should be warned against actions that prevent him from continuing the adventure.
 - Only when all enemies in the scene are defeated and all challenges are closed,  use the `close_scene` tool to close the scene.
 
 Tools available:
-- `rules_engine`: Use this to evaluate rules, dice rolls, skill checks, and combat.
+- `resolve_check`: Use this to make a check of the player's attribute against a difficulty (easy, normal, hard or very hard).
+- `roll_initiative`: Use this at the start of a fight to get the order of the participants.
+- `resolve_attack`: Use this to resolve an attack of the player or an enemy and deal its damage.
+- `roll_dice`: Use this for any other roll, with a dice expression like `2d6+STR`, `4d6kh3` or `d20 adv`.
 - `add_log_entry`: Every time the player takes an action, use this tool to add a log entry to the current scene: the players action and what it effects it did have on the world.
 - `close_scene`: Use this to close the current scene, when the player has completed the goals for the scene.
-- `rules_engine_agent`: Use this agent to evaluate rules, dice rolls, skill checks, and combat.
-- `get_story`: Always use this tool to get the up to the current point from the loaded game state, including scene descriptions and log entries.
+- `rules_engine_agent`: Use this agent to answer questions about the rules of the game.
+- `get_story`: Use this tool to get the story up to the current point from the loaded game state, including scene descriptions and log entries.{read_story}
 - `get_next_challenge`: Use this tool to get the next challenge for the current scene. This is the next challenge that the player has to overcome.
+- `get_scene_context`: Use this tool to get the current scene, its goal and next challenge, the characters and enemies in it and the player sheet with a single call, instead of calling the tools for each of them.
 - `close_next_challenge`: When a player has overcome a challenge, use this tool to close it.
 - `get_player_info`: Use this tool to get the player description, his attributes.
 
@@ -60,29 +56,53 @@ If the player character is killed or the goals are otherwise not possible to mee
 """
 
 
-agent = Agent[GameState](
-    name="Game Master",
-    instructions=system_prompt,
-    tools=[
-        rules_engine_agent.as_tool(None, None),
-        story_manager_agent.as_tool(None, None),
+@functools.cache
+def get_agent() -> Agent[GameState]:
+    """The game master agent, built on first use."""
+    from ..tools.game_state import (
         add_log_entry,
         close_scene,
         get_story,
         get_next_challenge,
         close_next_challenge,
-        roll_dice,
         get_player_info,
-    ],
-    handoffs=[
-        # handoff(
-        #     create_game_agent,
-        #     on_handoff=lambda ctx: print("Handoff to create game agent"),
-        # ),
-        handoff(
-            rules_engine_agent,
-            on_handoff=lambda ctx: print("Handoff to rules engine agent"),
+        get_scene_context,
+    )
+    from ..tools.dice import roll_dice
+    from ..tools.rules import resolve_check, roll_initiative, resolve_attack
+    from .rules_engine import get_agent as get_rules_engine_agent
+    from .story_manager import get_agent as get_story_manager_agent
+
+    rules_engine_agent = get_rules_engine_agent()
+    return Agent[GameState](
+        name="Game Master",
+        instructions=with_scene_context(
+            system_prompt.format(read_story=read_story(" Always know it before answering."))
         ),
-    ],
-    model="gpt-4",
-)
+        tools=[
+            rules_engine_agent.as_tool(None, None),
+            get_story_manager_agent().as_tool(None, None),
+            add_log_entry,
+            close_scene,
+            get_story,
+            get_next_challenge,
+            close_next_challenge,
+            roll_dice,
+            get_player_info,
+            get_scene_context,
+            resolve_check,
+            roll_initiative,
+            resolve_attack,
+        ],
+        handoffs=[
+            # handoff(
+            #     create_game_agent,
+            #     on_handoff=lambda ctx: print("Handoff to create game agent"),
+            # ),
+            handoff(
+                rules_engine_agent,
+                on_handoff=lambda ctx: print("Handoff to rules engine agent"),
+            ),
+        ],
+        model=get_model("Game Master", "gpt-4"),
+    )
@@ -0,0 +1,64 @@
+import functools
+
+from agents import Agent, handoff
+
+from ..types import GameState
+from ..models import get_model
+from .. import settings
+
+from .context import read_story, with_scene_context
+
+
+system_prompt = """
+You are the narrator of a roleplaying game. You answer the player's questions about the game world, the characters in it and the player character, while the game master runs the game.
+
+You can not change the game: you can not make checks, fights, log entries or close challenges and scenes.
+
+Your responsibilities:
+{read_story}- Answer questions about what the player sees, hears and knows, e.g. what a place or a character looks like, from the story and the description of the current scene.
+- Only share what the player has discovered. Do not share information about places, characters and events of the planned adventure that the player has not discovered.
+- Do not hallucinate, only use information from the story.
+- Describe the world in words. Do not use markdown or other formatting.
+
+If the player does anything, e.g. moves, attacks, talks to a character, uses an item or tries to overcome a challenge, or if answering needs a check, escalate to the game master with the `escalate` tool right away, without answering yourself.
+
+Tools available:
+- `get_story`: Get the story up to the current point, including the current scene and its events.
+- `get_player_info`: Get the player description and attributes.
+- `get_next_challenge`: Get the next challenge of the current scene.
+- `get_scene_context`: Get the current scene, its goal and next challenge, the characters and enemies in it and the player sheet at once.
+- `escalate`: Hand the turn to the game master.
+"""
+
+
+@functools.cache
+def get_agent() -> Agent[GameState]:
+    """The narrator agent, built on first use."""
+    from ..tools.game_state import (
+        get_story,
+        get_next_challenge,
+        get_player_info,
+        get_scene_context,
+    )
+    from .game_master import get_agent as get_game_master_agent
+
+    return Agent[GameState](
+        name="Narrator",
+        instructions=with_scene_context(
+            system_prompt.format(
+                read_story=read_story(
+                    "- Always know the story up to the current point before answering, from the `get_story` tool.\n"
+                )
+            )
+        ),
+        tools=[get_story, get_player_info, get_next_challenge, get_scene_context],
+        handoffs=[
+            handoff(
+                get_game_master_agent(),
+                tool_name_override="escalate",
+                tool_description_override="Hand the turn to the game master, when the player does anything that changes the game.",
+                on_handoff=lambda ctx: print("[Narrator] Escalating turn to the game master"),
+            ),
+        ],
+        model=get_model("Narrator", settings.ROUTING_FAST_MODEL),
+    )
@@ -1,6 +1,9 @@
+import functools
+
 from agents import Agent
 
 from ..types import Player
+from ..models import get_model
 
 
 system_prompt = """
@@ -9,9 +12,13 @@ You are a player creator for a roleplaying game. You are responsible for creatin
 Create a player from the given input.
 """
 
-agent = Agent(
-    name="Player Creator",
-    instructions=system_prompt,
-    output_type=Player,
-    model="gpt-4o-mini"
-)
+
+@functools.cache
+def get_agent() -> Agent:
+    """The player creator agent, built on first use."""
+    return Agent(
+        name="Player Creator",
+        instructions=system_prompt,
+        output_type=Player,
+        model=get_model("Player Creator", "gpt-4o-mini")
+    )
@@ -1,9 +1,15 @@
+import functools
+
 from agents import Agent
 
+from ..models import get_model
+
 system_prompt = """
 
 You are the rule book for a lightweight, narrative-driven tabletop roleplaying game. When queried, you will provide the rules of the game.
 
+You only explain the rules. Checks, initiative and attacks are resolved by the game master's rules tools, do not resolve them yourself.
+
 Use the following simple rule system to structure gameplay:
 
 ---
@@ -56,8 +62,13 @@ Spells use INT, cost MP, and resolve with a skill check.
 
 """
 
-agent = Agent(
-    name="Rules Engine",
-    instructions=system_prompt,
-    tools=[],
-)
+
+@functools.cache
+def get_agent() -> Agent:
+    """The rules engine agent, built on first use."""
+    return Agent(
+        name="Rules Engine",
+        instructions=system_prompt,
+        tools=[],
+        model=get_model("Rules Engine"),
+    )
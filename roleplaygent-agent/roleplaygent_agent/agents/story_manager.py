@@ -1,7 +1,9 @@
+import functools
+
 from agents import Agent
 
 from ..types import GameState
-from ..tools.game_state import get_story
+from ..models import get_model
 
 system_prompt = """
 You are a story manager for a roleplaying game. You are responsible for managing the story of the game.
@@ -18,9 +20,15 @@ The story is the actual story that has happened so far.
 The current scene is the current scene the players are in.
 """
 
-agent = Agent[GameState](
-    name="Story Manager",
-    instructions=system_prompt,
-    model="gpt-4o-mini",
-    tools=[get_story]
-)
\ No newline at end of file
+
+@functools.cache
+def get_agent() -> Agent[GameState]:
+    """The story manager agent, built on first use."""
+    from ..tools.game_state import get_story
+
+    return Agent[GameState](
+        name="Story Manager",
+        instructions=system_prompt,
+        model=get_model("Story Manager", "gpt-4o-mini"),
+        tools=[get_story]
+    )
@@ -0,0 +1,29 @@
+import functools
+
+from agents import Agent
+
+from ..models import get_model
+
+system_prompt = """
+You summarize the story of a roleplaying game for the game master, who uses the summary to remember what happened.
+
+You are given the title and description of a scene or chapter as it was planned, and what actually happened in it.
+
+Write a short summary of what actually happened, in the past tense, in at most five sentences:
+- Keep the names of characters, places and items, and the decisions and promises of the player.
+- Keep what the player learned and what changed in the world, it may be important later.
+- Leave out descriptions of the surroundings and how things were said.
+- Do not add anything that did not happen.
+
+Only answer with the summary, without a heading or any formatting.
+"""
+
+
+@functools.cache
+def get_agent() -> Agent:
+    """The story summarizer agent, built on first use."""
+    return Agent(
+        name="Story Summarizer",
+        instructions=system_prompt,
+        model=get_model("Story Summarizer", "gpt-4o-mini"),
+    )
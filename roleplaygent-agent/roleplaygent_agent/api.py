@@ -1,36 +1,44 @@
-from fastapi import FastAPI, Request, HTTPException
+import asyncio
+import hashlib
+import json
+from contextlib import aclosing, asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Request, HTTPException, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from .agent import run_agent, run_create_game_agent
-from .utils import list_running_games, load_game
-from .agents.game_master import agent as game_master_agent
-
-import sentry_sdk
-from sentry_sdk.integrations.openai_agents import OpenAIAgentsIntegration
-
-
-sentry_sdk.init(
-    dsn="https://f144027da57c2fcfedd83ce4443bb57b@o4509089275772928.ingest.de.sentry.io/4509427898777680",
-    # Add data like request headers and IP for users,
-    # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
-    send_default_pii=True,
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for tracing.
-    traces_sample_rate=1.0,
-    # Set profile_session_sample_rate to 1.0 to profile 100%
-    # of profile sessions.
-    profile_session_sample_rate=1.0,
-    # Set profile_lifecycle to "trace" to automatically
-    # run the profiler on when there is an active transaction
-    profile_lifecycle="trace",
-    integrations=[
-        OpenAIAgentsIntegration(),
-    ],
-)
+from . import settings
+from .utils import alist_running_games, aload_entries_page, aload_game, project_game_state
+from .storage import get_cache
+from .storage.base import run_io
+from .metrics import get_metrics
+from .startup import get_warm_up
+from .turns import get_turn_queue
 
+# The agents, and the jobs, pool, memory and routing running them, are imported
+# by the endpoints once the API is warm, see startup.py.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache = get_cache()
+    flusher = asyncio.create_task(cache.run_flusher())
+    warm_up = get_warm_up()
+    warm_up.start()
+    if settings.STARTUP_WARM_UP == "eager":
+        await warm_up.wait()
+    try:
+        yield
+    finally:
+        await warm_up.close()
+        flusher.cancel()
+        await cache.aflush()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow calls from your Next.js frontend
 app.add_middleware(
@@ -43,7 +51,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
 class PromptRequest(BaseModel):
@@ -55,8 +65,9 @@ class CreateGameRequest(BaseModel):
     world: dict
 
 
-@app.post("/api/games")
+@app.post("/api/games", status_code=202)
 async def create_game(req: CreateGameRequest):
+    """Queue a job creating a game, poll it at `GET /api/jobs/{job_id}`."""
     print(req)
     try:
         # Create a prompt for the game master agent
@@ -76,9 +87,11 @@ World:
 
 Please create an engaging adventure that fits these parameters."""
 
-        # Call the game master agent to create the game
-        game_state, initial = await run_create_game_agent(prompt, req.character)
-        return {"id": game_state.id, "initial": initial}
+        await get_warm_up().wait()
+        from .jobs import get_create_game_jobs
+
+        job = await get_create_game_jobs().submit(prompt, req.character, req.world)
+        return {"job_id": job.id, "status": job.status}
     except Exception as e:
         import traceback
 
@@ -89,20 +102,136 @@ Please create an engaging adventure that fits these parameters."""
 @app.get("/api/games")
 async def get_running_games():
     try:
-        games = list_running_games()
+        games = await alist_running_games()
         return games
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/cache")
+async def get_cache_stats():
+    return get_cache().info()
+
+
+@app.get("/api/memory")
+async def get_memory_stats():
+    await get_warm_up().wait()
+    from .memory import get_story_memory
+
+    return get_story_memory().info()
+
+
+@app.get("/readyz")
+async def get_readiness():
+    """Whether the API is warm, with the agents built, see startup.py."""
+    warm_up = get_warm_up()
+    return JSONResponse(warm_up.info(), status_code=200 if warm_up.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """The metrics of the turns, models and tools in the Prometheus text format."""
+    return PlainTextResponse(
+        get_metrics().render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/routing")
+async def get_routing_stats():
+    await get_warm_up().wait()
+    from .routing import get_turn_router
+
+    return get_turn_router().info()
+
+
+@app.get("/api/pool")
+async def get_pool_stats():
+    await get_warm_up().wait()
+    from .pool import get_adventure_pool
+
+    return get_adventure_pool().info()
+
+
+@app.get("/api/jobs")
+async def get_job_stats():
+    await get_warm_up().wait()
+    from .jobs import get_create_game_jobs
+
+    return get_create_game_jobs().info()
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the stage of a game creation job, and the game id once it is done."""
+    await get_warm_up().wait()
+    from .jobs import get_create_game_jobs
+
+    job = await get_create_game_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.model_dump(exclude={"prompt", "character", "world"})
+
+
+@app.get("/api/turns")
+async def get_turn_stats():
+    return get_turn_queue().info()
+
+
 @app.get("/api/games/{game_id}")
-async def get_game(game_id: str):
+async def get_game(
+    game_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    history_before: Optional[str] = None,
+    log_before: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Get a game state.
+
+    `fields` selects a comma separated list of top level fields. With
+    `history_before`, `log_before` or `limit` only a page of the history and log
+    is returned, see `project_game_state`. Responses carry an ETag, and a
+    request with a matching `If-None-Match` header gets a 304.
+    """
     print(f"Loading game {game_id}")
     try:
-        game = load_game(game_id)
+        game = await aload_game(game_id)
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
-        return game
+
+        query = hashlib.sha1(str(request.query_params).encode()).hexdigest()[:12]
+        etag = f'W/"{game.id}-{game.version}-{query}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        selected = fields.split(",") if fields else None
+        pages = {}
+        paginated = history_before is not None or log_before is not None or limit is not None
+        if paginated and get_cache().store.supports_paging:
+            # Pages of the history and log are read by the store, without the rest
+            for name, before in (("history", history_before), ("log", log_before)):
+                if selected is None or name in selected:
+                    page = await aload_entries_page(game_id, name, before, limit)
+                    if page is not None:
+                        pages[name] = page
+
+        try:
+            data = await run_io(
+                project_game_state,
+                game,
+                fields=selected,
+                history_before=history_before,
+                log_before=log_before,
+                limit=limit,
+                pages=pages,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return JSONResponse(data, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -111,9 +240,49 @@ async def get_game(game_id: str):
 async def agent_endpoint(game_id: str, prompt: PromptRequest):
     """Run the agent with the given message and game state context."""
     try:
+        await get_warm_up().wait()
+        from .agent import run_agent
+
         response = await run_agent(game_id, prompt=prompt.message)
         if response is None:
             raise HTTPException(status_code=404, detail="Game not found")
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/games/{game_id}/agent/stream")
+async def agent_stream_endpoint(game_id: str, prompt: PromptRequest):
+    """Run the agent with the given message and stream the turn as server-sent events."""
+    await get_warm_up().wait()
+    from .agent import stream_agent
+
+    async def events():
+        async for name, data in stream_agent(game_id, prompt.message):
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/api/games/{game_id}/agent/ws")
+async def agent_websocket_endpoint(websocket: WebSocket, game_id: str):
+    """Run the agent for every `{"message": ...}` received and send the turn events."""
+    await websocket.accept()
+    await get_warm_up().wait()
+    from .agent import stream_agent
+
+    try:
+        while True:
+            prompt = PromptRequest.model_validate(await websocket.receive_json())
+            # Leaving the events early, when the client went away, cancels the
+            # turn, which still saves the game state
+            async with aclosing(stream_agent(game_id, prompt.message)) as events:
+                async for name, data in events:
+                    await websocket.send_json({"event": name, "data": data})
+    except (WebSocketDisconnect, RuntimeError) as e:
+        # Sending to a closed WebSocket raises a RuntimeError
+        print(f"[agent_websocket_endpoint] Client of game {game_id} went away: {e!r}")
@@ -0,0 +1,284 @@
+"""Dice expressions and the dice of a game.
+
+An expression is a sum of dice, numbers and attributes, e.g. `2d6+STR` or
+`4d6kh3`:
+
+- `NdS`: N dice of S sides, `d20` is `1d20` and `d%` is `1d100`.
+- `NdSkhK`, `NdSklK`: keep the K highest or lowest dice, `NdSkK` is `NdSkhK`.
+- `NdS!`: exploding dice, a die rolling its highest side is rolled again and
+  added, at most EXPLODE_LIMIT times.
+- `NdS adv`, `NdS dis`: advantage and disadvantage, the dice are rolled twice
+  and the higher or lower total is kept.
+- `STR`, `AGI`, `INT`, `CHA`, `END` or the full names: an attribute of the
+  character rolling.
+
+`compile_expression` parses an expression once into a `DiceExpression`, which
+rolls it with a NumPy generator, drawing the dice of many rolls in one call.
+
+Every game has its own dice: `game_dice` draws from a generator seeded with
+the dice seed of the game and the number of the turn, so that replaying the
+turns of a recorded game rolls the same dice, and records every roll of the
+turn compactly, e.g. `2d6+STR:3,5=13` or `d6:4`, for its history entry.
+Dropped dice are marked with `~`, e.g. `4d6kh3:6,4,3,~1=13`.
+"""
+
+import functools
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .types import Attributes, GameState
+
+
+# How often a die can explode, and the most dice and sides of a term
+EXPLODE_LIMIT = 10
+MAX_DICE = 100
+MAX_SIDES = 1000
+
+ATTRIBUTE_NAMES = {
+    "str": "strength",
+    "agi": "agility",
+    "int": "intelligence",
+    "cha": "charisma",
+    "end": "endurance",
+}
+
+_TERM = re.compile(
+    r"""
+    \s*(?P<sign>[+-])?\s*
+    (?:
+        (?P<count>\d*)d(?P<sides>\d+|%)
+        (?:k(?P<keep>[hl]?)(?P<keep_count>\d+))?
+        (?P<explode>!)?
+        (?:\s*(?P<advantage>adv|dis)\b)?
+      | (?P<number>\d+)
+      | (?P<attribute>[a-z]+)
+    )\s*
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+class DiceRoll(BaseModel):
+    expression: str = Field(description="The expression rolled")
+    dice: list[int] = Field(description="The dice kept, after exploding")
+    dropped: list[int] = Field(description="The dice rolled but not kept", default_factory=list)
+    modifier: int = Field(description="The numbers and attributes added to the dice")
+    total: int = Field(description="The dice kept plus the modifier")
+
+    def compact(self) -> str:
+        dice = [str(die) for die in self.dice] + [f"~{die}" for die in self.dropped]
+        return f"{self.expression}:{','.join(dice)}={self.total}"
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    """Dice of an expression, added with `sign`."""
+
+    sign: int
+    count: int
+    sides: int
+    # The dice kept, the highest if positive, the lowest if negative, all if 0
+    keep: int = 0
+    explode: bool = False
+    # 1 for advantage, -1 for disadvantage
+    advantage: int = 0
+
+    def roll(self, rng: np.random.Generator, size: int) -> tuple[np.ndarray, np.ndarray]:
+        """The dice of `size` rolls and which of them are kept, shaped (size, count)."""
+        dice = self._dice(rng, size)
+        kept = self._kept(dice)
+        if self.advantage:
+            other = self._dice(rng, size)
+            other_kept = self._kept(other)
+            difference = (other * other_kept).sum(axis=1) - (dice * kept).sum(axis=1)
+            take_other = (difference * self.advantage > 0)[:, None]
+            dice = np.where(take_other, other, dice)
+            kept = np.where(take_other, other_kept, kept)
+        return dice, kept
+
+    def totals(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """The totals of the dice kept of `size` rolls, drawn like `roll`."""
+        totals = self._totals(self._dice(rng, size))
+        if self.advantage:
+            other = self._totals(self._dice(rng, size))
+            totals = np.maximum(totals, other) if self.advantage > 0 else np.minimum(totals, other)
+        return totals
+
+    def _totals(self, dice: np.ndarray) -> np.ndarray:
+        if not self.keep:
+            return dice.sum(axis=1)
+        dice = np.sort(dice, axis=1)
+        return (dice[:, -self.keep :] if self.keep > 0 else dice[:, : -self.keep]).sum(axis=1)
+
+    def _dice(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        dice = rng.integers(1, self.sides + 1, size=(size, self.count), dtype=np.int64)
+        if not self.explode:
+            return dice
+        # Only the dice that exploded in the last draw are rolled again
+        flat = dice.reshape(-1)
+        exploding = np.flatnonzero(flat == self.sides)
+        for _ in range(EXPLODE_LIMIT):
+            if not len(exploding):
+                break
+            rolled = rng.integers(1, self.sides + 1, size=len(exploding), dtype=np.int64)
+            flat[exploding] += rolled
+            exploding = exploding[rolled == self.sides]
+        return dice
+
+    def _kept(self, dice: np.ndarray) -> np.ndarray:
+        if not self.keep:
+            return np.ones(dice.shape, dtype=bool)
+        order = np.argsort(dice, axis=1, kind="stable")
+        indices = order[:, -self.keep :] if self.keep > 0 else order[:, : -self.keep]
+        kept = np.zeros(dice.shape, dtype=bool)
+        np.put_along_axis(kept, indices, True, axis=1)
+        return kept
+
+
+@dataclass(frozen=True)
+class DiceExpression:
+    """A compiled dice expression, see the module docstring."""
+
+    text: str
+    terms: tuple[DiceTerm, ...]
+    constant: int
+    # The attributes added, with their sign
+    attributes: tuple[tuple[int, str], ...]
+
+    def modifier(self, character: Optional[Attributes] = None) -> int:
+        if self.attributes and character is None:
+            raise ValueError(f"{self.text!r} needs the attributes of a character")
+        return self.constant + sum(
+            sign * getattr(character, attribute) for sign, attribute in self.attributes
+        )
+
+    def roll_batch(
+        self, rng: np.random.Generator, size: int, character: Optional[Attributes] = None
+    ) -> np.ndarray:
+        """The totals of `size` rolls."""
+        totals = np.full(size, self.modifier(character), dtype=np.int64)
+        for term in self.terms:
+            totals += term.sign * term.totals(rng, size)
+        return totals
+
+    def rolls(
+        self, rng: np.random.Generator, size: int, character: Optional[Attributes] = None
+    ) -> list[DiceRoll]:
+        """`size` rolls with their dice."""
+        modifier = self.modifier(character)
+        rolled = [term.roll(rng, size) for term in self.terms]
+        results = []
+        for row in range(size):
+            dice, dropped, total = [], [], modifier
+            for term, (term_dice, kept) in zip(self.terms, rolled):
+                dice += term_dice[row][kept[row]].tolist()
+                dropped += term_dice[row][~kept[row]].tolist()
+                total += term.sign * int(term_dice[row][kept[row]].sum())
+            results.append(
+                DiceRoll(
+                    expression=self.text,
+                    dice=dice,
+                    dropped=dropped,
+                    modifier=modifier,
+                    total=total,
+                )
+            )
+        return results
+
+    def roll(self, rng: np.random.Generator, character: Optional[Attributes] = None) -> DiceRoll:
+        return self.rolls(rng, 1, character)[0]
+
+
+def _attribute(name: str) -> str:
+    key = name.lower()
+    key = ATTRIBUTE_NAMES.get(key, key)
+    if key not in ATTRIBUTE_NAMES.values():
+        raise ValueError(
+            f"Unknown attribute {name!r}, expected one of "
+            f"{', '.join(name.upper() for name in ATTRIBUTE_NAMES)}"
+        )
+    return key
+
+
+def _dice_term(sign: int, match: re.Match) -> DiceTerm:
+    count = int(match["count"] or 1)
+    sides = 100 if match["sides"] == "%" else int(match["sides"])
+    if not 1 <= count <= MAX_DICE:
+        raise ValueError(f"A term rolls 1 to {MAX_DICE} dice, not {count}")
+    if not 2 <= sides <= MAX_SIDES:
+        raise ValueError(f"Dice have 2 to {MAX_SIDES} sides, not {sides}")
+    keep = 0
+    if match["keep_count"] is not None:
+        keep = int(match["keep_count"])
+        if not 1 <= keep <= count:
+            raise ValueError(f"Can only keep 1 to {count} of {count} dice, not {keep}")
+        if match["keep"].lower() == "l":
+            keep = -keep
+    advantage = {"adv": 1, "dis": -1}.get((match["advantage"] or "").lower(), 0)
+    return DiceTerm(sign, count, sides, keep, bool(match["explode"]), advantage)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression: str) -> DiceExpression:
+    """Parse a dice expression, see the module docstring."""
+    text = " ".join(expression.split())
+    terms, attributes, constant = [], [], 0
+    position = 0
+    while position < len(text):
+        match = _TERM.match(text, position)
+        if match is None or match.end() == position or (position and not match["sign"]):
+            raise ValueError(f"Invalid dice expression {expression!r} at {text[position:]!r}")
+        position = match.end()
+        sign = -1 if match["sign"] == "-" else 1
+        if match["sides"] is not None:
+            terms.append(_dice_term(sign, match))
+        elif match["number"] is not None:
+            constant += sign * int(match["number"])
+        else:
+            attributes.append((sign, _attribute(match["attribute"])))
+    if not terms:
+        raise ValueError(f"Invalid dice expression {expression!r}, it rolls no dice")
+    return DiceExpression(text, tuple(terms), constant, tuple(attributes))
+
+
+def dice_seed(game_state: GameState) -> int:
+    """The seed of the dice of a game, by default derived from its id."""
+    if game_state.dice_seed is not None:
+        return game_state.dice_seed
+    return int.from_bytes(hashlib.sha256(game_state.id.encode()).digest()[:8]) >> 1
+
+
+class GameDice:
+    """The dice of a turn of a game, see the module docstring."""
+
+    def __init__(self, seed: int, turn: int):
+        self.turn = turn
+        self.generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence([seed, turn])))
+        self.rolls: list[str] = []
+
+    def randint(self, low: int, high: int) -> int:
+        """Roll a die like `random.Random.randint`, for the rules."""
+        value = int(self.generator.integers(low, high + 1))
+        self.rolls.append(f"d{high}:{value}" if low == 1 else f"{low}-{high}:{value}")
+        return value
+
+    def roll(
+        self, expression: str, character: Optional[Attributes] = None, times: int = 1
+    ) -> list[DiceRoll]:
+        results = compile_expression(expression).rolls(self.generator, times, character)
+        self.rolls += [result.compact() for result in results]
+        return results
+
+
+def game_dice(game_state: GameState) -> GameDice:
+    """The dice of the current turn of a game."""
+    turn = game_state.history_length()
+    dice = game_state._dice
+    if dice is None or dice.turn != turn:
+        dice = game_state._dice = GameDice(dice_seed(game_state), turn)
+    return dice
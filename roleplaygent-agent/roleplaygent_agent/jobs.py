@@ -0,0 +1,194 @@
+"""Background jobs creating new games.
+
+Creating a game generates an adventure and then runs the opening turn of the
+game master, which takes longer than a request should. A job runs both in the
+background and records its stage, "queued" → "generating_adventure" →
+"opening_scene" → "done" (or "failed"), in `<games_dir>/jobs/<id>.json`.
+
+At most `workers` jobs run at the same time. Jobs that were not finished when
+the process stopped are resumed on startup from the stage they were in, a job
+whose game was already saved only runs the opening turn.
+"""
+
+import asyncio
+import functools
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Literal, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel, Field
+
+from . import settings
+from .agent import OPENING_PROMPT, create_game_state, run_agent
+from .pool import get_adventure_pool
+from .storage.base import run_io
+from .storage.journal import write_atomic
+from .utils import aload_game
+
+
+JobStatus = Literal[
+    "queued", "generating_adventure", "opening_scene", "done", "failed"
+]
+
+
+class CreateGameJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()), description="The id of the job")
+    status: JobStatus = Field(default="queued", description="The stage of the job")
+    prompt: str = Field(description="The prompt for the adventure generator")
+    character: dict = Field(description="The character of the player")
+    world: Optional[dict] = Field(
+        default=None, description="The world settings, to take an adventure from the pool"
+    )
+    pooled: bool = Field(
+        default=False, description="Whether the adventure was taken from the pool"
+    )
+    game_id: Optional[str] = Field(
+        default=None, description="The id of the game, once its adventure is saved"
+    )
+    initial: Optional[str] = Field(
+        default=None, description="The response of the opening turn"
+    )
+    error: Optional[str] = Field(default=None, description="Why the job failed")
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+def jobs_dir(games_dir: Path) -> Path:
+    return games_dir / "jobs"
+
+
+class CreateGameJobs:
+    """Runs game creation jobs in the background, `workers` at a time."""
+
+    def __init__(self, games_dir: Path, workers: int = 2):
+        self.dir = jobs_dir(games_dir)
+        self.workers = workers
+        self._jobs: dict[str, CreateGameJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._running = 0
+
+    def _save(self, job: CreateGameJob) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.dir / f"{job.id}.json", job.model_dump_json(indent=2).encode())
+
+    def _load(self, job_id: str) -> Optional[CreateGameJob]:
+        job_file = self.dir / f"{job_id}.json"
+        if not job_file.exists():
+            return None
+        with open(job_file, "r") as f:
+            return CreateGameJob.model_validate(json.load(f))
+
+    def _load_unfinished(self) -> list[CreateGameJob]:
+        if not self.dir.exists():
+            return []
+        jobs = []
+        for job_file in self.dir.glob("*.json"):
+            try:
+                with open(job_file, "r") as f:
+                    job = CreateGameJob.model_validate(json.load(f))
+            except Exception as e:
+                print(f"[CreateGameJobs] Skipping broken job file {job_file}: {e}")
+                continue
+            if not job.finished:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    async def _update(self, job: CreateGameJob, **changes) -> None:
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = datetime.now().isoformat()
+        await run_io(self._save, job.model_copy())
+
+    def _start(self, job: CreateGameJob) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(
+        self, prompt: str, character: dict, world: Optional[dict] = None
+    ) -> CreateGameJob:
+        """Queue a job creating a game and return it right away."""
+        job = CreateGameJob(prompt=prompt, character=character, world=world)
+        await run_io(self._save, job)
+        self._start(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[CreateGameJob]:
+        """Get a job, also one that finished before the last restart."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return await run_io(self._load, job_id)
+
+    async def resume(self) -> int:
+        """Queue the jobs that were not finished when the process stopped."""
+        jobs = await run_io(self._load_unfinished)
+        for job in jobs:
+            if job.id not in self._jobs:
+                print(f"[CreateGameJobs] Resuming job {job.id} from {job.status}")
+                self._start(job)
+        return len(jobs)
+
+    async def _run(self, job: CreateGameJob) -> None:
+        async with self._semaphore:
+            self._running += 1
+            try:
+                if job.game_id is None:
+                    await self._update(job, status="generating_adventure")
+                    adventure = await get_adventure_pool().take(job.world or {})
+                    game_state = await create_game_state(
+                        job.prompt, job.character, adventure=adventure
+                    )
+                    await self._update(
+                        job, game_id=game_state.id, pooled=adventure is not None
+                    )
+
+                await self._update(job, status="opening_scene")
+                game_state = await aload_game(job.game_id)
+                if game_state is None:
+                    raise ValueError(f"Game {job.game_id} not found")
+                if game_state.history:
+                    # The opening turn finished before the job could record it
+                    initial = game_state.history[0].result
+                else:
+                    initial = await run_agent(job.game_id, OPENING_PROMPT)
+                await self._update(job, status="done", initial=initial)
+            except asyncio.CancelledError:
+                # Left in its stage on disk, to be resumed after a restart
+                raise
+            except Exception as e:
+                print(f"[CreateGameJobs] Job {job.id} failed: {e}")
+                await self._update(job, status="failed", error=str(e))
+            finally:
+                self._running -= 1
+                if job.finished:
+                    # Served from disk from now on
+                    self._jobs.pop(job.id, None)
+
+    async def close(self) -> None:
+        """Stop the running jobs, they are resumed on the next start."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def info(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "waiting": len(self._jobs) - self._running,
+        }
+
+
+@functools.cache
+def get_create_game_jobs() -> CreateGameJobs:
+    return CreateGameJobs(settings.GAMES_DIR, workers=settings.CREATE_GAME_WORKERS)
@@ -0,0 +1,339 @@
+"""The story memory of the game master.
+
+Rather than the whole log, the game master is given the summaries of the
+closed scenes and chapters and the most recent log entries of the current
+scene, within a token budget. A summary is written once, when its scene is
+closed, and stored with the game state. Scenes closed without one, e.g. of
+games older than the story memory, are shortened from their log instead, which
+counts as a summary miss.
+
+Token counts are estimated from the length of the text.
+"""
+
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from agents import Runner
+
+from . import settings
+from .agents.summarizer import get_agent as get_summarizer_agent
+from .types import GameState, StorySummary
+
+
+CHARS_PER_TOKEN = 4
+
+# Length of summaries made by shortening the log
+SHORTENED_SUMMARY_CHARS = 600
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def shorten(text: str, max_chars: int = SHORTENED_SUMMARY_CHARS) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars - 3].rsplit(" ", 1)[0] + "..."
+
+
+@dataclass
+class MemoryStats:
+    renders: int = 0
+    story_tokens_total: int = 0
+    story_tokens_max: int = 0
+    story_tokens_last: int = 0
+    summary_hits: int = 0
+    summary_misses: int = 0
+    summaries_written: int = 0
+    summarizer_errors: int = 0
+    turns: int = 0
+    prompt_tokens_total: int = 0
+    prompt_tokens_max: int = 0
+    prompt_tokens_last: int = 0
+
+
+class StoryMemory:
+    """Renders the story of a game within a token budget and writes its summaries."""
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        recent_entries: int = 20,
+        summarizer: str = "agent",
+        max_shortened: int = 1024,
+    ):
+        if summarizer not in ("agent", "extractive"):
+            raise ValueError(f"Unknown story summarizer: {summarizer}")
+        self.token_budget = token_budget
+        self.recent_entries = recent_entries
+        self.summarizer = summarizer
+        self.max_shortened = max_shortened
+        self.stats = MemoryStats()
+        # Summaries of scenes without one, shortened from their log
+        self._shortened: OrderedDict[tuple, str] = OrderedDict()
+
+    def render(self, game_state: GameState) -> str:
+        """The story so far, newest parts first within the token budget."""
+        adventure = game_state.adventure
+        current = game_state.current_scene
+        act = adventure.acts[current.act]
+        chapter = act.chapters[current.chapter]
+        scene = chapter.scenes[current.scene]
+
+        header = [
+            "This is the story of the adventure so far:",
+            f"# {adventure.title}\n",
+            f"{adventure.description}\n",
+            f"## Player: {game_state.player.name}\n",
+            f"{game_state.player.description}\n",
+        ]
+        current_block = [
+            f"\n## Current scene: Act {current.act + 1}: {act.title}, "
+            f"Chapter {current.chapter + 1}: {chapter.title}, "
+            f"Scene {current.scene + 1}: {scene.title}\n",
+            f"{scene.description}\n",
+        ]
+        budget = self.token_budget - sum(
+            estimate_tokens(line) for line in header + current_block
+        )
+
+        events = self._current_events(game_state)
+        recent: list[str] = []
+        for message in reversed(events[-self.recent_entries :] if self.recent_entries > 0 else []):
+            line = f"- {message}\n"
+            if estimate_tokens(line) > budget:
+                break
+            budget -= estimate_tokens(line)
+            recent.append(line)
+        recent.reverse()
+
+        past: list[str] = []
+        units = self._past_units(game_state)
+        for heading, summary_key in reversed(units):
+            text = self._summary_text(game_state, summary_key)
+            block = f"\n### {heading}\n{text}\n"
+            if estimate_tokens(block) > budget:
+                break
+            budget -= estimate_tokens(block)
+            past.append(block)
+        past.reverse()
+
+        story = list(header)
+        if units:
+            story.append("\n## Story so far\n")
+            if len(past) < len(units):
+                story.append("(Earlier parts of the story are left out.)\n")
+            story.extend(past)
+        story.extend(current_block)
+        if recent:
+            story.append("\n**Scene Events:**\n")
+            if len(recent) < len(events):
+                story.append(
+                    f"({len(events) - len(recent)} earlier events of this scene are left out.)\n"
+                )
+            story.extend(recent)
+
+        rendered = "\n".join(story)
+        tokens = estimate_tokens(rendered)
+        self.stats.renders += 1
+        self.stats.story_tokens_total += tokens
+        self.stats.story_tokens_max = max(self.stats.story_tokens_max, tokens)
+        self.stats.story_tokens_last = tokens
+        if len(past) < len(units) or len(recent) < len(events):
+            print(
+                f"[StoryMemory] Shortened story of game {game_state.id} to {tokens} tokens "
+                f"of {self.token_budget}: {len(past)}/{len(units)} summaries, "
+                f"{len(recent)}/{len(events)} events"
+            )
+        return rendered
+
+    def _current_events(self, game_state: GameState) -> list[str]:
+        current = game_state.current_scene
+        return [
+            entry.message
+            for entry in game_state.scene_log(current.act, current.chapter, current.scene)
+        ]
+
+    def _past_units(self, game_state: GameState) -> list[tuple[str, tuple]]:
+        """The headings and summary keys of the closed chapters and scenes, oldest first.
+
+        Closed chapters with a summary are one unit, others one unit per scene.
+        """
+        current = game_state.current_scene
+        chapters = {
+            (summary.act, summary.chapter)
+            for summary in game_state.summaries
+            if summary.level == "chapter"
+        }
+        units = []
+        for act_idx, act in enumerate(game_state.adventure.acts[: current.act + 1]):
+            for chapter_idx, chapter in enumerate(act.chapters):
+                is_current = (act_idx, chapter_idx) == (current.act, current.chapter)
+                if not is_current and (act_idx, chapter_idx) in chapters:
+                    units.append(
+                        (
+                            f"Act {act_idx + 1}, Chapter {chapter_idx + 1}: {chapter.title}",
+                            ("chapter", act_idx, chapter_idx),
+                        )
+                    )
+                    continue
+                for scene_idx, scene in enumerate(chapter.scenes):
+                    if is_current and scene_idx >= current.scene:
+                        break
+                    units.append(
+                        (
+                            f"Act {act_idx + 1}, Chapter {chapter_idx + 1}, "
+                            f"Scene {scene_idx + 1}: {scene.title}",
+                            ("scene", act_idx, chapter_idx, scene_idx),
+                        )
+                    )
+                if is_current:
+                    return units
+        return units
+
+    def _find_summary(self, game_state: GameState, key: tuple) -> Optional[StorySummary]:
+        level, act, chapter = key[:3]
+        for summary in reversed(game_state.summaries):
+            if (summary.level, summary.act, summary.chapter) == (level, act, chapter) and (
+                level == "chapter" or summary.scene == key[3]
+            ):
+                return summary
+        return None
+
+    def _summary_text(self, game_state: GameState, key: tuple) -> str:
+        summary = self._find_summary(game_state, key)
+        if summary is not None:
+            self.stats.summary_hits += 1
+            return summary.text
+
+        self.stats.summary_misses += 1
+        _, act, chapter, scene = key
+        # Shortened again only when a log entry was added to the scene
+        cache_key = (game_state.id,) + key + (game_state.scene_log_length(act, chapter, scene),)
+        text = self._shortened.get(cache_key)
+        if text is None:
+            events = [entry.message for entry in game_state.scene_log(act, chapter, scene)]
+            description = (
+                game_state.adventure.acts[act].chapters[chapter].scenes[scene].description
+            )
+            text = shorten(" ".join(events) or description)
+            self._shortened[cache_key] = text
+            if len(self._shortened) > self.max_shortened:
+                self._shortened.popitem(last=False)
+        else:
+            self._shortened.move_to_end(cache_key)
+        return text
+
+    async def close_scene(self, game_state: GameState) -> list[StorySummary]:
+        """Summarize the current scene, and its chapter if it is the last one.
+
+        Each scene and chapter is summarized once, the summaries are added to
+        the game state and returned.
+        """
+        current = game_state.current_scene
+        act = game_state.adventure.acts[current.act]
+        chapter = act.chapters[current.chapter]
+        written = []
+
+        scene_key = ("scene", current.act, current.chapter, current.scene)
+        if self._find_summary(game_state, scene_key) is None:
+            scene = chapter.scenes[current.scene]
+            text = await self.summarize(
+                f"Scene: {scene.title}", scene.description, self._current_events(game_state)
+            )
+            written.append(
+                StorySummary(
+                    level="scene",
+                    text=text,
+                    act=current.act,
+                    chapter=current.chapter,
+                    scene=current.scene,
+                )
+            )
+            game_state.summaries.append(written[-1])
+
+        chapter_key = ("chapter", current.act, current.chapter)
+        if (
+            game_state.is_last_scene_of_chapter()
+            and self._find_summary(game_state, chapter_key) is None
+        ):
+            scene_summaries = [
+                self._summary_text(game_state, ("scene", current.act, current.chapter, idx))
+                for idx in range(len(chapter.scenes))
+            ]
+            text = await self.summarize(
+                f"Chapter: {chapter.title}", chapter.description, scene_summaries
+            )
+            written.append(
+                StorySummary(
+                    level="chapter",
+                    text=text,
+                    act=current.act,
+                    chapter=current.chapter,
+                    scene=current.scene,
+                )
+            )
+            game_state.summaries.append(written[-1])
+
+        self.stats.summaries_written += len(written)
+        return written
+
+    async def summarize(self, title: str, description: str, events: list[str]) -> str:
+        """Summarize what happened in a scene or chapter."""
+        if self.summarizer == "agent" and events:
+            happened = "\n".join(f"- {event}" for event in events)
+            prompt = f"{title}\n\nAs planned:\n{description}\n\nWhat happened:\n{happened}"
+            try:
+                result = await Runner.run(get_summarizer_agent(), input=prompt)
+                return str(result.final_output).strip()
+            except Exception as e:
+                self.stats.summarizer_errors += 1
+                print(f"[StoryMemory] Summarizer failed, shortening the log instead: {e}")
+        return shorten(" ".join(events) or description)
+
+    def record_turn(self, prompt_tokens: int) -> None:
+        """Record the prompt tokens a turn of the game master used."""
+        self.stats.turns += 1
+        self.stats.prompt_tokens_total += prompt_tokens
+        self.stats.prompt_tokens_max = max(self.stats.prompt_tokens_max, prompt_tokens)
+        self.stats.prompt_tokens_last = prompt_tokens
+
+    def info(self) -> dict:
+        lookups = self.stats.summary_hits + self.stats.summary_misses
+        return {
+            "token_budget": self.token_budget,
+            "recent_entries": self.recent_entries,
+            "summarizer": self.summarizer,
+            "renders": self.stats.renders,
+            "story_tokens_avg": (
+                self.stats.story_tokens_total / self.stats.renders
+                if self.stats.renders
+                else 0.0
+            ),
+            "story_tokens_max": self.stats.story_tokens_max,
+            "story_tokens_last": self.stats.story_tokens_last,
+            "summary_hits": self.stats.summary_hits,
+            "summary_misses": self.stats.summary_misses,
+            "summary_hit_rate": self.stats.summary_hits / lookups if lookups else 0.0,
+            "summaries_written": self.stats.summaries_written,
+            "summarizer_errors": self.stats.summarizer_errors,
+            "turns": self.stats.turns,
+            "prompt_tokens_avg": (
+                self.stats.prompt_tokens_total / self.stats.turns
+                if self.stats.turns
+                else 0.0
+            ),
+            "prompt_tokens_max": self.stats.prompt_tokens_max,
+            "prompt_tokens_last": self.stats.prompt_tokens_last,
+        }
+
+
+@functools.cache
+def get_story_memory() -> StoryMemory:
+    return StoryMemory(
+        token_budget=settings.STORY_TOKEN_BUDGET,
+        recent_entries=settings.STORY_RECENT_ENTRIES,
+        summarizer=settings.STORY_SUMMARIZER,
+    )
@@ -0,0 +1,267 @@
+"""Performance metrics of the turns of the game master.
+
+Every turn is recorded by a `TurnRecorder` while it runs: the time loading the
+game state, running the agents and saving it, the model calls and tokens of
+every agent, including the agents used as tools, the calls and durations of
+every tool, and the size of the saved game state. The model calls are reported
+by the models of `get_model`, the tool calls by `tool_middleware`, to the
+recorder of the turn they run in.
+
+The record of a turn is attached to its history entry as `TurnMetrics`, except
+for the save, which happens after the entry is added, and all turns are added
+up in the metrics served in the Prometheus text format at `GET /metrics`.
+"""
+
+import functools
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from .types import AgentUsage, ToolUsage, TurnMetrics
+
+
+# Upper bounds of the histogram buckets, in seconds and bytes
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(2**exponent for exponent in range(10, 27, 2))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = SECONDS_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = (*buckets, math.inf)
+        # Per label values: the count of every bucket, the sum and the count
+        self.values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        counts, total, count = self.values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self.values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_labels = _labels((*self.labels, "le"), (*labels, _number(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Metrics:
+    """The metrics of all turns."""
+
+    def __init__(self):
+        self.turns = Counter(
+            "roleplaygent_turns_total", "Turns of the game master.", ("status",)
+        )
+        self.turn_seconds = Histogram(
+            "roleplaygent_turn_seconds",
+            "Time of the phases of a turn: load, agent, save and total.",
+            ("phase",),
+        )
+        self.model_calls = Counter(
+            "roleplaygent_model_calls_total", "Model calls per agent.", ("agent",)
+        )
+        self.model_tokens = Counter(
+            "roleplaygent_model_tokens_total",
+            "Prompt (input) and completion (output) tokens per agent.",
+            ("agent", "kind"),
+        )
+        self.model_seconds = Histogram(
+            "roleplaygent_model_call_seconds", "Time of a model call per agent.", ("agent",)
+        )
+        self.tool_calls = Counter(
+            "roleplaygent_tool_calls_total",
+            "Tool calls per tool and status.",
+            ("tool", "status"),
+        )
+        self.tool_seconds = Histogram(
+            "roleplaygent_tool_call_seconds", "Time of a tool call per tool.", ("tool",)
+        )
+        self.state_bytes = Histogram(
+            "roleplaygent_game_state_bytes",
+            "Size of the game state as JSON at the end of a turn.",
+            buckets=BYTES_BUCKETS,
+        )
+
+    def model_call(
+        self, agent: str, seconds: float, input_tokens: int, output_tokens: int
+    ) -> None:
+        self.model_calls.inc(agent)
+        self.model_tokens.inc(agent, "input", value=input_tokens)
+        self.model_tokens.inc(agent, "output", value=output_tokens)
+        self.model_seconds.observe(agent, value=seconds)
+
+    def tool_call(self, tool: str, seconds: float, error: bool, cached: bool) -> None:
+        self.tool_calls.inc(tool, "error" if error else "cached" if cached else "ok")
+        self.tool_seconds.observe(tool, value=seconds)
+
+    def turn(self, recorder: "TurnRecorder", status: str) -> None:
+        self.turns.inc(status)
+        for phase, seconds in recorder.phases.items():
+            self.turn_seconds.observe(phase, value=seconds)
+        self.turn_seconds.observe("total", value=time.perf_counter() - recorder.started)
+        if recorder.state_bytes is not None:
+            self.state_bytes.observe(value=recorder.state_bytes)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (
+            self.turns,
+            self.turn_seconds,
+            self.model_calls,
+            self.model_tokens,
+            self.model_seconds,
+            self.tool_calls,
+            self.tool_seconds,
+            self.state_bytes,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+@functools.cache
+def get_metrics() -> Metrics:
+    return Metrics()
+
+
+class TurnRecorder:
+    """Records the performance of a single turn."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.agents: dict[str, AgentUsage] = {}
+        self.tools: dict[str, ToolUsage] = {}
+        self.state_bytes: Optional[int] = None
+        # Set for turns that end early without an error, e.g. "not_found"
+        self.status: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the turn, "load", "agent" or "save"."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def model_call(
+        self, agent: str, seconds: float, input_tokens: int, output_tokens: int
+    ) -> None:
+        usage = self.agents.setdefault(agent, AgentUsage())
+        usage.model_calls += 1
+        usage.input_tokens += input_tokens
+        usage.output_tokens += output_tokens
+        usage.seconds += seconds
+
+    def tool_call(self, tool: str, seconds: float, error: bool, cached: bool) -> None:
+        usage = self.tools.setdefault(tool, ToolUsage())
+        usage.calls += 1
+        usage.errors += error
+        usage.cached += cached
+        usage.seconds += seconds
+
+    def metrics(self) -> TurnMetrics:
+        return TurnMetrics(
+            load_seconds=round(self.phases.get("load", 0.0), 4),
+            agent_seconds=round(self.phases.get("agent", 0.0), 4),
+            model_calls=sum(usage.model_calls for usage in self.agents.values()),
+            agents={
+                name: usage.model_copy(update={"seconds": round(usage.seconds, 4)})
+                for name, usage in self.agents.items()
+            },
+            tools={
+                name: usage.model_copy(update={"seconds": round(usage.seconds, 4)})
+                for name, usage in self.tools.items()
+            },
+            state_bytes=self.state_bytes,
+        )
+
+
+_current_turn: ContextVar[Optional[TurnRecorder]] = ContextVar("current_turn", default=None)
+
+
+@contextmanager
+def record_turn() -> Iterator[TurnRecorder]:
+    """Record the turn running in this context, and add it to the metrics when it ends."""
+    recorder = TurnRecorder()
+    token = _current_turn.set(recorder)
+    status = "error"
+    try:
+        yield recorder
+        status = recorder.status or "ok"
+    except BaseException as e:
+        if not isinstance(e, Exception):
+            status = "cancelled"
+        raise
+    finally:
+        _current_turn.reset(token)
+        get_metrics().turn(recorder, status)
+
+
+def record_model_call(
+    agent: str, seconds: float, input_tokens: int, output_tokens: int
+) -> None:
+    """Record a model call, in the metrics and of the turn it is part of."""
+    get_metrics().model_call(agent, seconds, input_tokens, output_tokens)
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.model_call(agent, seconds, input_tokens, output_tokens)
+
+
+def record_tool_call(
+    tool: str, seconds: float, error: bool = False, cached: bool = False
+) -> None:
+    """Record a tool call, in the metrics and of the turn it is part of."""
+    get_metrics().tool_call(tool, seconds, error, cached)
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.tool_call(tool, seconds, error, cached)
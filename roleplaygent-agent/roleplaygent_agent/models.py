@@ -0,0 +1,515 @@
+"""The models of the agents, the OpenAI models or offline stand-ins for them.
+
+Every agent gets its model from `get_model`, which depends on MODEL_MODE:
+
+- "live": the OpenAI model.
+- "record": the OpenAI model, with every response appended to the cassette
+  MODEL_CASSETTE.
+- "replay": the responses of the cassette, without any network. A request is
+  answered with the recorded response to the same request of the same agent,
+  or else with the next response recorded for that agent, after a simulated
+  latency of MODEL_LATENCY seconds plus MODEL_LATENCY_PER_TOKEN seconds per
+  output token.
+- "scripted": the responses of the script MODEL_SCRIPT, with the same latency.
+
+In every mode the time and tokens of the model calls are reported to the
+metrics, see metrics.py.
+
+A script is a JSON object mapping agent names, or "*" for all others, to the
+responses of the model calls of a run of the agent, one after another. A
+response is a list of items, `{"text": ...}` for a message, `{"json": ...}` for
+structured output and `{"tool": ..., "arguments": {...}}` for a tool call. The
+last response of a run should not call tools, it is repeated for any further
+calls.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional, Union
+
+from agents import Model, ModelSettings, Tool, set_tracing_disabled
+from agents.agent_output import AgentOutputSchemaBase
+from agents.handoffs import Handoff
+from agents.items import ModelResponse, TResponseInputItem, TResponseOutputItem
+from agents.models.interface import ModelTracing
+from agents.models.multi_provider import MultiProvider
+from agents.usage import Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputItem,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+from pydantic import TypeAdapter
+
+from . import settings
+from .metrics import record_model_call
+
+
+_output_item = TypeAdapter(ResponseOutputItem)
+
+
+def get_model(agent: str, model: Optional[str] = None) -> Model:
+    """The model of an agent in the configured MODEL_MODE, with its calls metered."""
+    return MeteredModel(agent, _get_model(agent, model))
+
+
+def _get_model(agent: str, model: Optional[str] = None) -> Union[str, Model, None]:
+    if settings.MODEL_MODE == "live":
+        return model
+    if settings.MODEL_MODE == "record":
+        return RecordingModel(agent, model, get_cassette())
+    if settings.MODEL_MODE == "replay":
+        # Offline, so there is nowhere to export traces to
+        set_tracing_disabled(True)
+        return ReplayModel(agent, get_cassette())
+    if settings.MODEL_MODE == "scripted":
+        set_tracing_disabled(True)
+        return ScriptedModel(agent, load_script(settings.MODEL_SCRIPT))
+    raise ValueError(f"Unknown model mode: {settings.MODEL_MODE}")
+
+
+def request_key(system_instructions: Optional[str], input: Any) -> str:
+    data = json.dumps([system_instructions, input], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def estimate_tokens(*parts: Any) -> int:
+    text = "".join(part if isinstance(part, str) else json.dumps(part, default=str) for part in parts)
+    return (len(text) + 3) // 4
+
+
+def simulated_latency(output_tokens: int) -> float:
+    return settings.MODEL_LATENCY + settings.MODEL_LATENCY_PER_TOKEN * output_tokens
+
+
+class Cassette:
+    """The recorded model responses of a session, one JSON line per response."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._by_key: dict[tuple[str, str], list[dict]] = {}
+        self._by_agent: dict[str, list[dict]] = {}
+        self._next: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, record: dict) -> None:
+        self._by_key.setdefault((record["agent"], record["key"]), []).append(record)
+        self._by_agent.setdefault(record["agent"], []).append(record)
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self._index(record)
+
+    def find(self, agent: str, key: str) -> dict:
+        """The response to a request, or the next recorded response of the agent."""
+        with self._lock:
+            matches = self._by_key.get((agent, key))
+            if matches:
+                self.hits += 1
+                return matches[0]
+            recorded = self._by_agent.get(agent)
+            if not recorded:
+                raise LookupError(f"No responses of agent {agent!r} in {self.path}")
+            # Requests differ from the recorded ones as soon as tool outputs do,
+            # e.g. dice rolls, so fall back to the recorded order
+            self.misses += 1
+            index = self._next.get(agent, 0)
+            self._next[agent] = index + 1
+            return recorded[index % len(recorded)]
+
+
+@functools.cache
+def get_cassette() -> Cassette:
+    return Cassette(settings.MODEL_CASSETTE)
+
+
+@functools.cache
+def load_script(path: Path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _response(output: list[TResponseOutputItem], usage: Usage) -> Response:
+    return Response(
+        id=f"resp_{time.monotonic_ns()}",
+        created_at=time.time(),
+        model="offline",
+        object="response",
+        output=output,
+        parallel_tool_calls=False,
+        tool_choice="auto",
+        tools=[],
+        top_p=None,
+        usage=ResponseUsage(
+            input_tokens=usage.input_tokens,
+            input_tokens_details=InputTokensDetails(cached_tokens=0),
+            output_tokens=usage.output_tokens,
+            output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+            total_tokens=usage.total_tokens,
+        ),
+    )
+
+
+async def _stream(
+    output: list[TResponseOutputItem], usage: Usage, latency: float
+) -> AsyncIterator[Any]:
+    """Stream a response word by word, spreading the latency over the words."""
+    words = [
+        (output_index, item, content_index, word)
+        for output_index, item in enumerate(output)
+        if isinstance(item, ResponseOutputMessage)
+        for content_index, content in enumerate(item.content)
+        if isinstance(content, ResponseOutputText)
+        for word in content.text.split(" ")
+    ]
+    sequence_number = 0
+    for index, (output_index, item, content_index, word) in enumerate(words):
+        await asyncio.sleep(latency / (len(words) + 1))
+        yield ResponseTextDeltaEvent(
+            content_index=content_index,
+            delta=word if index == 0 or words[index - 1][1] is not item else f" {word}",
+            item_id=item.id,
+            output_index=output_index,
+            sequence_number=sequence_number,
+            type="response.output_text.delta",
+        )
+        sequence_number += 1
+    await asyncio.sleep(latency / (len(words) + 1))
+    yield ResponseCompletedEvent(
+        response=_response(output, usage),
+        sequence_number=sequence_number,
+        type="response.completed",
+    )
+
+
+class OfflineModel(Model, ABC):
+    """A model answering from somewhere else than the OpenAI API."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+
+    @abstractmethod
+    def respond(
+        self, system_instructions: Optional[str], input: Union[str, list]
+    ) -> tuple[list[TResponseOutputItem], Usage]:
+        """The output items and usage of the response to a request."""
+
+    async def get_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> ModelResponse:
+        output, usage = self.respond(system_instructions, input)
+        await asyncio.sleep(simulated_latency(usage.output_tokens))
+        return ModelResponse(output=output, usage=usage, response_id=None)
+
+    async def stream_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> AsyncIterator[Any]:
+        output, usage = self.respond(system_instructions, input)
+        async for event in _stream(output, usage, simulated_latency(usage.output_tokens)):
+            yield event
+
+
+class ReplayModel(OfflineModel):
+    """Answers with the responses recorded in a cassette."""
+
+    def __init__(self, agent: str, cassette: Cassette):
+        super().__init__(agent)
+        self.cassette = cassette
+
+    def respond(
+        self, system_instructions: Optional[str], input: Union[str, list]
+    ) -> tuple[list[TResponseOutputItem], Usage]:
+        record = self.cassette.find(self.agent, request_key(system_instructions, input))
+        output = [_output_item.validate_python(item) for item in record["output"]]
+        return output, Usage(requests=1, **record["usage"])
+
+
+class ScriptedModel(OfflineModel):
+    """Answers with the responses of a script, see the module docstring."""
+
+    def __init__(self, agent: str, script: dict):
+        super().__init__(agent)
+        responses = script.get(agent, script.get("*"))
+        if not responses:
+            raise ValueError(f"No scripted responses for agent {agent!r}")
+        self.responses = responses
+
+    def respond(
+        self, system_instructions: Optional[str], input: Union[str, list]
+    ) -> tuple[list[TResponseOutputItem], Usage]:
+        step = _run_step(input)
+        items = self.responses[min(step, len(self.responses) - 1)]
+        output: list[TResponseOutputItem] = []
+        for index, item in enumerate(items):
+            if "tool" in item:
+                output.append(
+                    ResponseFunctionToolCall(
+                        id=f"fc_{step}_{index}",
+                        call_id=f"call_{step}_{index}",
+                        name=item["tool"],
+                        arguments=json.dumps(item.get("arguments", {})),
+                        type="function_call",
+                        status="completed",
+                    )
+                )
+            else:
+                text = item["text"] if "text" in item else json.dumps(item["json"])
+                output.append(
+                    ResponseOutputMessage(
+                        id=f"msg_{step}_{index}",
+                        content=[ResponseOutputText(annotations=[], text=text, type="output_text")],
+                        role="assistant",
+                        status="completed",
+                        type="message",
+                    )
+                )
+        input_tokens = estimate_tokens(system_instructions or "", input)
+        output_tokens = estimate_tokens([item.model_dump() for item in output])
+        usage = Usage(
+            requests=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+        return output, usage
+
+
+def _run_step(input: Union[str, list]) -> int:
+    """How many model calls of the current run came before, from the scripted tool call ids."""
+    if isinstance(input, str):
+        return 0
+    step = 0
+    for item in input:
+        item = item if isinstance(item, dict) else item.model_dump()
+        if item.get("role") == "user":
+            step = 0
+        elif item.get("type") == "function_call" and str(item.get("call_id", "")).startswith(
+            "call_"
+        ):
+            parts = item["call_id"].split("_")
+            if len(parts) > 2 and parts[1].isdigit():
+                step = max(step, int(parts[1]) + 1)
+    return step
+
+
+class RecordingModel(Model):
+    """The OpenAI model, appending every response to a cassette."""
+
+    def __init__(self, agent: str, model: Optional[str], cassette: Cassette):
+        self.agent = agent
+        self.model = model
+        self.cassette = cassette
+
+    @functools.cached_property
+    def inner(self) -> Model:
+        return MultiProvider().get_model(self.model)
+
+    def _record(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list],
+        output: list[TResponseOutputItem],
+        usage: Usage,
+    ) -> None:
+        self.cassette.append(
+            {
+                "agent": self.agent,
+                "model": self.model,
+                "key": request_key(system_instructions, input),
+                "output": [item.model_dump() for item in output],
+                "usage": {
+                    "input_tokens": usage.input_tokens,
+                    "output_tokens": usage.output_tokens,
+                    "total_tokens": usage.total_tokens,
+                },
+            }
+        )
+
+    async def get_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> ModelResponse:
+        response = await self.inner.get_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            prompt=prompt,
+        )
+        self._record(system_instructions, input, response.output, response.usage)
+        return response
+
+    async def stream_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> AsyncIterator[Any]:
+        async for event in self.inner.stream_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            prompt=prompt,
+        ):
+            if isinstance(event, ResponseCompletedEvent):
+                usage = event.response.usage
+                self._record(
+                    system_instructions,
+                    input,
+                    event.response.output,
+                    Usage(
+                        input_tokens=usage.input_tokens if usage else 0,
+                        output_tokens=usage.output_tokens if usage else 0,
+                        total_tokens=usage.total_tokens if usage else 0,
+                    ),
+                )
+            yield event
+
+
+class MeteredModel(Model):
+    """A model reporting the time and tokens of its calls to the metrics."""
+
+    def __init__(self, agent: str, model: Union[str, Model, None]):
+        self.agent = agent
+        self.model = model
+
+    @functools.cached_property
+    def inner(self) -> Model:
+        if isinstance(self.model, Model):
+            return self.model
+        return MultiProvider().get_model(self.model)
+
+    async def get_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> ModelResponse:
+        started = time.perf_counter()
+        response = await self.inner.get_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            prompt=prompt,
+        )
+        record_model_call(
+            self.agent,
+            time.perf_counter() - started,
+            response.usage.input_tokens,
+            response.usage.output_tokens,
+        )
+        return response
+
+    async def stream_response(
+        self,
+        system_instructions: Optional[str],
+        input: Union[str, list[TResponseInputItem]],
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: Optional[AgentOutputSchemaBase],
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        async for event in self.inner.stream_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            prompt=prompt,
+        ):
+            if isinstance(event, ResponseCompletedEvent):
+                usage = event.response.usage
+                record_model_call(
+                    self.agent,
+                    time.perf_counter() - started,
+                    usage.input_tokens if usage else 0,
+                    usage.output_tokens if usage else 0,
+                )
+            yield event
@@ -0,0 +1,297 @@
+"""A warm pool of pre-generated adventures.
+
+Generating the adventure is the slowest part of creating a game. The pool
+keeps `size` validated adventures ready for each world it is configured for, a
+world being a setting and whether it has mature themes, and generates new ones
+in the background, at most `refill_workers` at a time, as they are taken.
+Adventures are generated without a player character, who is added when a game
+is created from them, and kept in `<games_dir>/pool/` across restarts.
+
+A world with its own description can not be served from the pool, its
+adventure is generated for the game as before, like on a miss.
+"""
+
+import asyncio
+import functools
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from agents import Runner
+from pydantic import BaseModel, Field
+
+from . import settings
+from .agents.adventure_generator import get_agent as get_adventure_generator_agent
+from .storage.base import run_io
+from .storage.journal import write_atomic
+from .types import Adventure
+
+
+# A setting and whether it has mature themes
+World = tuple[str, bool]
+
+
+class PooledAdventure(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()), description="The id of the adventure")
+    setting: str = Field(description="The setting of the world")
+    mature_themes: bool = Field(description="Whether the world has mature themes")
+    adventure: Adventure = Field(description="The adventure")
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def world(self) -> World:
+        return (self.setting, self.mature_themes)
+
+
+def world_of(world: dict) -> World:
+    """The pool key of the world of a create game request."""
+    return (str(world.get("setting", "")).strip().lower(), bool(world.get("matureThemes")))
+
+
+def parse_worlds(worlds: str) -> list[World]:
+    """Parse a comma separated list of settings, with ":mature" for mature themes."""
+    parsed = []
+    for world in worlds.split(","):
+        setting, _, mature = world.strip().partition(":")
+        if setting:
+            parsed.append((setting.strip().lower(), mature.strip() == "mature"))
+    return parsed
+
+
+def adventure_prompt(world: World) -> str:
+    setting, mature_themes = world
+    return f"""
+Create a new adventure for a player character that is not known yet. Do not name or describe the player character, the adventure has to fit any character.
+
+World:
+- Setting: {setting}
+- Mature Themes: {mature_themes}
+
+Please create an engaging adventure that fits these parameters."""
+
+
+def validate_adventure(adventure: Adventure) -> list[str]:
+    """The problems that make an adventure unplayable, none if it is fine."""
+    problems = []
+    if not adventure.title.strip():
+        problems.append("The adventure has no title")
+    if not adventure.acts:
+        problems.append("The adventure has no acts")
+    for act_idx, act in enumerate(adventure.acts):
+        if not act.chapters:
+            problems.append(f"Act {act_idx + 1} has no chapters")
+        for chapter_idx, chapter in enumerate(act.chapters):
+            if not chapter.scenes:
+                problems.append(f"Act {act_idx + 1}, chapter {chapter_idx + 1} has no scenes")
+            for scene_idx, scene in enumerate(chapter.scenes):
+                where = f"Act {act_idx + 1}, chapter {chapter_idx + 1}, scene {scene_idx + 1}"
+                if scene.encounter and not scene.enemies:
+                    problems.append(f"{where} is an encounter without enemies")
+                if not scene.encounter and not scene.challenges:
+                    problems.append(f"{where} has no challenges")
+    return problems
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    generated: int = 0
+    rejected: int = 0
+    errors: int = 0
+    generate_seconds_total: float = 0.0
+    refills: int = 0
+    refill_lag_seconds_total: float = 0.0
+    refill_lag_seconds_max: float = 0.0
+
+
+class AdventurePool:
+    """Keeps `size` adventures ready for each of `worlds`."""
+
+    def __init__(
+        self,
+        games_dir: Path,
+        size: int = 0,
+        worlds: Optional[list[World]] = None,
+        refill_workers: int = 1,
+    ):
+        self.dir = games_dir / "pool"
+        self.size = size
+        self.worlds = worlds or []
+        self.refill_workers = refill_workers
+        self.stats = PoolStats()
+        self._ready: dict[World, deque[PooledAdventure]] = {}
+        self._pending: dict[World, int] = {}
+        # When a world dropped below `size`, for the refill lag
+        self._low_since: dict[World, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and bool(self.worlds)
+
+    def _world_dir(self, world: World) -> Path:
+        setting, mature_themes = world
+        name = re.sub(r"[^\w-]", "_", setting) + ("-mature" if mature_themes else "")
+        return self.dir / name
+
+    def _save(self, pooled: PooledAdventure) -> None:
+        world_dir = self._world_dir(pooled.world)
+        world_dir.mkdir(parents=True, exist_ok=True)
+        write_atomic(world_dir / f"{pooled.id}.json", pooled.model_dump_json().encode())
+
+    def _delete(self, pooled: PooledAdventure) -> None:
+        (self._world_dir(pooled.world) / f"{pooled.id}.json").unlink(missing_ok=True)
+
+    def _load_all(self) -> list[PooledAdventure]:
+        if not self.dir.exists():
+            return []
+        pooled = []
+        for adventure_file in self.dir.glob("*/*.json"):
+            try:
+                with open(adventure_file, "r") as f:
+                    pooled.append(PooledAdventure.model_validate(json.load(f)))
+            except Exception as e:
+                print(f"[AdventurePool] Skipping broken adventure file {adventure_file}: {e}")
+        return sorted(pooled, key=lambda pooled: pooled.created_at)
+
+    async def start(self) -> None:
+        """Load the adventures kept from the last run and fill up the pool."""
+        if not self.enabled:
+            return
+        for pooled in await run_io(self._load_all):
+            self._ready.setdefault(pooled.world, deque()).append(pooled)
+        for world in self.worlds:
+            print(
+                f"[AdventurePool] {len(self._ready.get(world, ()))} of {self.size} "
+                f"adventures ready for {world}"
+            )
+            self._fill(world)
+
+    async def take(self, world: dict) -> Optional[Adventure]:
+        """Take an adventure for the world of a create game request, if one is ready."""
+        if not self.enabled:
+            return None
+        if str(world.get("description", "")).strip():
+            self.stats.bypassed += 1
+            return None
+        key = world_of(world)
+        ready = self._ready.get(key)
+        if not ready:
+            self.stats.misses += 1
+            print(f"[AdventurePool] No adventure ready for {key}")
+            return None
+        pooled = ready.popleft()
+        self.stats.hits += 1
+        await run_io(self._delete, pooled)
+        self._fill(key)
+        return pooled.adventure
+
+    def _fill(self, world: World) -> None:
+        """Start generating the adventures missing for a world."""
+        if world not in self.worlds:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.refill_workers)
+        missing = self.size - len(self._ready.get(world, ())) - self._pending.get(world, 0)
+        if missing > 0:
+            self._low_since.setdefault(world, time.monotonic())
+        for _ in range(missing):
+            self._pending[world] = self._pending.get(world, 0) + 1
+            task = asyncio.create_task(self._generate(world))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _generate(self, world: World) -> None:
+        try:
+            async with self._semaphore:
+                started = time.monotonic()
+                result = await Runner.run(
+                    get_adventure_generator_agent(), input=adventure_prompt(world)
+                )
+                self.stats.generate_seconds_total += time.monotonic() - started
+            adventure = result.final_output
+            problems = validate_adventure(adventure)
+            if problems:
+                self.stats.rejected += 1
+                print(f"[AdventurePool] Rejected adventure for {world}: {'; '.join(problems)}")
+                return
+            pooled = PooledAdventure(
+                setting=world[0], mature_themes=world[1], adventure=adventure
+            )
+            await run_io(self._save, pooled)
+            self._ready.setdefault(world, deque()).append(pooled)
+            self.stats.generated += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.errors += 1
+            print(f"[AdventurePool] Generating an adventure for {world} failed: {e}")
+        finally:
+            self._pending[world] -= 1
+            if len(self._ready.get(world, ())) >= self.size and world in self._low_since:
+                lag = time.monotonic() - self._low_since.pop(world)
+                self.stats.refills += 1
+                self.stats.refill_lag_seconds_total += lag
+                self.stats.refill_lag_seconds_max = max(self.stats.refill_lag_seconds_max, lag)
+            elif not self._pending[world]:
+                # Given up until the next take, a failed refill is not a lag
+                self._low_since.pop(world, None)
+
+    async def close(self) -> None:
+        """Stop generating, the ready adventures are kept for the next start."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def info(self) -> dict:
+        lookups = self.stats.hits + self.stats.misses
+        return {
+            "size": self.size,
+            "refill_workers": self.refill_workers,
+            "ready": {
+                f"{setting}{':mature' if mature_themes else ''}": len(
+                    self._ready.get((setting, mature_themes), ())
+                )
+                for setting, mature_themes in self.worlds
+            },
+            "generating": sum(self._pending.values()),
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "bypassed": self.stats.bypassed,
+            "hit_rate": self.stats.hits / lookups if lookups else 0.0,
+            "generated": self.stats.generated,
+            "rejected": self.stats.rejected,
+            "errors": self.stats.errors,
+            "generate_seconds_avg": (
+                self.stats.generate_seconds_total
+                / (self.stats.generated + self.stats.rejected)
+                if self.stats.generated + self.stats.rejected
+                else 0.0
+            ),
+            "refills": self.stats.refills,
+            "refill_lag_seconds_avg": (
+                self.stats.refill_lag_seconds_total / self.stats.refills
+                if self.stats.refills
+                else 0.0
+            ),
+            "refill_lag_seconds_max": self.stats.refill_lag_seconds_max,
+        }
+
+
+@functools.cache
+def get_adventure_pool() -> AdventurePool:
+    return AdventurePool(
+        settings.GAMES_DIR,
+        size=settings.ADVENTURE_POOL_SIZE,
+        worlds=parse_worlds(settings.ADVENTURE_POOL_WORLDS),
+        refill_workers=settings.ADVENTURE_POOL_REFILL_WORKERS,
+    )
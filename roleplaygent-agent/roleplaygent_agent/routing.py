@@ -0,0 +1,136 @@
+r"""Routing of the turns of the game master to a model tier.
+
+With ROUTING_MODE=heuristic, turns that look like questions about the game
+world go to the "fast" tier, the narrator agent on a small model with only the
+read-only tools, and all others to the "full" tier, the game master. The
+narrator escalates a turn to the game master when it turns out to need the
+game state changed, so a wrong guess costs an extra model call rather than a
+wrong answer.
+
+A prompt goes to the full tier if it matches any of the "full" rules, to the
+fast tier if it matches any of the "fast" rules, and to the full tier
+otherwise. The rules are case insensitive regular expressions, replaced per
+deployment with a JSON file at ROUTING_RULES, e.g.
+`{"fast": ["\\?\\s*$"], "full": ["\\bpray\\b", "^\\s*i\\b"]}`.
+"""
+
+import functools
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from agents import Agent
+from agents.result import RunResultBase
+
+from . import settings
+from .agents.game_master import get_agent as get_game_master_agent
+from .agents.narrator import get_agent as get_narrator_agent
+
+
+TIERS = ("fast", "full")
+
+DEFAULT_RULES = {
+    # Anything the player does, or asks whether they can do
+    "full": [
+        r"\b(attack|fight|hit|strike|stab|shoot|cast|kill|defend|dodge|flee)\b",
+        r"\b(take|grab|pick|steal|give|buy|sell|trade|use|equip|drink|eat|throw|break)\b",
+        r"\b(go|walk|run|enter|leave|move|climb|jump|swim|sneak|hide|follow|open|close)\b",
+        r"\b(talk|ask|say|tell|persuade|convince|lie|threaten|bribe|search|rest)\b",
+        r"^\s*(i|we|let's)\b",
+    ],
+    # Questions and requests for descriptions
+    "fast": [
+        r"^\s*(what|who|where|when|why|how|which|is|are|was|were|does|do|did)\b",
+        r"^\s*(describe|remind me)\b",
+        r"\?\s*$",
+    ],
+}
+
+
+@dataclass
+class TierStats:
+    turns: int = 0
+    escalations: int = 0
+    seconds_total: float = 0.0
+    seconds_max: float = 0.0
+    input_tokens_total: int = 0
+    output_tokens_total: int = 0
+
+
+class TurnRouter:
+    """Picks the agent running a turn and keeps statistics per tier."""
+
+    def __init__(self, mode: str = "off", rules: Optional[dict[str, list[str]]] = None):
+        if mode not in ("off", "heuristic", "fast", "full"):
+            raise ValueError(f"Unknown routing mode: {mode}")
+        self.mode = mode
+        self.rules = {
+            tier: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for tier, patterns in {**DEFAULT_RULES, **(rules or {})}.items()
+            if tier in TIERS
+        }
+        self.stats = {tier: TierStats() for tier in TIERS}
+
+    def route(self, prompt: str) -> str:
+        """The tier of a turn, "fast" or "full"."""
+        if self.mode in TIERS:
+            return self.mode
+        if self.mode == "off":
+            return "full"
+        if any(rule.search(prompt) for rule in self.rules["full"]):
+            return "full"
+        if any(rule.search(prompt) for rule in self.rules["fast"]):
+            return "fast"
+        return "full"
+
+    def agent(self, tier: str) -> Agent:
+        return get_narrator_agent() if tier == "fast" else get_game_master_agent()
+
+    def record(self, tier: str, result: RunResultBase, seconds: float) -> None:
+        """Record a turn run on a tier, and whether it was escalated."""
+        stats = self.stats[tier]
+        stats.turns += 1
+        escalated = tier == "fast" and result.last_agent is not get_narrator_agent()
+        stats.escalations += escalated
+        stats.seconds_total += seconds
+        stats.seconds_max = max(stats.seconds_max, seconds)
+        usage = result.context_wrapper.usage
+        stats.input_tokens_total += usage.input_tokens
+        stats.output_tokens_total += usage.output_tokens
+        print(
+            f"[TurnRouter] {tier} turn took {seconds:.2f}s, {usage.input_tokens} input "
+            f"and {usage.output_tokens} output tokens{', escalated' if escalated else ''}"
+        )
+
+    def info(self) -> dict:
+        tiers = {}
+        for tier, stats in self.stats.items():
+            turns = stats.turns or 1
+            tiers[tier] = {
+                "turns": stats.turns,
+                "escalations": stats.escalations,
+                "escalation_rate": stats.escalations / turns,
+                "seconds_avg": stats.seconds_total / turns,
+                "seconds_max": stats.seconds_max,
+                "input_tokens_avg": stats.input_tokens_total / turns,
+                "output_tokens_avg": stats.output_tokens_total / turns,
+                "input_tokens_total": stats.input_tokens_total,
+                "output_tokens_total": stats.output_tokens_total,
+            }
+        return {"mode": self.mode, "tiers": tiers}
+
+
+def load_rules(path: Optional[Path]) -> Optional[dict[str, list[str]]]:
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+@functools.cache
+def get_turn_router() -> TurnRouter:
+    return TurnRouter(
+        mode=settings.ROUTING_MODE, rules=load_rules(settings.ROUTING_RULES)
+    )
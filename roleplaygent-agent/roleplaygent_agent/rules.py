@@ -0,0 +1,217 @@
+"""The rules of the game, resolved in code rather than by asking the rules engine agent.
+
+Checks roll a die plus an attribute and a skill bonus against the target
+number of a difficulty, initiative is 1d6 + AGI and an attack rolls a die plus
+STR or AGI and a skill bonus against the defense of the target, 10 + AGI,
+dealing a damage roll on a hit. All rolls take a `random.Random`, or the
+`dice.GameDice` of a game, so that results can be reproduced with a seeded one.
+"""
+
+import random
+from typing import Optional, Protocol, Sequence, Union
+
+from pydantic import BaseModel, Field
+
+from .types import Attributes, DetailedCharacter, Enemy, GameState
+
+
+DIFFICULTIES = {"easy": 6, "normal": 9, "medium": 9, "hard": 12, "very hard": 15}
+
+ATTRIBUTES = ("strength", "agility", "intelligence", "charisma", "endurance")
+
+DICE = (4, 6, 8, 10, 12, 20)
+
+CHECK_DIE = 6
+INITIATIVE_DIE = 6
+ATTACK_DIE = 6
+DAMAGE_DIE = 6
+
+# Defense bonus of a character that chose to defend this turn
+DEFEND_BONUS = 2
+
+# The attributes every player character starts with
+STARTING_ATTRIBUTES = Attributes(
+    health=100, strength=5, agility=5, intelligence=5, charisma=5, endurance=5
+)
+
+
+Combatant = Union[DetailedCharacter, Enemy]
+
+
+class Rng(Protocol):
+    def randint(self, a: int, b: int) -> int: ...
+
+
+class CheckResult(BaseModel):
+    attribute: str = Field(description="The attribute the check was made with")
+    attribute_value: int = Field(description="The value of the attribute")
+    skill_bonus: int = Field(description="The skill bonus added to the roll")
+    die: int = Field(description="The number of sides of the die rolled")
+    roll: int = Field(description="The die roll")
+    total: int = Field(description="The roll plus attribute and skill bonus")
+    target_number: int = Field(description="The target number of the difficulty")
+    success: bool = Field(description="Whether the total reached the target number")
+    margin: int = Field(description="By how much the total beat or missed the target number")
+
+
+class InitiativeRoll(BaseModel):
+    name: str = Field(description="The name of the participant")
+    roll: int = Field(description="The die roll")
+    agility: int = Field(description="The agility of the participant")
+    total: int = Field(description="The roll plus agility")
+
+
+class AttackResult(BaseModel):
+    attacker: str = Field(description="The name of the attacker")
+    defender: str = Field(description="The name of the defender")
+    attribute: str = Field(description="The attribute the attack was made with")
+    roll: int = Field(description="The attack roll")
+    total: int = Field(description="The attack roll plus attribute and skill bonus")
+    defense: int = Field(description="The defense of the defender")
+    hit: bool = Field(description="Whether the attack hit")
+    damage: int = Field(description="The damage dealt, 0 on a miss")
+    defender_health: int = Field(description="The health of the defender after the attack")
+    defeated: bool = Field(description="Whether the defender has no health left")
+
+
+def target_number(difficulty: Union[str, int]) -> int:
+    """The target number of a difficulty name, or a target number itself."""
+    if isinstance(difficulty, int):
+        return difficulty
+    key = difficulty.strip().lower().replace("_", " ")
+    if key.isdigit():
+        return int(key)
+    if key not in DIFFICULTIES:
+        raise ValueError(
+            f"Unknown difficulty {difficulty!r}, expected one of {', '.join(DIFFICULTIES)}"
+        )
+    return DIFFICULTIES[key]
+
+
+def attribute_value(character: Attributes, attribute: str) -> int:
+    key = attribute.strip().lower()
+    if key not in ATTRIBUTES:
+        raise ValueError(
+            f"Unknown attribute {attribute!r}, expected one of {', '.join(ATTRIBUTES)}"
+        )
+    return getattr(character, key)
+
+
+def max_health(character: Attributes) -> int:
+    return 10 + character.endurance * 2
+
+
+def defense(character: Attributes, defending: bool = False) -> int:
+    return 10 + character.agility + (DEFEND_BONUS if defending else 0)
+
+
+def roll(die: int, rng: Optional[Rng] = None) -> int:
+    if die not in DICE:
+        raise ValueError(f"Unknown die d{die}, expected one of {DICE}")
+    return (rng or random).randint(1, die)
+
+
+def resolve_check(
+    character: Attributes,
+    attribute: str,
+    difficulty: Union[str, int],
+    skill_bonus: int = 0,
+    die: int = CHECK_DIE,
+    rng: Optional[Rng] = None,
+) -> CheckResult:
+    """Roll a check of an attribute of a character against a difficulty."""
+    value = attribute_value(character, attribute)
+    tn = target_number(difficulty)
+    rolled = roll(die, rng)
+    total = rolled + value + skill_bonus
+    return CheckResult(
+        attribute=attribute.strip().lower(),
+        attribute_value=value,
+        skill_bonus=skill_bonus,
+        die=die,
+        roll=rolled,
+        total=total,
+        target_number=tn,
+        success=total >= tn,
+        margin=total - tn,
+    )
+
+
+def roll_initiative(
+    participants: Sequence[Combatant], rng: Optional[Rng] = None
+) -> list[InitiativeRoll]:
+    """Roll initiative for all participants, in the order they act.
+
+    Ties go to the higher agility, then to the order of the participants.
+    """
+    rolls = []
+    for participant in participants:
+        rolled = roll(INITIATIVE_DIE, rng)
+        rolls.append(
+            InitiativeRoll(
+                name=participant.name,
+                roll=rolled,
+                agility=participant.agility,
+                total=rolled + participant.agility,
+            )
+        )
+    return sorted(rolls, key=lambda r: (r.total, r.agility), reverse=True)
+
+
+def resolve_attack(
+    attacker: Combatant,
+    defender: Combatant,
+    attribute: Optional[str] = None,
+    skill_bonus: int = 0,
+    defending: bool = False,
+    rng: Optional[Rng] = None,
+) -> AttackResult:
+    """Roll an attack and, on a hit, deal the damage to the defender's health.
+
+    Attacks are made with strength or agility, by default whichever is higher.
+    """
+    if attribute is None:
+        attribute = "strength" if attacker.strength >= attacker.agility else "agility"
+    attribute = attribute.strip().lower()
+    if attribute not in ("strength", "agility"):
+        raise ValueError(f"Attacks are made with strength or agility, not {attribute!r}")
+
+    rolled = roll(ATTACK_DIE, rng)
+    total = rolled + getattr(attacker, attribute) + skill_bonus
+    target = defense(defender, defending)
+    hit = total >= target
+    damage = roll(DAMAGE_DIE, rng) if hit else 0
+    defender.health = max(defender.health - damage, 0)
+    return AttackResult(
+        attacker=attacker.name,
+        defender=defender.name,
+        attribute=attribute,
+        roll=rolled,
+        total=total,
+        defense=target,
+        hit=hit,
+        damage=damage,
+        defender_health=defender.health,
+        defeated=defender.health <= 0,
+    )
+
+
+def find_combatant(game_state: GameState, name: str) -> Combatant:
+    """Find the player, an enemy or a detailed character of the current scene by name."""
+    key = name.strip().lower()
+    if key in ("player", game_state.player.name.lower()):
+        return game_state.player
+    for enemy in game_state.current_scene.enemies:
+        if enemy.name.lower() == key:
+            return enemy
+    for character in game_state.current_scene.characters:
+        if isinstance(character, DetailedCharacter) and character.name.lower() == key:
+            return character
+    raise ValueError(f"No player, enemy or character named {name!r} in the current scene")
+
+
+def scene_combatants(game_state: GameState) -> list[Combatant]:
+    """The player and the enemies of the current scene still standing."""
+    return [game_state.player] + [
+        enemy for enemy in game_state.current_scene.enemies if enemy.health > 0
+    ]
@@ -0,0 +1,131 @@
+import os
+from pathlib import Path
+
+
+GAMES_DIR = Path(os.environ.get("GAMES_DIR", "games"))
+
+# Where errors and traces are reported to, an empty SENTRY_DSN turns it off
+SENTRY_DSN = os.environ.get(
+    "SENTRY_DSN",
+    "https://f144027da57c2fcfedd83ce4443bb57b@o4509089275772928.ingest.de.sentry.io/4509427898777680",
+)
+
+# Whether the API starts serving before Sentry is initialized and the agents
+# are built, "background", or only after, "eager", see startup.py
+STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", "background")
+
+# "filesystem" stores one JSON file per game in GAMES_DIR, "sqlite" stores all
+# games in the SQLite database at SQLITE_PATH.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "filesystem")
+SQLITE_PATH = Path(os.environ.get("SQLITE_PATH", GAMES_DIR / "games.sqlite3"))
+
+# Threads running storage I/O and (de)serialization off the event loop
+STORAGE_IO_THREADS = int(os.environ.get("STORAGE_IO_THREADS", "4"))
+
+# Filesystem storage only: "snapshot" rewrites the whole game on every save,
+# "journal" appends the changes to a per-game journal that is compacted every
+# JOURNAL_COMPACT_EVERY records.
+STORAGE_MODE = os.environ.get("STORAGE_MODE", "snapshot")
+JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", "50"))
+
+# Filesystem storage only: with a HISTORY_RETENTION, snapshots keep the last
+# that many history and log entries of a game and move older ones,
+# HISTORY_SEGMENT_SIZE at a time, to compressed segment files in
+# GAMES_DIR/segments/, which are only read when a page of the history or the
+# story of an old scene reaches them. The default of 0 keeps every entry in the
+# game file.
+HISTORY_RETENTION = int(os.environ.get("HISTORY_RETENTION", "0"))
+HISTORY_SEGMENT_SIZE = int(os.environ.get("HISTORY_SEGMENT_SIZE", "100"))
+
+# Filesystem storage only: how game files are compressed, "none", "gzip" or
+# "zstd" (needs the zstandard package). Game files of older formats are
+# rewritten in the current one when they are first loaded.
+STORAGE_COMPRESSION = os.environ.get("STORAGE_COMPRESSION", "none")
+
+# Live game states kept in memory: at most CACHE_SIZE games, each for
+# CACHE_TTL seconds after its last use. In the "write-through" mode saves are
+# written right away, in the "write-behind" mode every CACHE_FLUSH_INTERVAL
+# seconds, on eviction and on shutdown.
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", "128"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "900"))
+CACHE_MODE = os.environ.get("CACHE_MODE", "write-through")
+CACHE_FLUSH_INTERVAL = float(os.environ.get("CACHE_FLUSH_INTERVAL", "5"))
+
+# Prompts for a game arriving within TURN_COALESCE_WINDOW seconds of each other,
+# or while an earlier turn is still running, are merged into one turn. 0 turns
+# merging off.
+TURN_COALESCE_WINDOW = float(os.environ.get("TURN_COALESCE_WINDOW", "0"))
+
+# "instructions" adds the story and the context of the current scene to the
+# instructions of the game master and the narrator on every step of a turn,
+# "tools" leaves getting them to the agents' tool calls.
+SCENE_CONTEXT = os.environ.get("SCENE_CONTEXT", "instructions")
+
+# Routing of the turns of the game master: "off" runs every turn on the game
+# master, "heuristic" runs turns that look like questions about the game world
+# on the narrator with the faster ROUTING_FAST_MODEL, which escalates them to
+# the game master when they change the game, see routing.py. ROUTING_RULES is
+# an optional JSON file replacing the rules of the heuristic.
+ROUTING_MODE = os.environ.get("ROUTING_MODE", "off")
+ROUTING_FAST_MODEL = os.environ.get("ROUTING_FAST_MODEL", "gpt-4o-mini")
+ROUTING_RULES = (
+    Path(os.environ["ROUTING_RULES"]) if os.environ.get("ROUTING_RULES") else None
+)
+
+# Game creation jobs running at the same time, more are queued
+CREATE_GAME_WORKERS = int(os.environ.get("CREATE_GAME_WORKERS", "2"))
+
+# Adventures kept ready for new games: ADVENTURE_POOL_SIZE for each of the
+# worlds in ADVENTURE_POOL_WORLDS, comma separated settings with ":mature" for
+# mature themes, generated ADVENTURE_POOL_REFILL_WORKERS at a time. A size of 0
+# turns the pool off.
+ADVENTURE_POOL_SIZE = int(os.environ.get("ADVENTURE_POOL_SIZE", "0"))
+ADVENTURE_POOL_WORLDS = os.environ.get("ADVENTURE_POOL_WORLDS", "fantasy,dark fantasy")
+ADVENTURE_POOL_REFILL_WORKERS = int(os.environ.get("ADVENTURE_POOL_REFILL_WORKERS", "1"))
+
+# The encounters of a new game are simulated ENCOUNTER_SIMULATION_FIGHTS times
+# against the player before play: "score" (default) logs how often the player
+# wins them, "rebalance" also makes the enemies of the encounters won less than
+# ENCOUNTER_MIN_WIN_PROBABILITY of the time easier to hit and scales down their
+# health, and "off" skips it.
+ENCOUNTER_BALANCE = os.environ.get("ENCOUNTER_BALANCE", "score")
+ENCOUNTER_MIN_WIN_PROBABILITY = float(os.environ.get("ENCOUNTER_MIN_WIN_PROBABILITY", "0.6"))
+ENCOUNTER_SIMULATION_FIGHTS = int(os.environ.get("ENCOUNTER_SIMULATION_FIGHTS", "2000"))
+# Log the simulated results of every encounter, "on" or "off"
+ENCOUNTER_LOG = os.environ.get("ENCOUNTER_LOG", "on")
+
+# Story memory returned by the get_story tool: the summaries of closed scenes
+# and chapters and the last STORY_RECENT_ENTRIES log entries of the current
+# scene, within STORY_TOKEN_BUDGET tokens. Summaries are written by the
+# summarizer agent with STORY_SUMMARIZER=agent, or by shortening the log with
+# STORY_SUMMARIZER=extractive.
+STORY_TOKEN_BUDGET = int(os.environ.get("STORY_TOKEN_BUDGET", "2000"))
+STORY_RECENT_ENTRIES = int(os.environ.get("STORY_RECENT_ENTRIES", "20"))
+STORY_SUMMARIZER = os.environ.get("STORY_SUMMARIZER", "agent")
+
+# Where the agents' models answer from: "live" for the OpenAI models, "record"
+# to also append their responses to the cassette MODEL_CASSETTE, "replay" to
+# answer from the cassette and "scripted" from the script MODEL_SCRIPT, see
+# models.py. Offline models take MODEL_LATENCY seconds plus
+# MODEL_LATENCY_PER_TOKEN seconds per output token to answer.
+MODEL_MODE = os.environ.get("MODEL_MODE", "live")
+MODEL_CASSETTE = Path(os.environ.get("MODEL_CASSETTE", "cassettes/session.jsonl"))
+MODEL_SCRIPT = Path(
+    os.environ.get(
+        "MODEL_SCRIPT", Path(__file__).parent / "model_scripts" / "offline.json"
+    )
+)
+MODEL_LATENCY = float(os.environ.get("MODEL_LATENCY", "0"))
+MODEL_LATENCY_PER_TOKEN = float(os.environ.get("MODEL_LATENCY_PER_TOKEN", "0"))
+
+# Logging of the tool calls, to stderr: every call with its arguments and
+# result at TOOL_LOG_LEVEL=debug, a TOOL_LOG_SAMPLE_RATE share of the calls
+# with the result cut to TOOL_LOG_MAX_CHARS at info, and only the failed calls
+# at error. TOOL_LOG_FORMAT is "text" for key=value lines or "json".
+TOOL_LOG_LEVEL = os.environ.get("TOOL_LOG_LEVEL", "info")
+TOOL_LOG_FORMAT = os.environ.get("TOOL_LOG_FORMAT", "text")
+TOOL_LOG_MAX_CHARS = int(os.environ.get("TOOL_LOG_MAX_CHARS", "200"))
+TOOL_LOG_SAMPLE_RATE = float(os.environ.get("TOOL_LOG_SAMPLE_RATE", "1.0"))
+# Answer repeated calls of the tools reading the game state within a turn from
+# a cache, "on" or "off"
+TOOL_CACHE = os.environ.get("TOOL_CACHE", "on")
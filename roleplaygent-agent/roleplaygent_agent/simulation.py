@@ -0,0 +1,293 @@
+"""Monte Carlo simulation of the encounters of an adventure.
+
+Plays thousands of fights of the player against the enemies of an encounter at
+once, with the rules of rules.py vectorized in NumPy: everyone rolls
+initiative, 1d6 + AGI, once, then acts in that order every round, the player
+attacking the first enemy still standing and the enemies the player, with a
+die plus the higher of STR and AGI against the defense of the target, 10 + AGI,
+dealing a damage roll on a hit. Characters start with their health, or
+10 + END × 2 if they have none. A fight ends when the player or all enemies
+have no health left, or after `max_rounds` rounds.
+
+`balance_adventure` simulates every encounter of a new adventure against the
+player before play and rebalances the ones the player would win too rarely:
+the enemies the player could rarely hit are made less agile, and the health of
+the enemies is scaled down.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from . import rules
+from .types import Adventure, Attributes, Enemy
+
+
+# A fight not decided after MAX_ROUNDS rounds is not won
+MAX_ROUNDS = 30
+BATCH_SIZE = 8192
+
+# The range and steps of the bisection on the health of the enemies when
+# rebalancing, and how many times fewer fights it simulates
+MIN_HEALTH_SCALE = 0.05
+REBALANCE_STEPS = 6
+SEARCH_FIGHTS_DIVISOR = 4
+# The lowest attack roll the player has to hit enemies with after rebalancing,
+# a third of the rolls of a d6
+HIT_ROLL = rules.ATTACK_DIE - 1
+
+
+class EncounterStats(BaseModel):
+    fights: int = Field(description="The number of fights simulated")
+    win_probability: float = Field(description="The share of fights the player won")
+    timeout_probability: float = Field(
+        description="The share of fights still undecided after the last round"
+    )
+    expected_rounds: float = Field(description="The mean number of rounds of a fight")
+    expected_hp_loss: float = Field(description="The mean health the player lost in a fight")
+    hp_loss_ratio: float = Field(
+        description="The mean share of the player's starting health lost in a fight"
+    )
+
+
+class EncounterScore(BaseModel):
+    act: int = Field(description="The number of the act of the encounter, from 1")
+    chapter: int = Field(description="The number of the chapter of the encounter, from 1")
+    scene: int = Field(description="The number of the scene of the encounter, from 1")
+    title: str = Field(description="The title of the encounter")
+    health_scale: float = Field(
+        description="The factor the health of the enemies was scaled by", default=1.0
+    )
+    agility_lowered: bool = Field(
+        description="Whether enemies were made less agile, for the player to hit them",
+        default=False,
+    )
+    stats: EncounterStats = Field(description="The simulated fights, after rebalancing")
+
+
+def start_health(character: Attributes) -> int:
+    return character.health if character.health > 0 else rules.max_health(character)
+
+
+def _simulate_batch(
+    player: Attributes,
+    enemies: Sequence[Attributes],
+    enemy_health: np.ndarray,
+    max_rounds: int,
+    rng: np.random.Generator,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Play a fight for every row of the starting health of the enemies.
+
+    Returns the won, timed out, rounds and health lost of each fight.
+    """
+    size = len(enemy_health)
+    combatants = [player, *enemies]
+    count = len(combatants)
+    agility = np.array([c.agility for c in combatants], dtype=np.int32)
+    attack = np.array([max(c.strength, c.agility) for c in combatants], dtype=np.int32)
+    enemy_defense = np.array([rules.defense(enemy) for enemy in enemies])
+    player_defense = rules.defense(player)
+    starting_health = start_health(player)
+
+    # Participant 0 is the player. Ties go to the higher agility, then to the
+    # order of the participants, like `rules.roll_initiative`.
+    initiative = rng.integers(1, rules.INITIATIVE_DIE + 1, size=(size, count), dtype=np.int32) + agility
+    order = np.lexsort((np.broadcast_to(-agility, (size, count)), -initiative))
+    player_acts = order == 0
+    acting_enemy = np.maximum(order - 1, 0)
+    slot_attack = attack[order]
+
+    player_health = np.full(size, starting_health, dtype=np.int32)
+    enemy_health = enemy_health.copy()
+    won = np.zeros(size, dtype=bool)
+    timed_out = np.zeros(size, dtype=bool)
+    rounds = np.full(size, max_rounds)
+    final_health = np.zeros(size, dtype=np.int64)
+
+    # The fights still going on, only those are played in the next round
+    fights = np.arange(size)
+    for round in range(1, max_rounds + 1):
+        rows = np.arange(len(fights))
+        attack_rolls = rng.integers(1, rules.ATTACK_DIE + 1, size=(len(fights), count), dtype=np.int32)
+        attack_rolls += slot_attack
+        damage_rolls = rng.integers(1, rules.DAMAGE_DIE + 1, size=(len(fights), count), dtype=np.int32)
+        for slot in range(count):
+            enemy_alive = enemy_health[rows, acting_enemy[:, slot]] > 0
+            enemy_hits = (
+                ~player_acts[:, slot]
+                & enemy_alive
+                & (player_health > 0)
+                & (attack_rolls[:, slot] >= player_defense)
+            )
+            player_health -= np.where(enemy_hits, damage_rolls[:, slot], 0)
+
+            attacking = np.flatnonzero(player_acts[:, slot] & (player_health > 0))
+            standing = enemy_health[attacking] > 0
+            target = standing.argmax(axis=1)
+            hits = standing[np.arange(len(attacking)), target] & (
+                attack_rolls[attacking, slot] >= enemy_defense[target]
+            )
+            enemy_health[attacking[hits], target[hits]] -= damage_rolls[attacking[hits], slot]
+
+        ended = (player_health <= 0) | (enemy_health <= 0).all(axis=1)
+        done = fights[ended]
+        rounds[done] = round
+        won[done] = player_health[ended] > 0
+        final_health[done] = player_health[ended]
+        going_on = ~ended
+        fights = fights[going_on]
+        player_health = player_health[going_on]
+        if not len(fights):
+            break
+        enemy_health = enemy_health[going_on]
+        player_acts = player_acts[going_on]
+        acting_enemy = acting_enemy[going_on]
+        slot_attack = slot_attack[going_on]
+
+    timed_out[fights] = True
+    final_health[fights] = player_health
+    hp_loss = starting_health - np.maximum(final_health, 0)
+    return won, timed_out, rounds, hp_loss
+
+
+def simulate_encounter(
+    player: Attributes,
+    enemies: Sequence[Attributes],
+    fights: int = 2000,
+    max_rounds: int = MAX_ROUNDS,
+    seed: Optional[int] = None,
+) -> EncounterStats:
+    """Simulate `fights` fights of the player against the enemies, see the module docstring."""
+    if fights <= 0:
+        raise ValueError("At least one fight has to be simulated")
+    rng = np.random.default_rng(seed)
+    wins = timeouts = rounds = hp_loss = 0
+    for start in range(0, fights, BATCH_SIZE):
+        size = min(BATCH_SIZE, fights - start)
+        health = np.array([start_health(enemy) for enemy in enemies], dtype=np.int32)
+        enemy_health = np.tile(health, (size, 1))
+        won, timed_out, batch_rounds, batch_hp_loss = _simulate_batch(
+            player, enemies, enemy_health, max_rounds, rng
+        )
+        wins += int(won.sum())
+        timeouts += int(timed_out.sum())
+        rounds += int(batch_rounds.sum())
+        hp_loss += int(batch_hp_loss.sum())
+    return EncounterStats(
+        fights=fights,
+        win_probability=wins / fights,
+        timeout_probability=timeouts / fights,
+        expected_rounds=rounds / fights,
+        expected_hp_loss=hp_loss / fights,
+        hp_loss_ratio=hp_loss / fights / start_health(player),
+    )
+
+
+def scale_health(enemies: Sequence[Enemy], scale: float) -> list[Enemy]:
+    return [
+        enemy.model_copy(update={"health": max(1, round(start_health(enemy) * scale))})
+        for enemy in enemies
+    ]
+
+
+def hittable_agility(player: Attributes) -> int:
+    """The highest agility of an enemy the player hits with an attack roll of HIT_ROLL."""
+    attack = HIT_ROLL + max(player.strength, player.agility)
+    return max(attack - (rules.defense(player) - player.agility), 0)
+
+
+def rebalance_encounter(
+    player: Attributes,
+    enemies: Sequence[Enemy],
+    min_win_probability: float,
+    fights: int = 2000,
+    seed: int = 0,
+) -> tuple[list[Enemy], float, EncounterStats]:
+    """Make an encounter winnable often enough, the enemies, health scale and stats.
+
+    Enemies too agile for the player to hit often get the highest agility the
+    player hits with an attack roll of HIT_ROLL, then the health of the enemies is scaled down as little as
+    needed. Every scale is simulated with the same seed, so that the win
+    probability only changes with the scale. If even the lowest scale is won
+    too rarely, it is returned anyway.
+    """
+    enemies = list(enemies)
+    stats = simulate_encounter(player, enemies, fights, seed=seed)
+    if stats.win_probability >= min_win_probability:
+        return enemies, 1.0, stats
+    max_agility = hittable_agility(player)
+    enemies = [
+        enemy.model_copy(update={"agility": max_agility}) if enemy.agility > max_agility else enemy
+        for enemy in enemies
+    ]
+
+    # Searched with fewer fights, only the scale found is simulated with all
+    search_fights = max(fights // SEARCH_FIGHTS_DIVISOR, 1)
+
+    def winnable(scale: float) -> bool:
+        stats = simulate_encounter(player, scale_health(enemies, scale), search_fights, seed=seed)
+        return stats.win_probability >= min_win_probability
+
+    scale = 1.0
+    if not winnable(scale):
+        low, high = MIN_HEALTH_SCALE, 1.0
+        for _ in range(REBALANCE_STEPS):
+            middle = (low + high) / 2
+            if winnable(middle):
+                low = middle
+            else:
+                high = middle
+        scale = low
+    enemies = scale_health(enemies, scale)
+    return enemies, scale, simulate_encounter(player, enemies, fights, seed=seed)
+
+
+def balance_adventure(
+    adventure: Adventure,
+    player: Attributes,
+    rebalance: bool = True,
+    min_win_probability: float = 0.6,
+    fights: int = 2000,
+    verbose: bool = False,
+) -> list[EncounterScore]:
+    """Score the encounters of an adventure, and rebalance the ones won too rarely.
+
+    With `verbose`, the score of every encounter is logged.
+    """
+    scores = []
+    for act_idx, act in enumerate(adventure.acts):
+        for chapter_idx, chapter in enumerate(act.chapters):
+            for scene_idx, scene in enumerate(chapter.scenes):
+                if not scene.encounter or not scene.enemies:
+                    continue
+                agility = [enemy.agility for enemy in scene.enemies]
+                if rebalance:
+                    scene.enemies, scale, stats = rebalance_encounter(
+                        player, scene.enemies, min_win_probability, fights
+                    )
+                else:
+                    scale, stats = 1.0, simulate_encounter(player, scene.enemies, fights, seed=0)
+                scores.append(
+                    EncounterScore(
+                        act=act_idx + 1,
+                        chapter=chapter_idx + 1,
+                        scene=scene_idx + 1,
+                        title=scene.title,
+                        health_scale=round(scale, 3),
+                        agility_lowered=agility != [enemy.agility for enemy in scene.enemies],
+                        stats=stats,
+                    )
+                )
+    for score in scores if verbose else []:
+        rebalanced = ""
+        if score.agility_lowered:
+            rebalanced += ", enemy agility lowered"
+        if score.health_scale < 1:
+            rebalanced += f", enemy health scaled by {score.health_scale}"
+        print(
+            f"[balance_adventure] {score.title!r}: won {score.stats.win_probability:.0%} "
+            f"in {score.stats.expected_rounds:.1f} rounds, losing "
+            f"{score.stats.expected_hp_loss:.1f} health{rebalanced}"
+        )
+    return scores
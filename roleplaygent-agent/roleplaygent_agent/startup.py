@@ -0,0 +1,152 @@
+"""Warming up the API after a cold start.
+
+The machines of the API are stopped when idle, so many sessions begin with a
+cold start. Most of it is spent importing the Agents SDK, building the agents
+with their tool schemas and initializing Sentry, which the endpoints reading
+and listing games do not need. So the API starts serving without them, and the
+`WarmUp` runs them in the background in its steps:
+
+- "sentry": initialize Sentry, if SENTRY_DSN is set.
+- "agents": import the SDK and build the agents.
+- "pool": load and fill up the adventure pool.
+- "jobs": resume the game creation jobs.
+
+The endpoints running or reporting on the agents wait for it, and `GET /readyz`
+only reports ready once it is done. With STARTUP_WARM_UP=eager the lifespan
+waits for it instead, before the API starts serving.
+"""
+
+import asyncio
+import functools
+import time
+from typing import Awaitable, Callable, Optional
+
+from . import settings
+
+
+# When the API was imported, for the time to ready
+IMPORTED = time.perf_counter()
+
+
+def init_sentry() -> None:
+    if not settings.SENTRY_DSN:
+        return
+    import sentry_sdk
+    from sentry_sdk.integrations.openai_agents import OpenAIAgentsIntegration
+
+    sentry_sdk.init(
+        dsn=settings.SENTRY_DSN,
+        # Add data like request headers and IP for users,
+        # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
+        send_default_pii=True,
+        # Set traces_sample_rate to 1.0 to capture 100%
+        # of transactions for tracing.
+        traces_sample_rate=1.0,
+        # Set profile_session_sample_rate to 1.0 to profile 100%
+        # of profile sessions.
+        profile_session_sample_rate=1.0,
+        # Set profile_lifecycle to "trace" to automatically
+        # run the profiler on when there is an active transaction
+        profile_lifecycle="trace",
+        integrations=[
+            OpenAIAgentsIntegration(),
+        ],
+    )
+
+
+def build_agents() -> None:
+    """Build the agents the turns and game creation run, with their tools."""
+    from .agents.adventure_generator import get_agent as get_adventure_generator_agent
+    from .agents.game_master import get_agent as get_game_master_agent
+    from .agents.narrator import get_agent as get_narrator_agent
+    from .agents.summarizer import get_agent as get_summarizer_agent
+    from . import agent, jobs  # noqa: F401
+
+    get_game_master_agent()
+    get_narrator_agent()
+    get_adventure_generator_agent()
+    get_summarizer_agent()
+
+
+async def start_pool() -> None:
+    from .pool import get_adventure_pool
+
+    await get_adventure_pool().start()
+
+
+async def resume_jobs() -> None:
+    from .jobs import get_create_game_jobs
+
+    await get_create_game_jobs().resume()
+
+
+class WarmUp:
+    """Runs the warm up steps one after another, see the module docstring."""
+
+    def __init__(self, steps: list[tuple[str, Callable[[], Awaitable[None]]]]):
+        self.steps = steps
+        self.seconds: dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            for name, step in self.steps:
+                started = time.perf_counter()
+                await step()
+                self.seconds[name] = round(time.perf_counter() - started, 4)
+        except Exception as e:
+            self.error = str(e)
+            print(f"[WarmUp] Warming up failed: {e}")
+            raise
+        self.ready_seconds = round(time.perf_counter() - IMPORTED, 4)
+        print(f"[WarmUp] Ready {self.ready_seconds:.2f}s after import: {self.seconds}")
+
+    async def wait(self) -> None:
+        """Wait until the API is warm, raises if warming up failed."""
+        self.start()
+        await asyncio.shield(self._task)
+
+    async def close(self) -> None:
+        """Stop warming up, and the pool and jobs if they were started."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if "jobs" in self.seconds:
+            from .jobs import get_create_game_jobs
+
+            await get_create_game_jobs().close()
+        if "pool" in self.seconds:
+            from .pool import get_adventure_pool
+
+            await get_adventure_pool().close()
+
+    def info(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "mode": settings.STARTUP_WARM_UP,
+            "steps_seconds": self.seconds,
+            "ready_seconds": self.ready_seconds,
+        }
+
+
+@functools.cache
+def get_warm_up() -> WarmUp:
+    return WarmUp(
+        [
+            ("sentry", lambda: asyncio.to_thread(init_sentry)),
+            ("agents", lambda: asyncio.to_thread(build_agents)),
+            ("pool", start_pool),
+            ("jobs", resume_jobs),
+        ]
+    )
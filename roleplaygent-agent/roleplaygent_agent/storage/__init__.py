@@ -0,0 +1,47 @@
+import functools
+
+from .. import settings
+from .base import GameStore, StorageCursor
+from .cache import GameCache
+from .filesystem import FileSystemGameStore
+from .sqlite import SQLiteGameStore
+
+
+@functools.cache
+def get_store() -> GameStore:
+    """The game store configured by the STORAGE_BACKEND setting."""
+    if settings.STORAGE_BACKEND == "sqlite":
+        return SQLiteGameStore(settings.SQLITE_PATH)
+    if settings.STORAGE_BACKEND == "filesystem":
+        return FileSystemGameStore(
+            settings.GAMES_DIR,
+            mode=settings.STORAGE_MODE,
+            compact_every=settings.JOURNAL_COMPACT_EVERY,
+            retention=settings.HISTORY_RETENTION,
+            segment_size=settings.HISTORY_SEGMENT_SIZE,
+            compression=settings.STORAGE_COMPRESSION,
+        )
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+
+
+@functools.cache
+def get_cache() -> GameCache:
+    """The cache of live game states in front of the game store."""
+    return GameCache(
+        get_store(),
+        max_size=settings.CACHE_SIZE,
+        ttl=settings.CACHE_TTL,
+        mode=settings.CACHE_MODE,
+        flush_interval=settings.CACHE_FLUSH_INTERVAL,
+    )
+
+
+__all__ = [
+    "GameCache",
+    "GameStore",
+    "StorageCursor",
+    "FileSystemGameStore",
+    "SQLiteGameStore",
+    "get_cache",
+    "get_store",
+]
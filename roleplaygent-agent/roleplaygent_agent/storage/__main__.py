@@ -0,0 +1,32 @@
+"""Maintenance commands for the configured game store.
+
+    python -m roleplaygent_agent.storage rebuild
+        Rebuild the game listing index from the stored games.
+
+    python -m roleplaygent_agent.storage compact [game_id ...]
+        Compact the storage of the given games, or of all games.
+"""
+
+import sys
+
+from . import get_store
+
+
+def main(args: list[str]) -> int:
+    store = get_store()
+    if args[:1] == ["rebuild"] and len(args) == 1:
+        print(f"Indexed {store.rebuild_index()} games")
+        return 0
+    if args[:1] == ["compact"]:
+        if len(args) > 1:
+            compacted = sum(store.compact(game_id) for game_id in args[1:])
+        else:
+            compacted = store.compact()
+        print(f"Compacted {compacted} games")
+        return 0
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
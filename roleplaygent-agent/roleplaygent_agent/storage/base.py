@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, TypeVar
+
+from .. import settings
+from ..types import GameState, GameSummary, HistoryEntry, LogEntry
+
+
+T = TypeVar("T")
+
+
+@functools.cache
+def io_executor() -> ThreadPoolExecutor:
+    """The threads doing storage I/O and (de)serialization for the event loop."""
+    return ThreadPoolExecutor(
+        max_workers=settings.STORAGE_IO_THREADS, thread_name_prefix="storage-io"
+    )
+
+
+async def run_io(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking storage function in the I/O threads."""
+    return await asyncio.get_running_loop().run_in_executor(
+        io_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write a file by replacing it, so readers never see a partial write."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class StorageCursor:
+    """What of a game state a store has already persisted.
+
+    The history and log counts include the entries moved to segments.
+    """
+
+    history: int
+    log: int
+    summaries: int
+    current_scene: str
+    player: str
+    is_running: bool
+    version: int
+    records: int = 0
+
+    @classmethod
+    def of(cls, game_state: GameState, records: int = 0) -> "StorageCursor":
+        return cls(
+            history=game_state.history_length(),
+            log=game_state.archived("log") + game_state.entries_length("log"),
+            summaries=len(game_state.summaries),
+            current_scene=game_state.current_scene.model_dump_json(),
+            player=game_state.player.model_dump_json(),
+            is_running=game_state.is_running,
+            version=game_state.version,
+            records=records,
+        )
+
+
+class GameStore(ABC):
+    """Where game states are persisted.
+
+    The blocking methods have `a`-prefixed counterparts for the event loop,
+    which run them in the storage I/O threads.
+    """
+
+    # Whether `load_history` and `load_log` read pages without loading the
+    # whole game, otherwise pages are cut from the loaded game state
+    supports_paging = False
+
+    @abstractmethod
+    def save(self, game_state: GameState) -> None:
+        """Persist a game state."""
+
+    @abstractmethod
+    def load(self, game_id: str) -> Optional[GameState]:
+        """Load a game state, or None if there is no game with that id."""
+
+    @abstractmethod
+    def list_games(self, running_only: bool = True) -> List[GameSummary]:
+        """List the summaries of the stored games, most recently updated first."""
+
+    def load_history(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[HistoryEntry]]:
+        """Load the history entries of a game older than `before`, oldest first."""
+        game_state = self.load(game_id)
+        if game_state is None:
+            return None
+        return entries_window(game_state, "history", before, limit)[0]
+
+    def load_log(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[LogEntry]]:
+        """Load the log entries of a game older than `before`, oldest first."""
+        game_state = self.load(game_id)
+        if game_state is None:
+            return None
+        return entries_window(game_state, "log", before, limit)[0]
+
+    def rebuild_index(self) -> int:
+        """Rebuild the listing index from the stored games, return their number."""
+        return len(self.list_games(running_only=False))
+
+    def compact(self, game_id: Optional[str] = None) -> int:
+        """Compact the storage of a game or all games, return how many were compacted."""
+        return 0
+
+    async def asave(self, game_state: GameState) -> None:
+        await run_io(self.save, game_state)
+
+    async def aload(self, game_id: str) -> Optional[GameState]:
+        return await run_io(self.load, game_id)
+
+    async def alist_games(self, running_only: bool = True) -> List[GameSummary]:
+        return await run_io(self.list_games, running_only)
+
+    async def aload_history(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[HistoryEntry]]:
+        return await run_io(self.load_history, game_id, before, limit)
+
+    async def aload_log(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[LogEntry]]:
+        return await run_io(self.load_log, game_id, before, limit)
+
+
+def window_entries(
+    entries: list, before: Optional[str] = None, limit: Optional[int] = None
+) -> list:
+    """The last `limit` entries with a timestamp before `before`, oldest first."""
+    if before is not None:
+        entries = [entry for entry in entries if entry.timestamp < before]
+    if limit is not None:
+        entries = entries[-limit:] if limit > 0 else []
+    return entries
+
+
+def entries_window(
+    game_state: GameState,
+    kind: str,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> tuple[list, bool]:
+    """The window of the history or log entries of a game state, see `window_entries`.
+
+    Also returns whether there are older entries. Segments are only read as
+    far as the window reaches into them.
+    """
+    if game_state._archive is not None and game_state.archived(kind):
+        return game_state._archive.window(game_state, kind, before, limit)
+    entries = getattr(game_state, kind)
+    window = window_entries(entries, before, limit)
+    return window, bool(window) and window[0] is not entries[0]
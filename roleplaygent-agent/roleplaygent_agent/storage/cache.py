@@ -0,0 +1,280 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from ..types import GameState
+from .base import GameStore
+
+
+@dataclass
+class CacheEntry:
+    game_state: GameState
+    last_access: float = field(default_factory=time.monotonic)
+    dirty: bool = False
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    flushes: int = 0
+    flush_errors: int = 0
+
+
+class GameCache:
+    """Keeps recently used game states in memory in front of a game store.
+
+    Holds at most `max_size` game states and drops the least recently used
+    one beyond that, as well as every game state not used for `ttl` seconds.
+    In the "write-through" mode a save is passed to the store right away, in
+    the "write-behind" mode the game state is only marked dirty and written by
+    `flush`, which runs every `flush_interval` seconds in `run_flusher`, when a
+    dirty game state is evicted and on `close`. Evicted dirty game states stay
+    in `_flushing` until they are written, and a lookup meanwhile takes them
+    back, so that it never loads an older game state from the store.
+
+    The `a`-prefixed methods are for the event loop, they do the store I/O in
+    the storage I/O threads. The lock only guards the entries and is never held
+    during I/O.
+    """
+
+    def __init__(
+        self,
+        store: GameStore,
+        max_size: int = 128,
+        ttl: float = 900.0,
+        mode: str = "write-through",
+        flush_interval: float = 5.0,
+    ):
+        if mode not in ("write-through", "write-behind"):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.RLock()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._flushing: dict[str, CacheEntry] = {}
+
+    def _entry(self, game_id: str) -> Optional[CacheEntry]:
+        """The entry of a game, taking it back if it is evicted but not written yet."""
+        with self._lock:
+            entry = self._entries.get(game_id)
+            if entry is None:
+                entry = self._flushing.get(game_id)
+                if entry is not None:
+                    self._entries[game_id] = entry
+            return entry
+
+    def _evicted(self, entry: CacheEntry) -> Optional[CacheEntry]:
+        """Keep an evicted entry until it is written, if it is dirty."""
+        self.stats.evictions += 1
+        if not entry.dirty:
+            return None
+        self._flushing[entry.game_state.id] = entry
+        return entry
+
+    def _lookup(self, game_id: str) -> Optional[GameState]:
+        with self._lock:
+            entry = self._entry(game_id)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(game_id)
+            return entry.game_state
+
+    def _admit(
+        self, game_state: GameState, dirty: bool = False
+    ) -> tuple[GameState, List[CacheEntry]]:
+        """Insert or touch the entry of a game state.
+
+        Returns the live game state, which is the already cached one if another
+        load of the same game finished first, and the evicted dirty entries
+        that still have to be flushed.
+        """
+        with self._lock:
+            entry = self._entry(game_state.id)
+            if entry is None or (dirty and entry.game_state is not game_state):
+                entry = CacheEntry(game_state)
+                self._entries[game_state.id] = entry
+            entry.last_access = time.monotonic()
+            entry.dirty = entry.dirty or dirty
+            self._entries.move_to_end(game_state.id)
+
+            evicted = []
+            while len(self._entries) > self.max_size:
+                _, oldest = self._entries.popitem(last=False)
+                if self._evicted(oldest) is not None:
+                    evicted.append(oldest)
+            return entry.game_state, evicted
+
+    def _take_dirty(self, entries: Optional[List[CacheEntry]] = None) -> List[CacheEntry]:
+        # Marked clean before writing, so that a save while writing marks the
+        # entry dirty again
+        with self._lock:
+            if entries is None:
+                entries = list(self._entries.values())
+            dirty = [entry for entry in entries if entry.dirty]
+            for entry in dirty:
+                entry.dirty = False
+            return dirty
+
+    def _flushed(self, entry: CacheEntry, error: Optional[Exception]) -> bool:
+        with self._lock:
+            if self._flushing.get(entry.game_state.id) is entry:
+                del self._flushing[entry.game_state.id]
+            if error is None:
+                self.stats.flushes += 1
+                return True
+            entry.dirty = True
+            self.stats.flush_errors += 1
+            # Keep evicted game states around until they are written
+            self._entries.setdefault(entry.game_state.id, entry)
+        print(f"[GameCache] Error flushing game {entry.game_state.id}: {error}")
+        return False
+
+    def _flush_entries(self, entries: List[CacheEntry]) -> int:
+        flushed = 0
+        for entry in self._take_dirty(entries):
+            try:
+                self.store.save(entry.game_state)
+                error = None
+            except Exception as e:
+                error = e
+            flushed += self._flushed(entry, error)
+        return flushed
+
+    async def _aflush_entries(self, entries: List[CacheEntry]) -> int:
+        flushed = 0
+        for entry in self._take_dirty(entries):
+            try:
+                await self.store.asave(entry.game_state)
+                error = None
+            except Exception as e:
+                error = e
+            flushed += self._flushed(entry, error)
+        return flushed
+
+    def get(self, game_id: str) -> Optional[GameState]:
+        """Get a game state from the cache, loading it from the store on a miss."""
+        game_state = self._lookup(game_id)
+        if game_state is not None:
+            return game_state
+        game_state = self.store.load(game_id)
+        if game_state is None:
+            return None
+        game_state, evicted = self._admit(game_state)
+        self._flush_entries(evicted)
+        return game_state
+
+    async def aget(self, game_id: str) -> Optional[GameState]:
+        """Get a game state from the cache, loading it from the store on a miss.
+
+        Concurrent misses for the same game share a single load.
+        """
+        game_state = self._lookup(game_id)
+        if game_state is not None:
+            return game_state
+
+        loading = self._loading.get(game_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self.store.aload(game_id))
+            self._loading[game_id] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(game_id, None))
+        game_state = await asyncio.shield(loading)
+        if game_state is None:
+            return None
+        game_state, evicted = self._admit(game_state)
+        await self._aflush_entries(evicted)
+        return game_state
+
+    def put(self, game_state: GameState) -> None:
+        """Save a game state through the cache."""
+        _, evicted = self._admit(game_state, dirty=True)
+        self._flush_entries(evicted)
+        if self.mode == "write-through":
+            self.flush_game(game_state.id)
+
+    async def aput(self, game_state: GameState) -> None:
+        """Save a game state through the cache."""
+        _, evicted = self._admit(game_state, dirty=True)
+        await self._aflush_entries(evicted)
+        if self.mode == "write-through":
+            await self.aflush_game(game_state.id)
+
+    def _entries_of(self, game_id: str) -> List[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(game_id)
+            return [entry] if entry is not None else []
+
+    def flush_game(self, game_id: str) -> int:
+        """Write a game state to the store if it is dirty."""
+        return self._flush_entries(self._entries_of(game_id))
+
+    async def aflush_game(self, game_id: str) -> int:
+        """Write a game state to the store if it is dirty."""
+        return await self._aflush_entries(self._entries_of(game_id))
+
+    def flush(self) -> int:
+        """Write all dirty game states to the store, return how many were written."""
+        return self._flush_entries(None)
+
+    async def aflush(self) -> int:
+        """Write all dirty game states to the store, return how many were written."""
+        return await self._aflush_entries(None)
+
+    def _take_expired(self) -> List[CacheEntry]:
+        with self._lock:
+            deadline = time.monotonic() - self.ttl
+            expired = [
+                game_id
+                for game_id, entry in self._entries.items()
+                if entry.last_access < deadline
+            ]
+            entries = [self._entries.pop(game_id) for game_id in expired]
+            for entry in entries:
+                self._evicted(entry)
+            return entries
+
+    async def aevict_expired(self) -> int:
+        """Drop the game states not used within the TTL, flushing dirty ones."""
+        expired = self._take_expired()
+        await self._aflush_entries(expired)
+        return len(expired)
+
+    async def run_flusher(self) -> None:
+        """Periodically flush dirty and evict expired game states until cancelled."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.aflush()
+            await self.aevict_expired()
+
+    def close(self) -> None:
+        """Flush all dirty game states, to be called on shutdown."""
+        flushed = self.flush()
+        print(f"[GameCache] Flushed {flushed} games on shutdown")
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "dirty": sum(entry.dirty for entry in self._entries.values()),
+                "flushing": len(self._flushing),
+                "loading": len(self._loading),
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "evictions": self.stats.evictions,
+                "flushes": self.stats.flushes,
+                "flush_errors": self.stats.flush_errors,
+            }
@@ -0,0 +1,119 @@
+"""Catalog of saved games.
+
+Every save writes a small summary file to `<games_dir>/catalog/`, so that
+listing games only needs to read the summaries instead of validating every
+full game state.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from ..types import GameState, GameSummary
+from .journal import load_game_state, write_atomic
+
+
+def catalog_dir(games_dir: Path) -> Path:
+    return games_dir / "catalog"
+
+
+def marker_file(games_dir: Path) -> Path:
+    """Written once the catalog was built from the game files.
+
+    Saves create the catalog directory too, so its existence does not tell
+    whether the games saved before it were added.
+    """
+    return catalog_dir(games_dir) / ".built"
+
+
+def summarize_game(
+    game_state: GameState,
+    updated_at: Optional[str] = None,
+    previous: Optional[GameSummary] = None,
+) -> GameSummary:
+    """Build the catalog entry of a game state.
+
+    The adventure never changes, so its title and description are taken from
+    the `previous` entry if there is one and the adventure was not parsed.
+    """
+    if previous is not None and game_state.raw_field("adventure") is not None:
+        title, description = previous.title, previous.description
+    else:
+        title, description = game_state.adventure.title, game_state.adventure.description
+    return GameSummary(
+        id=game_state.id,
+        title=title,
+        description=description,
+        player_name=game_state.player.name,
+        is_running=game_state.is_running,
+        act=game_state.current_scene.act,
+        chapter=game_state.current_scene.chapter,
+        scene=game_state.current_scene.scene,
+        updated_at=updated_at or datetime.now().isoformat(),
+        history_length=game_state.history_length(),
+    )
+
+
+def update_catalog(games_dir: Path, game_state: GameState) -> GameSummary:
+    """Write the catalog entry of a game state."""
+    catalog_dir(games_dir).mkdir(parents=True, exist_ok=True)
+    entry_file = catalog_dir(games_dir) / f"{game_state.id}.json"
+    previous = None
+    if game_state.raw_field("adventure") is not None and entry_file.exists():
+        previous = GameSummary.model_validate_json(entry_file.read_bytes())
+    summary = summarize_game(game_state, previous=previous)
+    write_atomic(entry_file, summary.model_dump_json().encode())
+    return summary
+
+
+def list_catalog(games_dir: Path, running_only: bool = True) -> List[GameSummary]:
+    """List the catalog entries, building the catalog first if it was never built."""
+    if not marker_file(games_dir).exists():
+        rebuild_catalog(games_dir)
+
+    summaries = []
+    for entry_file in catalog_dir(games_dir).glob("*.json"):
+        try:
+            summary = GameSummary.model_validate_json(entry_file.read_bytes())
+        except Exception as e:
+            print(f"[list_catalog] Error reading catalog entry {entry_file}: {e}")
+            continue
+        if running_only and not summary.is_running:
+            continue
+        summaries.append(summary)
+
+    summaries.sort(key=lambda summary: summary.updated_at, reverse=True)
+    return summaries
+
+
+def rebuild_catalog(games_dir: Path) -> int:
+    """Rebuild the catalog from the game files and drop entries without one."""
+    print(
+        f"[rebuild_catalog] Rebuilding catalog in {catalog_dir(games_dir).absolute()}"
+    )
+    catalog_dir(games_dir).mkdir(parents=True, exist_ok=True)
+
+    game_ids = set()
+    for game_file in games_dir.glob("*.json"):
+        try:
+            game_state = load_game_state(games_dir, game_file.stem)
+        except Exception as e:
+            print(f"[rebuild_catalog] Error loading game {game_file}: {e}")
+            continue
+
+        updated_at = datetime.fromtimestamp(game_file.stat().st_mtime).isoformat()
+        summary = summarize_game(game_state, updated_at=updated_at)
+        write_atomic(
+            catalog_dir(games_dir) / f"{game_state.id}.json",
+            summary.model_dump_json().encode(),
+        )
+        game_ids.add(game_state.id)
+
+    for entry_file in catalog_dir(games_dir).glob("*.json"):
+        if entry_file.stem not in game_ids:
+            print(f"[rebuild_catalog] Removing stale catalog entry {entry_file}")
+            entry_file.unlink()
+
+    marker_file(games_dir).touch()
+    print(f"[rebuild_catalog] Catalog contains {len(game_ids)} games")
+    return len(game_ids)
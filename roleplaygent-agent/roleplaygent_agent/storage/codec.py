@@ -0,0 +1,133 @@
+"""The format of the snapshot files of saved games.
+
+A snapshot starts with a header line, e.g.
+
+    {"format":2,"compression":"gzip","checksum":"crc32:1a2b3c4d"}
+
+followed by the body, compressed with gzip or zstd or not at all. The body is
+a JSON object without indentation, with the adventure, history and log on
+lines of their own so that loading it can leave them unparsed:
+
+    {"id":...,"player":...,"lengths":{"history":12,"log":40},
+    "adventure":{...},
+    "history":[...],
+    "log":[...]}
+
+The checksum of the uncompressed body tells a snapshot written by us from a
+damaged or edited one. Only snapshots with a matching checksum are trusted to
+be loaded lazily, others are validated whole when they are loaded.
+
+Snapshots of older versions, format 1, are the JSON of the game state without
+a header, indented by the oldest ones. They are still read, validated whole,
+and rewritten in the current format when they are first loaded by a store,
+see `journal.load_game_state`.
+"""
+
+import gzip
+import json
+import zlib
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from ..types import LAZY_FIELDS, GameState
+
+try:
+    import zstandard
+except ImportError:
+    # Optional, only needed for snapshots compressed with zstd
+    zstandard = None
+
+
+FORMAT_VERSION = 2
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+_HEADER_PREFIX = b'{"format":'
+
+
+class SnapshotHeader(BaseModel):
+    format: int = Field(description="The version of the snapshot format")
+    compression: str = Field(description="How the body is compressed, one of COMPRESSIONS")
+    checksum: str = Field(description="The checksum of the uncompressed body")
+
+
+def check_compression(compression: str) -> None:
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown snapshot compression {compression!r}, expected one of {', '.join(COMPRESSIONS)}"
+        )
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("Snapshots compressed with zstd need the zstandard package")
+
+
+def checksum(body: bytes) -> str:
+    return f"crc32:{zlib.crc32(body):08x}"
+
+
+def dump_snapshot(game_state: GameState) -> bytes:
+    """The body of the snapshot of a game state.
+
+    Fields that were not parsed since the game state was loaded are written
+    back as they were read, without serializing them again.
+    """
+    lengths = {kind: game_state.entries_length(kind) for kind in ("history", "log")}
+    header = game_state.model_dump_json(exclude=set(LAZY_FIELDS)).encode()
+    lines = [header[:-1] + b',"lengths":' + json.dumps(lengths).encode()]
+    for name in LAZY_FIELDS:
+        lines.append(b'"' + name.encode() + b'":' + game_state.dump_field_json(name))
+    return b",\n".join(lines) + b"}\n"
+
+
+def read_snapshot(body: bytes) -> tuple[dict, dict[str, bytes], dict]:
+    """Split the body of a snapshot into its other fields, the raw JSON of its lazy fields and their lengths.
+
+    Bodies in other layouts are parsed whole.
+    """
+    lines = body.rstrip().split(b"\n")
+    if len(lines) == len(LAZY_FIELDS) + 1 and lines[0].endswith(b","):
+        raw_fields = {}
+        for name, line in zip(LAZY_FIELDS, lines[1:]):
+            prefix = b'"' + name.encode() + b'":'
+            if not line.startswith(prefix):
+                break
+            # Without the comma or the closing brace of the object
+            raw_fields[name] = line[len(prefix) : -1]
+        else:
+            fields = json.loads(lines[0][:-1] + b"}")
+            return fields, raw_fields, fields.pop("lengths", {})
+    return json.loads(body), {}, {}
+
+
+def encode(game_state: GameState, compression: str = "none") -> bytes:
+    """The snapshot file of a game state."""
+    check_compression(compression)
+    body = dump_snapshot(game_state)
+    header = SnapshotHeader(
+        format=FORMAT_VERSION, compression=compression, checksum=checksum(body)
+    )
+    if compression == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    elif compression == "zstd":
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    return header.model_dump_json().encode() + b"\n" + body
+
+
+def decode(data: bytes) -> tuple[bytes, Optional[SnapshotHeader], bool]:
+    """The body of a snapshot file, its header and whether its checksum matches.
+
+    Snapshots of older versions have no header and are never trusted.
+    """
+    if not data.startswith(_HEADER_PREFIX):
+        return data, None, False
+    line, _, body = data.partition(b"\n")
+    header = SnapshotHeader.model_validate_json(line)
+    if header.format > FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot format {header.format} is newer than the supported {FORMAT_VERSION}"
+        )
+    check_compression(header.compression)
+    if header.compression == "gzip":
+        body = gzip.decompress(body)
+    elif header.compression == "zstd":
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return body, header, checksum(body) == header.checksum
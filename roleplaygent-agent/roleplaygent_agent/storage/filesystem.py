@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import List, Optional
+
+from ..types import GameState, GameSummary
+from . import catalog, codec, journal
+from .base import GameStore
+
+
+class FileSystemGameStore(GameStore):
+    """Stores every game as a JSON file in a directory.
+
+    In the "snapshot" mode every save rewrites the whole file, in the "journal"
+    mode saves append the changes to a per-game journal that is folded into the
+    file every `compact_every` records. With a `retention`, snapshots keep that
+    many of the newest history and log entries in the file and move older ones
+    to segments, see `segments.py`. Snapshots are compressed with
+    `compression`, and snapshots of older formats are rewritten in the current
+    one when they are first loaded, see `codec.py`.
+    """
+
+    def __init__(
+        self,
+        games_dir: Path,
+        mode: str = "snapshot",
+        compact_every: int = 50,
+        retention: int = 0,
+        segment_size: int = 100,
+        compression: str = "none",
+    ):
+        if mode not in ("snapshot", "journal"):
+            raise ValueError(f"Unknown storage mode: {mode}")
+        if retention > 0 and segment_size <= 0:
+            raise ValueError(f"Segments need at least one entry, not {segment_size}")
+        codec.check_compression(compression)
+        self.games_dir = Path(games_dir)
+        self.mode = mode
+        self.compact_every = compact_every
+        self.retention = retention
+        self.segment_size = segment_size
+        self.compression = compression
+
+    def save(self, game_state: GameState) -> None:
+        # Ensure games directory exists
+        self.games_dir.mkdir(parents=True, exist_ok=True)
+
+        if self.mode == "journal":
+            path = journal.journal_path(self.games_dir, game_state.id)
+            print(f"[save_game] Appending changes to {path.absolute()}")
+            journal.append_changes(
+                self.games_dir,
+                game_state,
+                self.compact_every,
+                self.retention,
+                self.segment_size,
+                self.compression,
+            )
+        else:
+            path = journal.snapshot_path(self.games_dir, game_state.id)
+            print(f"[save_game] Saving game state to {path.absolute()}")
+            journal.write_snapshot(
+                self.games_dir,
+                game_state,
+                self.retention,
+                self.segment_size,
+                self.compression,
+            )
+
+        catalog.update_catalog(self.games_dir, game_state)
+
+    def load(self, game_id: str) -> Optional[GameState]:
+        game_file = journal.snapshot_path(self.games_dir, game_id)
+        if not game_file.exists():
+            print(f"[load_game] Game file not found: {game_file.absolute()}")
+            return None
+
+        print(f"[load_game] Loading game state from {game_file.absolute()}")
+        return journal.load_game_state(self.games_dir, game_id, self.compression)
+
+    def list_games(self, running_only: bool = True) -> List[GameSummary]:
+        return catalog.list_catalog(self.games_dir, running_only=running_only)
+
+    def rebuild_index(self) -> int:
+        return catalog.rebuild_catalog(self.games_dir)
+
+    def compact(self, game_id: Optional[str] = None) -> int:
+        if game_id is not None:
+            game_ids = [game_id]
+        else:
+            game_ids = [
+                path.name.removesuffix(".journal.jsonl")
+                for path in self.games_dir.glob("*.journal.jsonl")
+            ]
+
+        compacted = 0
+        for game_id in game_ids:
+            if not journal.journal_path(self.games_dir, game_id).exists():
+                continue
+            game_state = journal.load_game_state(self.games_dir, game_id)
+            if game_state is None:
+                continue
+            print(f"[compact] Compacting journal of game {game_id}")
+            journal.write_snapshot(
+                self.games_dir,
+                game_state,
+                self.retention,
+                self.segment_size,
+                self.compression,
+            )
+            compacted += 1
+        return compacted
@@ -0,0 +1,218 @@
+"""Snapshot and journal files of saved games.
+
+A game is stored as a snapshot `<games_dir>/<id>.json`, see codec.py. In the "journal"
+storage mode, saves do not rewrite the snapshot but append the new history and
+log entries and story summaries and the changed scene, player, running state
+and version to the journal `<games_dir>/<id>.journal.jsonl`. Once the journal
+holds enough records, it is folded into a new snapshot.
+
+Journal records carry the index of history, log and summary entries, counting
+the entries moved to segments, and the full value of everything else, so
+replaying a journal over a snapshot that already contains its changes is
+harmless. Entries are only moved to segments when a snapshot is written, see
+segments.py.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+from ..types import GameState
+from . import codec
+from .base import StorageCursor, write_atomic
+from .segments import SegmentArchive, move_to_segments
+
+
+def snapshot_path(games_dir: Path, game_id: str) -> Path:
+    return games_dir / f"{game_id}.json"
+
+
+def journal_path(games_dir: Path, game_id: str) -> Path:
+    return games_dir / f"{game_id}.journal.jsonl"
+
+
+def write_snapshot(
+    games_dir: Path,
+    game_state: GameState,
+    retention: int = 0,
+    segment_size: int = 100,
+    compression: str = "none",
+) -> None:
+    """Write the full game state and drop the journal it supersedes.
+
+    With a `retention`, the oldest history and log entries beyond it are moved
+    to segments first, see `segments.move_to_segments`. The snapshot is
+    compressed with `compression`, see `codec.py`.
+    """
+    if retention > 0:
+        move_to_segments(games_dir, game_state, retention, segment_size)
+    # Taken before serializing, so that changes made meanwhile by the event
+    # loop are written again by the next save rather than never
+    cursor = StorageCursor.of(game_state)
+    write_atomic(
+        snapshot_path(games_dir, game_state.id),
+        codec.encode(game_state, compression),
+    )
+    journal_path(games_dir, game_state.id).unlink(missing_ok=True)
+    game_state._storage_cursor = cursor
+
+
+# The append-only lists of a game state, journaled entry by entry
+ENTRY_TYPES = ("history", "log", "summaries")
+
+
+def _changes(
+    game_state: GameState, cursor: StorageCursor, new_cursor: StorageCursor
+) -> list[dict]:
+    records = []
+    for kind in ENTRY_TYPES:
+        new_entries = range(getattr(cursor, kind), getattr(new_cursor, kind))
+        if not new_entries:
+            # Without parsing lists that were loaded lazily
+            continue
+        entries = getattr(game_state, kind)
+        # Entries are only moved to segments by snapshots, which the cursor is newer than
+        archived = game_state.archived(kind) if kind != "summaries" else 0
+        for index in new_entries:
+            records.append(
+                {
+                    "type": kind,
+                    "index": index,
+                    "entry": entries[index - archived].model_dump(),
+                }
+            )
+    if new_cursor.current_scene != cursor.current_scene:
+        records.append(
+            {"type": "current_scene", "value": json.loads(new_cursor.current_scene)}
+        )
+    if new_cursor.player != cursor.player:
+        records.append({"type": "player", "value": json.loads(new_cursor.player)})
+    if new_cursor.is_running != cursor.is_running:
+        records.append({"type": "is_running", "value": new_cursor.is_running})
+    if new_cursor.version != cursor.version:
+        records.append({"type": "version", "value": new_cursor.version})
+    return records
+
+
+def append_changes(
+    games_dir: Path,
+    game_state: GameState,
+    compact_every: int,
+    retention: int = 0,
+    segment_size: int = 100,
+    compression: str = "none",
+) -> None:
+    """Append what changed since the last save to the journal of the game.
+
+    Falls back to a snapshot for games without one, for game states that were
+    not loaded from or saved to disk and when the journal reaches
+    `compact_every` records.
+    """
+    cursor = game_state._storage_cursor
+    if cursor is None or not snapshot_path(games_dir, game_state.id).exists():
+        write_snapshot(games_dir, game_state, retention, segment_size, compression)
+        return
+
+    new_cursor = StorageCursor.of(game_state)
+    records = _changes(game_state, cursor, new_cursor)
+    if not records:
+        return
+
+    if cursor.records + len(records) >= compact_every:
+        print(f"[append_changes] Compacting journal of game {game_state.id}")
+        write_snapshot(games_dir, game_state, retention, segment_size, compression)
+        return
+
+    with open(journal_path(games_dir, game_state.id), "a") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+        f.flush()
+    new_cursor.records = cursor.records + len(records)
+    game_state._storage_cursor = new_cursor
+
+
+def _replay(data: dict, record: dict) -> None:
+    if record["type"] in ENTRY_TYPES:
+        entries = data.setdefault(record["type"], [])
+        archived = sum(
+            segment["count"]
+            for segment in data.get("segments", [])
+            if segment["kind"] == record["type"]
+        )
+        known = archived + len(entries)
+        if record["index"] == known:
+            entries.append(record["entry"])
+        elif record["index"] > known:
+            raise ValueError(
+                f"Journal {record['type']} entry {record['index']} is beyond "
+                f"the {known} known entries"
+            )
+    else:
+        data[record["type"]] = record["value"]
+
+
+def _read_journal(journal_file: Path) -> tuple[list[dict], bool]:
+    """The records of a journal, and whether it was read to its end."""
+    records = []
+    if journal_file.exists():
+        with open(journal_file, "r") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted append
+                    print(f"[load_game_state] Skipping broken journal record in {journal_file}")
+                    return records, False
+    return records, True
+
+
+def load_game_state(
+    games_dir: Path, game_id: str, compression: Optional[str] = None
+) -> Optional[GameState]:
+    """Load the snapshot of a game and replay its journal on top.
+
+    Snapshots with a matching checksum leave their adventure, history and log
+    to be parsed on first use, others are validated whole. With a
+    `compression`, snapshots of older formats are rewritten in the current
+    one right away.
+    """
+    game_file = snapshot_path(games_dir, game_id)
+    if not game_file.exists():
+        return None
+
+    with open(game_file, "rb") as f:
+        body, header, trusted = codec.decode(f.read())
+    if header is not None and not trusted:
+        print(f"[load_game_state] Checksum mismatch in {game_file}, validating it whole")
+    records, complete = _read_journal(journal_path(games_dir, game_id))
+
+    if not trusted and not records:
+        game_state = GameState.model_validate_json(body)
+    else:
+        if trusted:
+            data, raw_fields, lengths = codec.read_snapshot(body)
+        else:
+            data, raw_fields, lengths = json.loads(body), {}, {}
+        for record in records:
+            if record["type"] in raw_fields:
+                # Replaying changes a field, so it has to be parsed
+                data[record["type"]] = json.loads(raw_fields.pop(record["type"]))
+                lengths.pop(record["type"], None)
+            _replay(data, record)
+        if raw_fields:
+            game_state = GameState.model_validate_lazy(data, raw_fields, lengths)
+        else:
+            game_state = GameState.model_validate(data)
+    if game_state.segments:
+        game_state._archive = SegmentArchive(games_dir, game_id)
+    # After a broken journal, make the next save write a fresh snapshot
+    # instead of appending
+    game_state._storage_cursor = (
+        StorageCursor.of(game_state, len(records)) if complete else None
+    )
+
+    if compression is not None and (header is None or header.format < codec.FORMAT_VERSION):
+        print(
+            f"[load_game_state] Upgrading {game_file} to snapshot format {codec.FORMAT_VERSION}"
+        )
+        write_snapshot(games_dir, game_state, compression=compression)
+    return game_state
@@ -0,0 +1,152 @@
+"""Segments of the oldest history and log entries of saved games.
+
+A long game carries hundreds of history and log entries that are only read
+when paging back through the history or rendering the story of an old scene.
+So when a snapshot is written, the entries beyond the last `retention` of each
+kind are moved, `segment_size` at a time, to segment files
+`<games_dir>/segments/<id>/<kind>-<start>.jsonl.gz`, gzipped JSON lines that
+are never changed once written. The game state keeps the list of its segments,
+with the timestamps and scenes of their entries, and a `SegmentArchive` reads
+them only when a window of entries or the log of a scene reaches into them.
+
+Segment files are written before the snapshot that lists them, so a crash in
+between leaves a segment no snapshot refers to, which is written again by the
+next snapshot.
+"""
+
+import gzip
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from ..types import GameState, HistoryEntry, LogEntry, Segment
+from .base import write_atomic
+
+
+SEGMENT_KINDS = ("history", "log")
+ENTRY_MODELS = {"history": HistoryEntry, "log": LogEntry}
+
+
+def segments_dir(games_dir: Path, game_id: str) -> Path:
+    return games_dir / "segments" / game_id
+
+
+def segment_path(games_dir: Path, game_id: str, segment: Segment) -> Path:
+    return segments_dir(games_dir, game_id) / f"{segment.kind}-{segment.start:08d}.jsonl.gz"
+
+
+def move_to_segments(
+    games_dir: Path, game_state: GameState, retention: int, segment_size: int
+) -> int:
+    """Move full segments of the entries beyond the last `retention`, return how many entries."""
+    moved = 0
+    for kind in SEGMENT_KINDS:
+        if game_state.entries_length(kind) - retention < segment_size:
+            # Without parsing entries that were loaded lazily
+            continue
+        entries = getattr(game_state, kind)
+        while len(entries) - retention >= segment_size:
+            batch = entries[:segment_size]
+            scenes = Counter((entry.act, entry.chapter, entry.scene) for entry in batch)
+            segment = Segment(
+                kind=kind,
+                start=game_state.archived(kind),
+                count=len(batch),
+                first_timestamp=batch[0].timestamp,
+                last_timestamp=batch[-1].timestamp,
+                scenes=[[*scene, count] for scene, count in scenes.items()],
+            )
+            path = segment_path(games_dir, game_state.id, segment)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lines = "".join(entry.model_dump_json() + "\n" for entry in batch)
+            write_atomic(path, gzip.compress(lines.encode(), compresslevel=6))
+            game_state.move_to_segment(segment)
+            moved += len(batch)
+    if moved:
+        print(f"[move_to_segments] Moved {moved} entries of game {game_state.id} to segments")
+        if game_state._archive is None:
+            game_state._archive = SegmentArchive(games_dir, game_state.id)
+    return moved
+
+
+class SegmentArchive:
+    """Reads the segments of a game, keeping the last `max_cached` read."""
+
+    def __init__(self, games_dir: Path, game_id: str, max_cached: int = 4):
+        self.games_dir = Path(games_dir)
+        self.game_id = game_id
+        self.max_cached = max_cached
+        self.reads = 0
+        self._cached: OrderedDict[tuple[str, int], list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, segment: Segment) -> list:
+        key = (segment.kind, segment.start)
+        with self._lock:
+            if key in self._cached:
+                self._cached.move_to_end(key)
+                return self._cached[key]
+        path = segment_path(self.games_dir, self.game_id, segment)
+        print(f"[SegmentArchive] Reading segment {path}")
+        model = ENTRY_MODELS[segment.kind]
+        with gzip.open(path, "rb") as f:
+            entries = [model.model_validate_json(line) for line in f]
+        with self._lock:
+            self.reads += 1
+            self._cached[key] = entries
+            if len(self._cached) > self.max_cached:
+                self._cached.popitem(last=False)
+        return entries
+
+    def scene_log(
+        self, game_state: GameState, act: int, chapter: int, scene: int
+    ) -> list[LogEntry]:
+        """The log entries of a scene moved to segments, read from the segments with any."""
+        entries = []
+        for segment in game_state.segments:
+            if segment.kind == "log" and any(
+                key == [act, chapter, scene] for *key, _ in segment.scenes
+            ):
+                entries += [
+                    entry
+                    for entry in self.read(segment)
+                    if (entry.act, entry.chapter, entry.scene) == (act, chapter, scene)
+                ]
+        return entries
+
+    def window(
+        self,
+        game_state: GameState,
+        kind: str,
+        before: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> tuple[list, bool]:
+        """The last `limit` entries before `before` of the segments and the game state.
+
+        Returns them oldest first, and whether there are older entries. Walks
+        back from the newest entries and stops reading segments once the window
+        is full.
+        """
+        # The entries and the index of their first entry, newest first
+        parts: list = [(game_state.archived(kind), getattr(game_state, kind))]
+        parts += [
+            (segment.start, segment)
+            for segment in reversed(game_state.segments)
+            if segment.kind == kind
+        ]
+        window = []
+        for start, entries in parts:
+            if limit is not None and len(window) >= limit:
+                break
+            if isinstance(entries, Segment):
+                if before is not None and entries.first_timestamp >= before:
+                    continue
+                entries = self.read(entries)
+            for offset in range(len(entries) - 1, -1, -1):
+                if limit is not None and len(window) >= limit:
+                    break
+                if before is None or entries[offset].timestamp < before:
+                    window.append((start + offset, entries[offset]))
+        window.reverse()
+        return [entry for _, entry in window], bool(window) and window[0][0] > 0
@@ -0,0 +1,344 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from ..types import GameState, GameSummary, HistoryEntry, LogEntry
+from .base import GameStore, StorageCursor
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    player_name TEXT NOT NULL,
+    is_running INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    act INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    scene INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    history_length INTEGER NOT NULL,
+    adventure TEXT NOT NULL,
+    player TEXT NOT NULL,
+    current_scene TEXT NOT NULL,
+    dice_seed INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_listing ON games (is_running, updated_at);
+
+CREATE TABLE IF NOT EXISTS history (
+    game_id TEXT NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    act INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    scene INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (game_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (game_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS log (
+    game_id TEXT NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    act INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    scene INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (game_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS log_timestamp ON log (game_id, timestamp);
+CREATE INDEX IF NOT EXISTS log_scene ON log (game_id, act, chapter, scene);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    game_id TEXT NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    act INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    scene INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (game_id, idx)
+) WITHOUT ROWID;
+"""
+
+# The tables of the append-only lists of a game state, named like them
+ENTRY_TABLES = ("history", "log", "summaries")
+
+SUMMARY_COLUMNS = (
+    "id, title, description, player_name, is_running, act, chapter, scene, "
+    "updated_at, history_length"
+)
+
+
+class SQLiteGameStore(GameStore):
+    """Stores games in a SQLite database in WAL mode.
+
+    The adventure, player and current scene of a game live in the `games`
+    table, history, log and story summary entries in their own tables, so
+    saving a turn only inserts the new entries and listing games only reads the
+    indexed summary columns. Every save is a single transaction.
+    """
+
+    supports_paging = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(SCHEMA)
+            self._migrate(connection)
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        """Add the columns of games that databases created before them lack."""
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(games)")}
+        if "dice_seed" not in columns:
+            connection.execute("ALTER TABLE games ADD COLUMN dice_seed INTEGER")
+
+    def save(self, game_state: GameState) -> None:
+        print(f"[save_game] Saving game state {game_state.id} to {self.path.absolute()}")
+        cursor = game_state._storage_cursor
+        # Taken before serializing, so that changes made meanwhile by the event
+        # loop are written again by the next save rather than never
+        new_cursor = StorageCursor.of(game_state)
+        scene = json.loads(new_cursor.current_scene)
+        values = {
+            "id": game_state.id,
+            "player_name": game_state.player.name,
+            "is_running": new_cursor.is_running,
+            "version": new_cursor.version,
+            "act": scene["act"],
+            "chapter": scene["chapter"],
+            "scene": scene["scene"],
+            "updated_at": datetime.now().isoformat(),
+            "history_length": new_cursor.history,
+            "player": new_cursor.player,
+            "current_scene": new_cursor.current_scene,
+            "dice_seed": game_state.dice_seed,
+        }
+        connection = self._connect()
+        with connection:
+            updated = 0
+            if cursor is not None:
+                # The adventure never changes, so only the first insert writes it
+                updated = connection.execute(
+                    """
+                    UPDATE games SET
+                        player_name = :player_name,
+                        is_running = :is_running,
+                        version = :version,
+                        act = :act,
+                        chapter = :chapter,
+                        scene = :scene,
+                        updated_at = :updated_at,
+                        history_length = :history_length,
+                        player = :player,
+                        current_scene = :current_scene,
+                        dice_seed = :dice_seed
+                    WHERE id = :id
+                    """,
+                    values,
+                ).rowcount
+            if not updated:
+                connection.execute(
+                    """
+                    INSERT INTO games (
+                        id, title, description, player_name, is_running, version, act,
+                        chapter, scene, updated_at, history_length, adventure, player,
+                        current_scene, dice_seed
+                    ) VALUES (
+                        :id, :title, :description, :player_name, :is_running, :version,
+                        :act, :chapter, :scene, :updated_at, :history_length, :adventure,
+                        :player, :current_scene, :dice_seed
+                    )
+                    ON CONFLICT (id) DO UPDATE SET
+                        player_name = excluded.player_name,
+                        is_running = excluded.is_running,
+                        version = excluded.version,
+                        act = excluded.act,
+                        chapter = excluded.chapter,
+                        scene = excluded.scene,
+                        updated_at = excluded.updated_at,
+                        history_length = excluded.history_length,
+                        player = excluded.player,
+                        current_scene = excluded.current_scene,
+                        dice_seed = excluded.dice_seed
+                    """,
+                    values
+                    | {
+                        "title": game_state.adventure.title,
+                        "description": game_state.adventure.description,
+                        "adventure": game_state.dump_field_json("adventure").decode(),
+                    },
+                )
+            # Only entries added since the last save are written, unless the
+            # game state was not loaded from or saved to this store.
+            for table in ENTRY_TABLES:
+                length = getattr(new_cursor, table)
+                start = getattr(cursor, table) if cursor else 0
+                if length > start:
+                    # Without parsing entries that were loaded lazily if there are none
+                    self._insert_entries(
+                        connection,
+                        table,
+                        game_state,
+                        getattr(game_state, table)[:length],
+                        start,
+                    )
+                if cursor is None:
+                    # Drop stored entries beyond the ones of this game state
+                    connection.execute(
+                        f"DELETE FROM {table} WHERE game_id = ? AND idx >= ?",
+                        (game_state.id, length),
+                    )
+        game_state._storage_cursor = new_cursor
+
+    def _insert_entries(
+        self,
+        connection: sqlite3.Connection,
+        table: str,
+        game_state: GameState,
+        entries: list,
+        start: int,
+    ) -> None:
+        connection.executemany(
+            f"""
+            INSERT OR REPLACE INTO {table}
+                (game_id, idx, timestamp, act, chapter, scene, entry)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    game_state.id,
+                    index,
+                    entry.timestamp,
+                    entry.act,
+                    entry.chapter,
+                    entry.scene,
+                    entry.model_dump_json(),
+                )
+                for index, entry in enumerate(entries[start:], start)
+            ],
+        )
+
+    def load(self, game_id: str) -> Optional[GameState]:
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT is_running, version, adventure, player, current_scene, dice_seed "
+            "FROM games WHERE id = ?",
+            (game_id,),
+        ).fetchone()
+        if row is None:
+            print(f"[load_game] Game not found: {game_id}")
+            return None
+
+        print(f"[load_game] Loading game state {game_id} from {self.path.absolute()}")
+        data = {
+            "id": game_id,
+            "is_running": bool(row["is_running"]),
+            "version": row["version"],
+            "player": json.loads(row["player"]),
+            "current_scene": json.loads(row["current_scene"]),
+            "dice_seed": row["dice_seed"],
+            "summaries": self._select_entries(connection, "summaries", game_id),
+        }
+        # The adventure, history and log are only parsed when they are first used
+        raw_fields, lengths = {"adventure": row["adventure"].encode()}, {}
+        for table in ("history", "log"):
+            entries = [
+                row["entry"].encode()
+                for row in connection.execute(
+                    f"SELECT entry FROM {table} WHERE game_id = ? ORDER BY idx", (game_id,)
+                )
+            ]
+            raw_fields[table] = b"[" + b",".join(entries) + b"]"
+            lengths[table] = len(entries)
+        game_state = GameState.model_validate_lazy(data, raw_fields, lengths)
+        game_state._storage_cursor = StorageCursor.of(game_state)
+        return game_state
+
+    def _select_entries(
+        self,
+        connection: sqlite3.Connection,
+        table: str,
+        game_id: str,
+        before: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list:
+        query = f"SELECT idx, entry FROM {table} WHERE game_id = ?"
+        params: list = [game_id]
+        if before is not None:
+            query += " AND timestamp < ?"
+            params.append(before)
+        if limit is not None:
+            # Take the newest entries and return them oldest first
+            query = f"SELECT entry FROM ({query} ORDER BY idx DESC LIMIT ?) ORDER BY idx"
+            params.append(max(limit, 0))
+        else:
+            query += " ORDER BY idx"
+        return [
+            json.loads(row["entry"]) for row in connection.execute(query, params)
+        ]
+
+    def _has_game(self, connection: sqlite3.Connection, game_id: str) -> bool:
+        return (
+            connection.execute(
+                "SELECT 1 FROM games WHERE id = ?", (game_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def load_history(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[HistoryEntry]]:
+        connection = self._connect()
+        if not self._has_game(connection, game_id):
+            return None
+        return [
+            HistoryEntry.model_validate(entry)
+            for entry in self._select_entries(
+                connection, "history", game_id, before, limit
+            )
+        ]
+
+    def load_log(
+        self, game_id: str, before: Optional[str] = None, limit: Optional[int] = None
+    ) -> Optional[List[LogEntry]]:
+        connection = self._connect()
+        if not self._has_game(connection, game_id):
+            return None
+        return [
+            LogEntry.model_validate(entry)
+            for entry in self._select_entries(connection, "log", game_id, before, limit)
+        ]
+
+    def list_games(self, running_only: bool = True) -> List[GameSummary]:
+        query = f"SELECT {SUMMARY_COLUMNS} FROM games"
+        if running_only:
+            query += " WHERE is_running = 1"
+        query += " ORDER BY updated_at DESC"
+        return [
+            GameSummary.model_validate(dict(row))
+            for row in self._connect().execute(query)
+        ]
+
+    def compact(self, game_id: Optional[str] = None) -> int:
+        # Fold the write-ahead log back into the database file
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return 0
@@ -1,39 +1,21 @@
-from functools import wraps
-from traceback import print_exception
 import json
 
 from agents import function_tool, RunContextWrapper
 
 from ..types import GameState, Adventure, Player
 from .. import utils
+from .middleware import tool_middleware
 
 
-def logged_tool(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        print(
-            f"[{func.__name__}] Calling {func.__name__} with args: {args} and kwargs: {kwargs}"
-        )
-        try:
-            result = func(*args, **kwargs)
-            print(f"[{func.__name__}] Result: {result}")
-            return result
-        except Exception as e:
-            print(f"[{func.__name__}] Error: {e}")
-            print_exception(e)
-            raise e
-
-    return wrapper
-
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def create_game(adventure: Adventure, player: Player) -> GameState:
 #     """Create a new game state."""
 #     return utils.create_new_game(adventure, player)
 
 
 @function_tool
-@logged_tool
+@tool_middleware
 def create_game(adventure_json: str, player_json: str) -> str:
     """Create a new game state from JSON strings representing the adventure and player."""
     try:
@@ -1,15 +1,27 @@
-from random import randint
-
 from agents import function_tool, RunContextWrapper
 
+from ..dice import DiceRoll, game_dice
 from ..types import GameState
+from .middleware import tool_middleware
+
+# The most rolls of an expression in a single call
+MAX_TIMES = 100
+
 
 @function_tool
-def roll_dice(wrapper: RunContextWrapper[GameState], num_dice: int, num_sides: int) -> int:
-    """
-    Rolls the number of dice the specified number of times.
-    """
-    """ Rolls the number of dice the specified number of times.
+@tool_middleware
+def roll_dice(
+    wrapper: RunContextWrapper[GameState], expression: str, times: int = 1
+) -> list[DiceRoll]:
+    """Roll a dice expression for the player, e.g. 2d6+STR, 4d6kh3, 1d6! or d20 adv.
+
+    Args:
+        expression: dice like 2d6 or d%, keep the highest or lowest with kh3 or kl1,
+            explode with !, adv or dis for advantage or disadvantage, plus or minus
+            numbers and the player's STR, AGI, INT, CHA or END.
+        times: how often to roll the expression, at most 100.
     """
-    print(f"Rolling {num_dice}d{num_sides}")
-    return sum(randint(1, num_sides) for _ in range(num_dice))
\ No newline at end of file
+    if not 1 <= times <= MAX_TIMES:
+        raise ValueError(f"Dice can be rolled 1 to {MAX_TIMES} times, not {times}")
+    game_state = wrapper.context
+    return game_dice(game_state).roll(expression, game_state.player, times)
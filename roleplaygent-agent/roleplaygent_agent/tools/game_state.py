@@ -1,73 +1,58 @@
-from pathlib import Path
 from typing import Optional, List
-from functools import wraps
-from traceback import print_exception
 
 from agents import function_tool, RunContextWrapper
 
 from ..types import GameState
+from ..memory import get_story_memory
 from .. import utils
-
-GAMES_DIR = Path("games")
-
-
-def logged_tool(func):
-    @wraps(func)
-    def wrapper(ctx, *args, **kwargs):
-        print(
-            f"[{func.__name__}] Calling {func.__name__} with args: {args} and kwargs: {kwargs}"
-        )
-        try:
-            result = func(ctx, *args, **kwargs)
-            print(f"[{func.__name__}] Result: {result}")
-            return result
-        except Exception as e:
-            print(f"[{func.__name__}] Error: {e}")
-            print_exception(e)
-            raise e
-
-    return wrapper
+from .middleware import tool_middleware
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def add_scene_log(wrapper: RunContextWrapper[GameState], action: str, result: str) -> None:
 #     """Add an entry to the scene log."""
 #     utils.add_log_entry(wrapper.context, action, result)
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def next_scene(wrapper: RunContextWrapper[GameState], game_state: GameState) -> bool:
 #     """Advance to the next scene, resetting scene counter."""
 #     return utils.advance_scene(game_state)
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def next_chapter(wrapper: RunContextWrapper[GameState], game_state: GameState) -> bool:
 #     """Advance to the next chapter, resetting chapter and scene counters."""
 #     return utils.advance_chapter(game_state)
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def next_act(wrapper: RunContextWrapper[GameState], game_state: GameState) -> bool:
 #     """Advance to the next act, resetting act, chapter and scene counters."""
 #     return utils.advance_act(game_state)
 
 
 @function_tool
-@logged_tool
-def close_scene(wrapper: RunContextWrapper[GameState]) -> None:
-    """Advance to the next scene, resetting scene counter."""
-    wrapper.context.advance_scene()
+@tool_middleware
+async def close_scene(wrapper: RunContextWrapper[GameState]) -> str:
+    """Close the current scene and advance to the next scene of the adventure."""
+    game_state = wrapper.context
+    # Summarized before advancing, while the log still belongs to the current scene
+    await get_story_memory().close_scene(game_state)
+    if not game_state.advance_scene():
+        return "This was the last scene, the adventure is over."
+    scene = game_state.get_current_adventure_scene()
+    return f"The next scene is {scene.title}: {scene.description}"
 
 
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def close_chapter(wrapper: RunContextWrapper[GameState], game_id: str) -> Optional[GameState]:
 #     """Advance to the next chapter, resetting chapter and scene counters."""
 #     print(f"[close_chapter] Attempting to close chapter for game {game_id}")
@@ -93,7 +78,7 @@ def close_scene(wrapper: RunContextWrapper[GameState]) -> None:
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def close_act(wrapper: RunContextWrapper[GameState], game_id: str) -> Optional[GameState]:
 #     """Advance to the next act, resetting act, chapter and scene counters."""
 #     print(f"[close_act] Attempting to close act for game {game_id}")
@@ -116,7 +101,7 @@ def close_scene(wrapper: RunContextWrapper[GameState]) -> None:
 
 
 # @function_tool
-# @logged_tool
+# @tool_middleware
 # def close_adventure(wrapper: RunContextWrapper[GameState], game_id: str) -> Optional[GameState]:
 #     """Close the adventure by marking it as not running."""
 #     print(f"[close_adventure] Closing adventure for game {game_id}")
@@ -131,7 +116,7 @@ def close_scene(wrapper: RunContextWrapper[GameState]) -> None:
 
 
 @function_tool
-@logged_tool
+@tool_middleware(cache=True)
 def get_player_info(wrapper: RunContextWrapper[GameState]) -> str:
     """Get the player description."""
     player = wrapper.context.player
@@ -153,14 +138,21 @@ def get_player_info(wrapper: RunContextWrapper[GameState]) -> str:
 
 
 @function_tool
-@logged_tool
+@tool_middleware(cache=True)
 def get_story(wrapper: RunContextWrapper[GameState]) -> str:
-    """Get the story history up to the current point, including scene descriptions and log entries."""
-    return utils.collect_story_history(wrapper.context)
+    """Get the story up to the current point: summaries of the past scenes and the events of the current scene."""
+    return get_story_memory().render(wrapper.context)
+
+
+@function_tool
+@tool_middleware(cache=True)
+def get_scene_context(wrapper: RunContextWrapper[GameState]) -> str:
+    """Get the current scene, its goal and next challenge, the characters and enemies in it and the player sheet at once, as JSON."""
+    return utils.dump_scene_context(wrapper.context)
 
 
 @function_tool
-@logged_tool
+@tool_middleware(cache=True)
 def get_next_challenge(wrapper: RunContextWrapper[GameState]) -> str | None:
     """Get the challenges for the current scene."""
     if wrapper.context.current_scene.challenges:
@@ -170,7 +162,7 @@ def get_next_challenge(wrapper: RunContextWrapper[GameState]) -> str | None:
 
 
 @function_tool
-@logged_tool
+@tool_middleware
 def close_next_challenge(wrapper: RunContextWrapper[GameState]) -> None:
     """Close a challenge."""
     try:
@@ -180,14 +172,14 @@ def close_next_challenge(wrapper: RunContextWrapper[GameState]) -> None:
 
 
 @function_tool
-@logged_tool
+@tool_middleware(cache=True)
 def get_current_goal(wrapper: RunContextWrapper[GameState]) -> str:
     """Load a game state from a JSON file."""
     return wrapper.context.get_current_adventure_scene().goal
 
 
 @function_tool
-@logged_tool
+@tool_middleware
 def add_log_entry(wrapper: RunContextWrapper[GameState], message: str) -> None:
     """Add a log entry to the game state."""
     wrapper.context.add_log_entry(message)
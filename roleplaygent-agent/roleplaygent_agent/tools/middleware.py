@@ -0,0 +1,242 @@
+"""The middleware of the function tools.
+
+`tool_middleware` wraps a tool function, sync or async, to:
+
+- Log its calls on the "roleplaygent_agent.tools" logger: every call at DEBUG
+  level with its arguments and whole result, TOOL_LOG_SAMPLE_RATE of the
+  successful calls at INFO level with the result cut to TOOL_LOG_MAX_CHARS,
+  and every failed call at ERROR level with its traceback. Records are handed
+  to a queue and formatted and written to stderr by a listener thread, as
+  `key=value` text or, with TOOL_LOG_FORMAT=json, as JSON lines, so logging
+  does not block the event loop.
+- Report the duration and status of its calls to the metrics.
+- With `cache=True`, for tools that only read the game state, answer repeated
+  calls with the same arguments within a turn from a cache. Calls of any
+  other tool, which might change the game state, clear it. TOOL_CACHE=off
+  turns caching off.
+
+    @function_tool
+    @tool_middleware(cache=True)
+    def get_story(wrapper: RunContextWrapper[GameState]) -> str:
+        ...
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Iterator, Optional
+
+from agents import RunContextWrapper
+
+from .. import settings
+from ..metrics import record_tool_call
+
+
+logger = logging.getLogger("roleplaygent_agent.tools")
+
+# The attributes of a log record that are not its structured fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats the message and the `extra` fields of a record as text or JSON."""
+
+    def __init__(self, format: str = "text"):
+        super().__init__()
+        if format not in ("text", "json"):
+            raise ValueError(f"Unknown tool log format: {format}")
+        self.format_name = format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "event": record.getMessage(),
+            **{
+                name: value
+                for name, value in vars(record).items()
+                if name not in _RECORD_ATTRIBUTES
+            },
+        }
+        if record.exc_info:
+            fields["traceback"] = self.formatException(record.exc_info)
+        if self.format_name == "json":
+            return json.dumps(fields, default=str, ensure_ascii=False)
+        return " ".join(f"{name}={_text_value(value)}" for name, value in fields.items())
+
+
+def _text_value(value: Any) -> str:
+    text = str(value)
+    if not text or any(char in text for char in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatted by the listener thread, the fields are already strings or numbers
+        return record
+
+
+@functools.cache
+def configure_logging() -> QueueListener:
+    """Send the records of the tool logger through a queue to a listener thread."""
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(StructuredFormatter(settings.TOOL_LOG_FORMAT))
+    listener = QueueListener(records, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(_QueueHandler(records))
+    logger.setLevel(settings.TOOL_LOG_LEVEL.upper())
+    logger.propagate = False
+    return listener
+
+
+def truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... ({len(text)} chars)"
+
+
+# The cached results of the tools in the current turn
+_turn_cache: ContextVar[Optional[dict]] = ContextVar("turn_cache", default=None)
+
+
+@contextmanager
+def tool_cache() -> Iterator[dict]:
+    """Cache the results of the cached tools in the turn running in this context."""
+    cache: dict = {}
+    token = _turn_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _turn_cache.reset(token)
+
+
+def _arguments(args: tuple) -> tuple:
+    """The arguments of a tool call without the run context."""
+    if args and isinstance(args[0], RunContextWrapper):
+        return args[1:]
+    return args
+
+
+class _ToolCall:
+    """Logs, times and caches a single call of a tool."""
+
+    def __init__(self, name: str, cached: bool, args: tuple, kwargs: dict):
+        self.name = name
+        self.args = _arguments(args)
+        self.kwargs = kwargs
+        self.cache = _turn_cache.get() if settings.TOOL_CACHE == "on" else None
+        self.key = None
+        if cached and self.cache is not None:
+            self.key = f"{name}:{self.args!r}:{sorted(kwargs.items())!r}"
+        if self.cache is not None and not cached:
+            # The tool might change the game state the cached results are of
+            self.cache.clear()
+        self.started = time.perf_counter()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("tool_call", extra={"tool": name, "arguments": self.arguments()})
+
+    def arguments(self) -> str:
+        return ", ".join(
+            [repr(arg) for arg in self.args]
+            + [f"{name}={value!r}" for name, value in self.kwargs.items()]
+        )
+
+    def cached_result(self) -> tuple[bool, Any]:
+        if self.key is None or self.key not in self.cache:
+            return False, None
+        result = self.cache[self.key]
+        self.done(result, cached=True)
+        return True, result
+
+    def done(self, result: Any, cached: bool = False) -> None:
+        seconds = time.perf_counter() - self.started
+        if self.key is not None and not cached:
+            self.cache[self.key] = result
+        record_tool_call(self.name, seconds, cached=cached)
+        status = "cached" if cached else "ok"
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "tool_result",
+                extra={"tool": self.name, "status": status, "ms": round(seconds * 1000, 3), "result": str(result)},
+            )
+        elif logger.isEnabledFor(logging.INFO) and random.random() < settings.TOOL_LOG_SAMPLE_RATE:
+            logger.info(
+                "tool_result",
+                extra={
+                    "tool": self.name,
+                    "status": status,
+                    "ms": round(seconds * 1000, 3),
+                    "result": truncate(str(result), settings.TOOL_LOG_MAX_CHARS),
+                },
+            )
+
+    def failed(self, error: Exception) -> None:
+        seconds = time.perf_counter() - self.started
+        record_tool_call(self.name, seconds, error=True)
+        logger.error(
+            "tool_error",
+            exc_info=error,
+            extra={
+                "tool": self.name,
+                "status": "error",
+                "ms": round(seconds * 1000, 3),
+                "arguments": truncate(self.arguments(), settings.TOOL_LOG_MAX_CHARS),
+                "error": str(error),
+            },
+        )
+
+
+def tool_middleware(func: Optional[Callable] = None, *, cache: bool = False) -> Callable:
+    """Log, time and optionally cache the calls of a tool, see the module docstring."""
+    if func is None:
+        return functools.partial(tool_middleware, cache=cache)
+    configure_logging()
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            call = _ToolCall(name, cache, args, kwargs)
+            hit, result = call.cached_result()
+            if hit:
+                return result
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                call.failed(e)
+                raise
+            call.done(result)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = _ToolCall(name, cache, args, kwargs)
+        hit, result = call.cached_result()
+        if hit:
+            return result
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            call.failed(e)
+            raise
+        call.done(result)
+        return result
+
+    return wrapper
@@ -0,0 +1,83 @@
+from typing import Optional, List
+
+from agents import function_tool, RunContextWrapper
+
+from ..types import GameState
+from .. import rules
+from ..dice import game_dice
+from .middleware import tool_middleware
+
+
+@function_tool
+@tool_middleware
+def resolve_check(
+    wrapper: RunContextWrapper[GameState],
+    attribute: str,
+    difficulty: str,
+    skill_bonus: int = 0,
+    die: int = 6,
+) -> rules.CheckResult:
+    """Make a check of the player against a difficulty.
+
+    Args:
+        attribute: strength, agility, intelligence, charisma or endurance.
+        difficulty: easy, normal, hard or very hard, or a target number.
+        skill_bonus: +1 per rank of a skill the player has for the task.
+        die: the die to roll, 4, 6, 8, 10, 12 or 20 sides.
+    """
+    game_state = wrapper.context
+    return rules.resolve_check(
+        game_state.player, attribute, difficulty, skill_bonus, die, rng=game_dice(game_state)
+    )
+
+
+@function_tool
+@tool_middleware
+def roll_initiative(
+    wrapper: RunContextWrapper[GameState], participants: Optional[List[str]] = None
+) -> List[rules.InitiativeRoll]:
+    """Roll initiative for a fight, returning the participants in the order they act.
+
+    Args:
+        participants: the names of the participants, by default the player and
+            the enemies of the scene that are still standing.
+    """
+    game_state = wrapper.context
+    if participants:
+        combatants = [rules.find_combatant(game_state, name) for name in participants]
+    else:
+        combatants = rules.scene_combatants(game_state)
+    return rules.roll_initiative(combatants, rng=game_dice(game_state))
+
+
+@function_tool
+@tool_middleware
+def resolve_attack(
+    wrapper: RunContextWrapper[GameState],
+    attacker: str,
+    defender: str,
+    attribute: Optional[str] = None,
+    skill_bonus: int = 0,
+    defending: bool = False,
+) -> rules.AttackResult:
+    """Make an attack and deal its damage to the defender's health.
+
+    Args:
+        attacker: the name of the attacker, the player or an enemy of the scene.
+        defender: the name of the defender, the player or an enemy of the scene.
+        attribute: strength or agility, by default the higher one.
+        skill_bonus: +1 per rank of the attacker's weapon skill.
+        defending: whether the defender chose to defend this turn.
+    """
+    game_state = wrapper.context
+    return rules.resolve_attack(
+        rules.find_combatant(game_state, attacker),
+        rules.find_combatant(game_state, defender),
+        attribute,
+        skill_bonus,
+        defending,
+        rng=game_dice(game_state),
+    )
+
+
+tools = [resolve_check, roll_initiative, resolve_attack]
@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from . import settings
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class TurnBatch:
+    """Prompts waiting to be run as one turn by `task`."""
+
+    prompts: list[str] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+
+
+@dataclass
+class TurnStats:
+    turns: int = 0
+    coalesced: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class TurnQueue:
+    """Runs the turns of each game one after another, in the order they arrive.
+
+    With a `coalesce_window` greater than zero, a prompt waits that long before
+    its turn is run, and every prompt for the same game that arrives until the
+    turn starts is merged into it, so that all of them are answered by a
+    single agent run. The merged turn runs in a task of its own, so a caller
+    that is cancelled only stops waiting for it.
+    """
+
+    def __init__(self, coalesce_window: float = 0.0):
+        self.coalesce_window = coalesce_window
+        self.stats = TurnStats()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._depths: dict[str, int] = {}
+        self._batches: dict[str, TurnBatch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def exclusive(self, game_id: str) -> AsyncIterator[None]:
+        """Wait for the running turn of a game to finish and run one."""
+        lock = self._locks.setdefault(game_id, asyncio.Lock())
+        self._depths[game_id] = self._depths.get(game_id, 0) + 1
+        queued_at = time.monotonic()
+        try:
+            async with lock:
+                waited = time.monotonic() - queued_at
+                self.stats.turns += 1
+                self.stats.wait_seconds_total += waited
+                self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, waited)
+                yield
+        finally:
+            self._depths[game_id] -= 1
+            if not self._depths[game_id]:
+                del self._depths[game_id]
+                del self._locks[game_id]
+
+    async def submit(
+        self,
+        game_id: str,
+        prompt: str,
+        run: Callable[[str], Awaitable[T]],
+    ) -> T:
+        """Run `run` with the prompt as the next turn of the game."""
+        if self.coalesce_window <= 0:
+            async with self.exclusive(game_id):
+                return await run(prompt)
+
+        batch = self._batches.get(game_id)
+        if batch is not None:
+            print(f"[TurnQueue] Coalescing prompt into the next turn of game {game_id}")
+            batch.prompts.append(prompt)
+            self.stats.coalesced += 1
+        else:
+            batch = TurnBatch(prompts=[prompt])
+            self._batches[game_id] = batch
+            batch.task = asyncio.create_task(self._run_batch(game_id, batch, run))
+            self._tasks.add(batch.task)
+            batch.task.add_done_callback(self._batch_done)
+        return await asyncio.shield(batch.task)
+
+    async def _run_batch(
+        self, game_id: str, batch: TurnBatch, run: Callable[[str], Awaitable[T]]
+    ) -> T:
+        try:
+            await asyncio.sleep(self.coalesce_window)
+            async with self.exclusive(game_id):
+                # Prompts arriving from now on go into the next turn
+                del self._batches[game_id]
+                return await run("\n".join(batch.prompts))
+        finally:
+            if self._batches.get(game_id) is batch:
+                del self._batches[game_id]
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Mark the exception as retrieved if no caller waits for the turn anymore
+        if not task.cancelled():
+            task.exception()
+
+    def depth(self, game_id: Optional[str] = None) -> int:
+        """The number of turns running or waiting, for one game or all games."""
+        if game_id is not None:
+            return self._depths.get(game_id, 0)
+        return sum(self._depths.values())
+
+    def info(self) -> dict:
+        return {
+            "coalesce_window": self.coalesce_window,
+            "games": len(self._depths),
+            "depth": self.depth(),
+            "max_depth": max(self._depths.values(), default=0),
+            "turns": self.stats.turns,
+            "coalesced": self.stats.coalesced,
+            "wait_seconds_avg": (
+                self.stats.wait_seconds_total / self.stats.turns
+                if self.stats.turns
+                else 0.0
+            ),
+            "wait_seconds_max": self.stats.wait_seconds_max,
+        }
+
+
+@functools.cache
+def get_turn_queue() -> TurnQueue:
+    return TurnQueue(coalesce_window=settings.TURN_COALESCE_WINDOW)
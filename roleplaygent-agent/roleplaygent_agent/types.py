@@ -1,4 +1,8 @@
-from pydantic import BaseModel, Field
+import functools
+import threading
+
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter
+from typing import Any, Optional
 from uuid import uuid4
 from datetime import datetime
 from copy import deepcopy
@@ -78,6 +82,31 @@ class CurrentScene(BaseModel):
     )
 
 
+class AgentUsage(BaseModel):
+    model_calls: int = Field(description="The model calls of the agent", default=0)
+    input_tokens: int = Field(description="The prompt tokens of the agent", default=0)
+    output_tokens: int = Field(description="The completion tokens of the agent", default=0)
+    seconds: float = Field(description="The time spent waiting for the model", default=0.0)
+
+
+class ToolUsage(BaseModel):
+    calls: int = Field(description="The calls of the tool", default=0)
+    errors: int = Field(description="The calls of the tool that failed", default=0)
+    cached: int = Field(description="The calls of the tool answered from the cache", default=0)
+    seconds: float = Field(description="The time spent in the tool", default=0.0)
+
+
+class TurnMetrics(BaseModel):
+    load_seconds: float = Field(description="The time loading the game state")
+    agent_seconds: float = Field(description="The time running the agents")
+    model_calls: int = Field(description="The model calls of all agents")
+    agents: dict[str, AgentUsage] = Field(description="The model usage per agent name")
+    tools: dict[str, ToolUsage] = Field(description="The tool calls per tool name")
+    state_bytes: Optional[int] = Field(
+        default=None, description="The size of the game state as JSON, when it was saved"
+    )
+
+
 class HistoryEntry(BaseModel):
     timestamp: str = Field(
         description="The timestamp of the history entry",
@@ -88,6 +117,12 @@ class HistoryEntry(BaseModel):
     act: int = Field(description="The act of the history entry", default=0)
     chapter: int = Field(description="The chapter of the history entry", default=0)
     scene: int = Field(description="The scene of the history entry", default=0)
+    rolls: list[str] = Field(
+        default_factory=list, description="The dice rolled in the turn, e.g. '2d6+STR:3,5=13'"
+    )
+    metrics: Optional[TurnMetrics] = Field(
+        default=None, description="The performance of the turn"
+    )
 
 
 class LogEntry(BaseModel):
@@ -101,7 +136,78 @@ class LogEntry(BaseModel):
     scene: int = Field(description="The scene of the log entry", default=0)
 
 
+class StorySummary(BaseModel):
+    timestamp: str = Field(
+        description="The timestamp of the summary",
+        default_factory=lambda: datetime.now().isoformat(),
+    )
+    level: str = Field(description="What is summarized, a 'scene' or a 'chapter'")
+    text: str = Field(description="The summary")
+    act: int = Field(description="The act of the summary", default=0)
+    chapter: int = Field(description="The chapter of the summary", default=0)
+    scene: int = Field(
+        description="The scene of the summary, the last scene for chapters", default=0
+    )
+
+
+class Segment(BaseModel):
+    kind: str = Field(description="The entries of the segment, 'history' or 'log'")
+    start: int = Field(description="The index of the first entry of the segment")
+    count: int = Field(description="The number of entries of the segment")
+    first_timestamp: str = Field(description="The timestamp of the first entry")
+    last_timestamp: str = Field(description="The timestamp of the last entry")
+    scenes: list[list[int]] = Field(
+        description="The act, chapter, scene and number of entries of the scenes of the entries",
+        default_factory=list,
+    )
+
+
+class GameSummary(BaseModel):
+    id: str = Field(description="The id of the game state")
+    title: str = Field(description="The title of the adventure")
+    description: str = Field(description="A short description of the adventure")
+    player_name: str = Field(description="The name of the player character")
+    is_running: bool = Field(description="Whether the adventure is running")
+    act: int = Field(description="The current act of the adventure", default=0)
+    chapter: int = Field(description="The current chapter of the adventure", default=0)
+    scene: int = Field(description="The current scene of the adventure", default=0)
+    updated_at: str = Field(description="The timestamp of the last save")
+    history_length: int = Field(
+        description="The number of history entries", default=0
+    )
+
+
+# The fields of a game state that can be left unparsed when loading it, see
+# `GameState.model_validate_lazy`
+LAZY_FIELDS = ("adventure", "history", "log")
+
+
+class _FieldsLock:
+    """The lock of the lazy fields of a game state, copies of which get their own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def __deepcopy__(self, memo: dict) -> "_FieldsLock":
+        return _FieldsLock()
+
+
 class GameState(BaseModel):
+    """The state of a game.
+
+    Game states loaded with `model_validate_lazy` keep the raw JSON of their
+    adventure, history and log and only parse them when they are first used,
+    so that requests and tools touching the player or the current scene do
+    not pay for the whole document. The same game state is used by the event
+    loop and the storage I/O threads, so fields are parsed under a lock.
+    """
+
     id: str = Field(
         description="The id of the game state", default_factory=lambda: str(uuid4())
     )
@@ -111,6 +217,10 @@ class GameState(BaseModel):
     is_running: bool = Field(
         description="Whether the adventure is running", default=True
     )
+    version: int = Field(
+        description="The version of the game state, incremented with every save",
+        default=0,
+    )
 
     player: Player = Field(description="The player character")
 
@@ -126,14 +236,126 @@ class GameState(BaseModel):
         description="The history of the adventure", default_factory=list
     )
 
-    def add_history_entry(self, prompt: str, result: str):
+    summaries: list[StorySummary] = Field(
+        description="Summaries of the closed scenes and chapters", default_factory=list
+    )
+
+    segments: list[Segment] = Field(
+        description="The segments the oldest history and log entries were moved to",
+        default_factory=list,
+    )
+
+    dice_seed: Optional[int] = Field(
+        description="The seed of the dice of the game, by default derived from its id",
+        default=None,
+    )
+
+    # What the game store has already persisted of this game state
+    _storage_cursor: Any = PrivateAttr(default=None)
+    # The positions of the log entries of each scene, see `scene_log`
+    _log_index: dict = PrivateAttr(default_factory=dict)
+    _log_indexed: int = PrivateAttr(default=0)
+    _log_indexed_list: Any = PrivateAttr(default=None)
+    _log_indexed_archived: int = PrivateAttr(default=0)
+    # The dice of the current turn, see `dice.game_dice`
+    _dice: Any = PrivateAttr(default=None)
+    # Reads the entries of the segments, see `storage.segments`
+    _archive: Any = PrivateAttr(default=None)
+    # The raw JSON of the lazy fields not parsed yet, and the number of
+    # entries of the lists among them
+    _raw_fields: dict = PrivateAttr(default_factory=dict)
+    _raw_lengths: dict = PrivateAttr(default_factory=dict)
+    _fields_lock: _FieldsLock = PrivateAttr(default_factory=_FieldsLock)
+
+    @classmethod
+    def model_validate_lazy(
+        cls, data: dict, raw_fields: dict[str, bytes], lengths: Optional[dict] = None
+    ) -> "GameState":
+        """Validate a game state, leaving the fields in `raw_fields` to be parsed on first use.
+
+        `lengths` holds the number of entries of the raw history and log, for
+        counting them without parsing them.
+        """
+        values = {}
+        for name, field in cls.model_fields.items():
+            if name in raw_fields:
+                # A placeholder, dropped below, spares model_construct the default
+                values[name] = None
+                continue
+            if name in data:
+                values[name] = _field_adapter(name).validate_python(data[name])
+            elif field.is_required():
+                raise ValueError(f"Game state is missing the field {name!r}")
+        game_state = cls.model_construct(**values)
+        for name in raw_fields:
+            game_state.__dict__.pop(name, None)
+        game_state._raw_fields = dict(raw_fields)
+        game_state._raw_lengths = dict(lengths or {})
+        return game_state
+
+    def __getattr__(self, name: str) -> Any:
+        private = object.__getattribute__(self, "__pydantic_private__")
+        if private and name in private.get("_raw_fields", ()):
+            with private["_fields_lock"]:
+                # Parsed by another thread while waiting for the lock
+                if name in self.__dict__:
+                    return self.__dict__[name]
+                value = _field_adapter(name).validate_json(private["_raw_fields"][name])
+                self.__dict__[name] = value
+                del private["_raw_fields"][name]
+                private["_raw_lengths"].pop(name, None)
+                return value
+        return super().__getattr__(name)
+
+    def raw_field(self, name: str) -> Optional[bytes]:
+        """The raw JSON of a field that was not parsed yet, or None."""
+        with self._fields_lock:
+            return self._raw_fields.get(name)
+
+    def load_fields(self, include: Any = None, exclude: Any = None) -> None:
+        """Parse the lazy fields selected by `include` and `exclude`, for dumping them."""
+        for name in LAZY_FIELDS:
+            if name in self._raw_fields and (include is None or name in include) and (
+                exclude is None or name not in exclude
+            ):
+                getattr(self, name)
+
+    def dump_field_json(self, name: str) -> bytes:
+        """The JSON of a single field, the raw JSON if it was not parsed yet."""
+        raw = self.raw_field(name)
+        if raw is not None:
+            return raw
+        return _field_adapter(name).dump_json(getattr(self, name))
+
+    def model_dump(self, **kwargs) -> dict[str, Any]:
+        self.load_fields(kwargs.get("include"), kwargs.get("exclude"))
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        self.load_fields(kwargs.get("include"), kwargs.get("exclude"))
+        return super().model_dump_json(**kwargs)
+
+    def entries_length(self, kind: str) -> int:
+        """The number of history or log entries in the game state, without parsing them."""
+        with self._fields_lock:
+            length = self._raw_lengths.get(kind)
+        return length if length is not None else len(getattr(self, kind))
+
+    def add_history_entry(
+        self, prompt: str, result: str, metrics: Optional[TurnMetrics] = None
+    ):
+        rolls = []
+        if self._dice is not None and self._dice.turn == self.history_length():
+            rolls = self._dice.rolls
         self.history.append(
             HistoryEntry(
                 prompt=prompt,
                 result=result,
+                rolls=rolls,
                 act=self.current_scene.act,
                 chapter=self.current_scene.chapter,
                 scene=self.current_scene.scene,
+                metrics=metrics,
             )
         )
 
@@ -147,6 +369,65 @@ class GameState(BaseModel):
             )
         )
 
+    def archived(self, kind: str) -> int:
+        """The number of history or log entries moved to segments."""
+        return sum(segment.count for segment in self.segments if segment.kind == kind)
+
+    def history_length(self) -> int:
+        return self.archived("history") + self.entries_length("history")
+
+    def move_to_segment(self, segment: Segment) -> None:
+        """Drop the oldest entries of the kind of a segment, written to it."""
+        del getattr(self, segment.kind)[: segment.count]
+        self.segments.append(segment)
+
+    def scene_log(self, act: int, chapter: int, scene: int) -> list[LogEntry]:
+        """The log entries of a scene, without scanning the whole log.
+
+        Entries moved to segments are read from them.
+        """
+        archived = []
+        if self._archived_scene_log_length(act, chapter, scene):
+            archived = self._archive.scene_log(self, act, chapter, scene)
+        return archived + [
+            self.log[index] for index in self._scene_log_positions(act, chapter, scene)
+        ]
+
+    def scene_log_length(self, act: int, chapter: int, scene: int) -> int:
+        return self._archived_scene_log_length(act, chapter, scene) + len(
+            self._scene_log_positions(act, chapter, scene)
+        )
+
+    def _archived_scene_log_length(self, act: int, chapter: int, scene: int) -> int:
+        return sum(
+            count
+            for segment in self.segments
+            if segment.kind == "log"
+            for *key, count in segment.scenes
+            if key == [act, chapter, scene]
+        )
+
+    def _scene_log_positions(self, act: int, chapter: int, scene: int) -> list[int]:
+        # Entries are only ever appended, so the index is brought up to date
+        # with the entries added since, unless the log was replaced or its
+        # oldest entries were moved to a segment
+        if (
+            self._log_indexed_list is not self.log
+            or self._log_indexed > len(self.log)
+            or self._log_indexed_archived != self.archived("log")
+        ):
+            self._log_index = {}
+            self._log_indexed = 0
+            self._log_indexed_list = self.log
+            self._log_indexed_archived = self.archived("log")
+        for index in range(self._log_indexed, len(self.log)):
+            entry = self.log[index]
+            self._log_index.setdefault((entry.act, entry.chapter, entry.scene), []).append(
+                index
+            )
+        self._log_indexed = len(self.log)
+        return self._log_index.get((act, chapter, scene), [])
+
     def get_current_adventure_scene(self) -> Scene:
         return (
             self.adventure.acts[self.current_scene.act]
@@ -154,17 +435,38 @@ class GameState(BaseModel):
             .scenes[self.current_scene.scene]
         )
 
-    def advance_scene(self):
-        self.current_scene.scene += 1
-        if self.current_scene.scene >= len(self.current_scene.chapter.scenes):
-            self.current_scene.chapter += 1
-            self.current_scene.scene = 0
-        if self.current_scene.chapter >= len(self.current_scene.act.chapters):
-            self.current_scene.act += 1
-            self.current_scene.chapter = 0
-            self.current_scene.scene = 0
-
-        self.current_scene.characters = deepcopy(self.player)
+    def advance_scene(self) -> bool:
+        """Move on to the next scene of the adventure.
+
+        Returns False and ends the adventure after its last scene.
+        """
+        current = self.current_scene
+        act = self.adventure.acts[current.act]
+        if current.scene + 1 < len(act.chapters[current.chapter].scenes):
+            current.scene += 1
+        elif current.chapter + 1 < len(act.chapters):
+            current.chapter += 1
+            current.scene = 0
+        elif current.act + 1 < len(self.adventure.acts):
+            current.act += 1
+            current.chapter = 0
+            current.scene = 0
+        else:
+            self.is_running = False
+            return False
+
         scene = self.get_current_adventure_scene()
-        self.current_scene.enemies = deepcopy(scene.enemies)
-        self.current_scene.challenges = deepcopy(scene.challenges)
+        current.characters = deepcopy(scene.characters)
+        current.enemies = deepcopy(scene.enemies)
+        current.challenges = deepcopy(scene.challenges)
+        return True
+
+    def is_last_scene_of_chapter(self) -> bool:
+        current = self.current_scene
+        chapter = self.adventure.acts[current.act].chapters[current.chapter]
+        return current.scene + 1 >= len(chapter.scenes)
+
+
+@functools.cache
+def _field_adapter(name: str) -> TypeAdapter:
+    return TypeAdapter(GameState.model_fields[name].annotation)
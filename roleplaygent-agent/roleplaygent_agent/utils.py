@@ -1,12 +1,12 @@
-import random
 import json
+import random
 import os
 from pathlib import Path
 from typing import Optional, List
 
-from .types import Adventure, GameState, Player, CurrentScene, LogEntry
-
-GAMES_DIR = Path("games")
+from .storage import get_cache, get_store
+from .storage.base import entries_window
+from .types import Adventure, GameState, GameSummary, Player, CurrentScene, LogEntry
 
 
 def create_new_game(adventure: Adventure, player: Player) -> GameState:
@@ -26,27 +26,87 @@ def create_new_game(adventure: Adventure, player: Player) -> GameState:
 
 
 def save_game(game_state: GameState) -> None:
-    """Save a game state to a JSON file."""
-    # Ensure games directory exists
-    GAMES_DIR.mkdir(exist_ok=True)
-
-    game_file = GAMES_DIR / f"{game_state.id}.json"
-    print(f"[save_game] Saving game state to {game_file.absolute()}")
-    with open(game_file, "w") as f:
-        json.dump(game_state.model_dump(), f, indent=2)
+    """Save a game state through the game cache to the game store."""
+    game_state.version += 1
+    get_cache().put(game_state)
 
 
 def load_game(game_id: str) -> Optional[GameState]:
-    """Load a game state from a JSON file."""
-    game_file = GAMES_DIR / f"{game_id}.json"
-    if not game_file.exists():
-        print(f"[load_game] Game file not found: {game_file.absolute()}")
+    """Load a game state from the game cache or the game store."""
+    return get_cache().get(game_id)
+
+
+async def asave_game(game_state: GameState) -> None:
+    """Save a game state without blocking the event loop."""
+    game_state.version += 1
+    await get_cache().aput(game_state)
+
+
+async def aload_game(game_id: str) -> Optional[GameState]:
+    """Load a game state without blocking the event loop."""
+    return await get_cache().aget(game_id)
+
+
+def project_game_state(
+    game_state: GameState,
+    fields: Optional[List[str]] = None,
+    history_before: Optional[str] = None,
+    log_before: Optional[str] = None,
+    limit: Optional[int] = None,
+    pages: Optional[dict] = None,
+) -> dict:
+    """Render the given fields of a game state, with windows of its history and log.
+
+    Without `fields` all fields are rendered. With `history_before`, `log_before`
+    or `limit`, only the last `limit` history and log entries older than the
+    given timestamps are rendered, and `history_cursor` and `log_cursor` hold
+    the timestamp to pass as `*_before` for the next older page, if any.
+    `pages` holds windows already loaded with `aload_entries_page`, by field,
+    the others are cut from the game state.
+    """
+    include = set(fields) if fields else set(GameState.model_fields) - {"segments"}
+    unknown = include - set(GameState.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    include |= {"id", "version"}
+
+    data = game_state.model_dump(mode="json", include=include - {"history", "log"})
+    paginated = history_before is not None or log_before is not None or limit is not None
+    for name, before in (("history", history_before), ("log", log_before)):
+        if name not in include:
+            continue
+        if pages and name in pages:
+            window, has_older = pages[name]
+        else:
+            # Reads the segments of the entries only as far as the window reaches
+            window, has_older = entries_window(game_state, name, before, limit)
+        data[name] = [entry.model_dump(mode="json") for entry in window]
+        if paginated:
+            data[f"{name}_cursor"] = window[0].timestamp if has_older else None
+    return data
+
+
+async def aload_entries_page(
+    game_id: str, kind: str, before: Optional[str] = None, limit: Optional[int] = None
+) -> Optional[tuple[list, bool]]:
+    """Load a window of the history or log of a game from the game store.
+
+    For stores with `supports_paging`, which read pages without loading the
+    whole game, like the indexed tables of the SQLite store. Unsaved changes of
+    the game are written first. Also returns whether there are older entries,
+    like `entries_window`.
+    """
+    cache = get_cache()
+    await cache.aflush_game(game_id)
+    load = cache.store.aload_history if kind == "history" else cache.store.aload_log
+    # One more entry than the page tells whether there are older ones
+    entries = await load(game_id, before, max(limit, 0) + 1 if limit is not None else None)
+    if entries is None:
         return None
-
-    print(f"[load_game] Loading game state from {game_file.absolute()}")
-    with open(game_file, "r") as f:
-        data = json.load(f)
-        return GameState.model_validate(data)
+    if limit is None:
+        return entries, False
+    window = entries[-limit:] if limit > 0 else []
+    return window, bool(window) and len(entries) > len(window)
 
 
 def add_log_entry(game_state: GameState, action: str, result: str) -> None:
@@ -181,18 +241,8 @@ def collect_story_history(game_state: GameState) -> str:
 
                 story.append(f"\n#### Scene {scene_idx + 1}: {scene.title}\n")
                 story.append(f"{scene.description}\n")
-
-                # Add relevant log entries for this scene
-                scene_logs = [
-                    log
-                    for log in game_state.log
-                    if (
-                        log.act == act_idx
-                        and log.chapter == chapter_idx
-                        and log.scene == scene_idx
-                    )
-                ]
-
+                # The log index gives the entries of a scene without scanning the log
+                scene_logs = game_state.scene_log(act_idx, chapter_idx, scene_idx)
                 if scene_logs:
                     story.append("\n**Scene Events:**\n")
                     for log in scene_logs:
@@ -201,28 +251,46 @@ def collect_story_history(game_state: GameState) -> str:
     return "\n".join(story)
 
 
-def list_running_games() -> List[GameState]:
-    """List all currently running games."""
+def scene_context(game_state: GameState) -> dict:
+    """The current scene, its goal, its next challenge and the player sheet."""
+    current = game_state.current_scene
+    scene = game_state.get_current_adventure_scene()
+    return {
+        "act": current.act + 1,
+        "chapter": current.chapter + 1,
+        "scene": current.scene + 1,
+        "title": scene.title,
+        "description": scene.description,
+        "goal": scene.goal,
+        "encounter": scene.encounter,
+        "next_challenge": current.challenges[0] if current.challenges else None,
+        "open_challenges": len(current.challenges),
+        "characters": [
+            character if isinstance(character, str) else character.name
+            for character in current.characters
+        ],
+        "enemies": [
+            {"name": enemy.name, "health": enemy.health}
+            for enemy in current.enemies
+            if enemy.health > 0
+        ],
+        "player": game_state.player.model_dump(),
+    }
+
+
+def dump_scene_context(game_state: GameState) -> str:
+    """The scene context as compact JSON."""
+    return json.dumps(scene_context(game_state), separators=(",", ":"), ensure_ascii=False)
+
+
+def list_running_games() -> List[GameSummary]:
+    """List all currently running games from the game store."""
     print("[list_running_games] Listing all running games")
-    running_games = []
-
-    # Ensure games directory exists
-    GAMES_DIR.mkdir(exist_ok=True)
-
-    # Iterate through all game files
-    for game_file in GAMES_DIR.glob("*.json"):
-        try:
-            with open(game_file, "r") as f:
-                data = json.load(f)
-                game_state = GameState.model_validate(data)
-                if game_state.is_running:
-                    running_games.append(game_state)
-                    print(
-                        f"[list_running_games] Found running game: {game_state.id} - {game_state.adventure.title}"
-                    )
-        except Exception as e:
-            print(f"[list_running_games] Error loading game {game_file}: {e}")
-            continue
-
+    running_games = get_store().list_games(running_only=True)
     print(f"[list_running_games] Found {len(running_games)} running games")
     return running_games
+
+
+async def alist_running_games() -> List[GameSummary]:
+    """List all currently running games without blocking the event loop."""
+    return await get_store().alist_games(running_only=True)
@@ -0,0 +1,106 @@
+"""Synthetic games shared by the tests and the benchmarks."""
+
+from typing import Optional
+
+from roleplaygent_agent.types import (
+    Act,
+    Adventure,
+    Chapter,
+    Enemy,
+    GameState,
+    Player,
+    Scene,
+)
+
+
+def make_adventure(scenes: int = 4) -> Adventure:
+    """An adventure of 3 acts of 4 chapters of `scenes` scenes, every other one an encounter."""
+    return Adventure(
+        title="Benchmark",
+        description="A long adventure",
+        characters=[],
+        acts=[
+            Act(
+                title=f"Act {act}",
+                description="An act",
+                chapters=[
+                    Chapter(
+                        title=f"Chapter {chapter}",
+                        description="A chapter",
+                        scenes=[
+                            Scene(
+                                title=f"Scene {scene}",
+                                description="A gate in the fog. " * 10,
+                                goal="Pass the gate",
+                                characters=["Guard"],
+                                encounter=scene % 2 == 1,
+                                enemies=[
+                                    Enemy(
+                                        name=f"Goblin {enemy}",
+                                        health=8,
+                                        strength=2,
+                                        agility=2,
+                                        intelligence=1,
+                                        charisma=1,
+                                        endurance=2,
+                                    )
+                                    for enemy in range(3 if scene % 2 else 0)
+                                ],
+                                challenges=["Talk the guard into opening the gate"],
+                            )
+                            for scene in range(scenes)
+                        ],
+                    )
+                    for chapter in range(4)
+                ],
+            )
+            for act in range(3)
+        ],
+    )
+
+
+def make_player() -> Player:
+    return Player(
+        name="Aria",
+        description="A ranger",
+        appearance="Green cloak",
+        personality="Calm",
+        backstory="Grew up in the woods",
+        goals="Find the crown",
+        health=20,
+        strength=3,
+        agility=4,
+        intelligence=2,
+        charisma=1,
+        endurance=2,
+        inventory=[],
+    )
+
+
+def make_game(
+    entries: int = 0,
+    scenes: int = 4,
+    history: bool = True,
+    spread: bool = False,
+    game_id: Optional[str] = None,
+) -> GameState:
+    """A game of `make_adventure(scenes)` with `entries` log entries.
+
+    With `history`, every log entry comes with a history entry. With `spread`,
+    the entries are spread over all scenes up to the last one, otherwise they
+    all belong to the first scene.
+    """
+    game_state = GameState(adventure=make_adventure(scenes), player=make_player())
+    if game_id is not None:
+        game_state.id = game_id
+    total_scenes = 3 * 4 * scenes
+    for index in range(entries):
+        if spread:
+            position = index * total_scenes // entries
+            game_state.current_scene.act = position // (4 * scenes)
+            game_state.current_scene.chapter = position // scenes % 4
+            game_state.current_scene.scene = position % scenes
+        game_state.add_log_entry(f"The player looked around the gate ({index})")
+        if history:
+            game_state.add_history_entry(f"Look around ({index})", "You see the gate. " * 20)
+    return game_state
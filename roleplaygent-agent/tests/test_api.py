@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+
+from roleplaygent_agent import api, utils
+from roleplaygent_agent.storage import FileSystemGameStore, GameCache
+from tests.conftest import make_game
+
+
+class CountingStore(FileSystemGameStore):
+    loads = 0
+
+    def load(self, game_id):
+        self.loads += 1
+        return super().load(game_id)
+
+
+def test_pages_of_stores_without_paging_come_from_the_cache(tmp_path, monkeypatch):
+    store = CountingStore(tmp_path)
+    cache = GameCache(store, mode="write-behind")
+    monkeypatch.setattr(api, "get_cache", lambda: cache)
+    monkeypatch.setattr(utils, "get_cache", lambda: cache)
+    game = make_game(entries=5)
+    store.save(game)
+
+    async def page():
+        loaded = await cache.aget(game.id)
+        loaded.add_history_entry("Open the gate", "The gate opens.")
+        await cache.aput(loaded)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get(f"/api/games/{game.id}", params={"limit": 2})
+        return response.json()
+
+    data = asyncio.run(page())
+    assert [entry["prompt"] for entry in data["history"]] == ["Look around (4)", "Open the gate"]
+    assert data["history_cursor"] == data["history"][0]["timestamp"]
+    assert store.loads == 1
+    assert cache.info()["dirty"] == 1
+
+
+class ClosedWebSocket:
+    """A WebSocket whose client goes away after the first event sent to it."""
+
+    def __init__(self):
+        self.received = [{"message": "open the door"}]
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        return self.received.pop(0)
+
+    async def send_json(self, data):
+        if self.sent:
+            raise RuntimeError('Cannot call "send" once a close message has been sent.')
+        self.sent.append(data)
+
+
+def test_websocket_turns_end_when_the_client_goes_away(monkeypatch):
+    from roleplaygent_agent import agent
+
+    closed = []
+
+    async def stream_agent(game_id, prompt):
+        try:
+            for index in range(3):
+                yield "token", {"text": f"{prompt} {index}"}
+        finally:
+            # Where the turn is cancelled and saves the game state
+            closed.append(game_id)
+
+    class WarmUp:
+        async def wait(self):
+            pass
+
+    monkeypatch.setattr(agent, "stream_agent", stream_agent)
+    monkeypatch.setattr(api, "get_warm_up", WarmUp)
+    websocket = ClosedWebSocket()
+
+    async def run() -> list[str]:
+        await api.agent_websocket_endpoint(websocket, "game")
+        # Before the event loop closes the generators left open
+        return list(closed)
+
+    assert asyncio.run(run()) == ["game"]
+    assert websocket.sent == [{"event": "token", "data": {"text": "open the door 0"}}]
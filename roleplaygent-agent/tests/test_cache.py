@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+from roleplaygent_agent.storage import FileSystemGameStore, GameCache
+from tests.conftest import make_game
+
+
+class BlockingStore(FileSystemGameStore):
+    """A store whose saves wait for `release` once `blocking` is set."""
+
+    def __init__(self, games_dir):
+        super().__init__(games_dir)
+        self.blocking = False
+        self.saving = threading.Event()
+        self.release = threading.Event()
+
+    def save(self, game_state):
+        if self.blocking:
+            self.saving.set()
+            assert self.release.wait(5)
+        super().save(game_state)
+
+
+def test_evicted_dirty_game_is_read_from_the_cache_while_flushing(tmp_path):
+    store = BlockingStore(tmp_path)
+    game = make_game(entries=1)
+    store.save(game)
+
+    async def scenario():
+        cache = GameCache(store, max_size=1, mode="write-behind")
+        game_state = await cache.aget(game.id)
+        game_state.add_history_entry("Open the gate", "The gate opens.")
+        await cache.aput(game_state)
+
+        # Another game evicts the dirty one, whose flush waits
+        store.blocking = True
+        evicting = asyncio.create_task(cache.aput(make_game()))
+        while not store.saving.is_set():
+            await asyncio.sleep(0.01)
+
+        read = await cache.aget(game.id)
+        store.release.set()
+        await evicting
+        return game_state, read
+
+    game_state, read = asyncio.run(scenario())
+    assert read is game_state
+    assert read.history_length() == 2
+    assert store.load(game.id).history_length() == 2
@@ -0,0 +1,18 @@
+import json
+
+from roleplaygent_agent.storage import FileSystemGameStore
+from tests.conftest import make_game
+
+
+def test_games_saved_before_the_catalog_are_listed(tmp_path):
+    # Game files of the first format, saved before there was a catalog
+    legacy = [make_game(entries=1) for _ in range(3)]
+    for game in legacy:
+        (tmp_path / f"{game.id}.json").write_text(json.dumps(game.model_dump(), indent=2))
+    store = FileSystemGameStore(tmp_path)
+    game = make_game(entries=1)
+    store.save(game)
+
+    listed = {summary.id for summary in store.list_games(running_only=False)}
+    assert listed == {game.id} | {legacy_game.id for legacy_game in legacy}
+    assert len(store.list_games(running_only=False)) == 4
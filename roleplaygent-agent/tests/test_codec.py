@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from roleplaygent_agent.storage import FileSystemGameStore, codec
+from roleplaygent_agent.storage.journal import snapshot_path
+from tests.conftest import make_game
+
+
+def test_snapshots_of_the_first_format_are_upgraded(tmp_path):
+    game = make_game(entries=3)
+    snapshot_path(tmp_path, game.id).write_text(json.dumps(game.model_dump(), indent=2))
+    store = FileSystemGameStore(tmp_path)
+
+    assert store.load(game.id).model_dump() == game.model_dump()
+    body, header, trusted = codec.decode(snapshot_path(tmp_path, game.id).read_bytes())
+    assert (header.format, trusted) == (codec.FORMAT_VERSION, True)
+    assert store.load(game.id).model_dump() == game.model_dump()
+
+
+def test_snapshots_failing_their_checksum_are_validated_whole(tmp_path):
+    store = FileSystemGameStore(tmp_path)
+    game = make_game(entries=3)
+    store.save(game)
+    path = snapshot_path(tmp_path, game.id)
+    path.write_bytes(path.read_bytes().replace(b'"name":"Aria"', b'"name":"Anna"'))
+
+    loaded = store.load(game.id)
+    assert loaded.player.name == "Anna"
+    assert loaded.raw_field("adventure") is None
+    assert loaded.history == game.history
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_snapshots_round_trip(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    store = FileSystemGameStore(tmp_path, compression=compression)
+    game = make_game(entries=20)
+    store.save(game)
+
+    data = snapshot_path(tmp_path, game.id).read_bytes()
+    assert json.loads(data.partition(b"\n")[0])["compression"] == compression
+    loaded = store.load(game.id)
+    assert loaded.raw_field("history") is not None
+    assert loaded.model_dump() == game.model_dump()
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from roleplaygent_agent.dice import (
+    MAX_DICE,
+    MAX_SIDES,
+    DiceTerm,
+    compile_expression,
+    game_dice,
+)
+from roleplaygent_agent.rules import STARTING_ATTRIBUTES
+from tests.conftest import make_game
+
+
+@pytest.mark.parametrize(
+    "expression, terms, constant, attributes",
+    [
+        ("d20", [DiceTerm(1, 1, 20)], 0, []),
+        ("2d6+STR", [DiceTerm(1, 2, 6)], 0, [(1, "strength")]),
+        ("d%", [DiceTerm(1, 1, 100)], 0, []),
+        ("4d6kh3", [DiceTerm(1, 4, 6, keep=3)], 0, []),
+        ("4d6k3", [DiceTerm(1, 4, 6, keep=3)], 0, []),
+        ("2d20kl1", [DiceTerm(1, 2, 20, keep=-1)], 0, []),
+        ("1d6!", [DiceTerm(1, 1, 6, explode=True)], 0, []),
+        ("d20 adv", [DiceTerm(1, 1, 20, advantage=1)], 0, []),
+        ("D20 DIS + 2", [DiceTerm(1, 1, 20, advantage=-1)], 2, []),
+        (
+            "2d8 - 1d4 + 3 - agility",
+            [DiceTerm(1, 2, 8), DiceTerm(-1, 1, 4)],
+            3,
+            [(-1, "agility")],
+        ),
+    ],
+)
+def test_valid_expressions(expression, terms, constant, attributes):
+    compiled = compile_expression(expression)
+    assert list(compiled.terms) == terms
+    assert compiled.constant == constant
+    assert list(compiled.attributes) == attributes
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "STR",
+        "3",
+        "2d",
+        "d1",
+        f"d{MAX_SIDES + 1}",
+        f"{MAX_DICE + 1}d6",
+        "0d6",
+        "4d6kh5",
+        "4d6kh0",
+        "2d6 3",
+        "2d6+LUCK",
+        "2d6*2",
+    ],
+)
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        compile_expression(expression)
+
+
+def test_rolls_stay_within_bounds():
+    rng = np.random.default_rng(0)
+    totals = compile_expression("4d6kh3+2").roll_batch(rng, 10000)
+    assert totals.min() >= 5 and totals.max() <= 20
+    assert {5, 20} <= set(totals.tolist())
+
+    for result in compile_expression("4d6kl1").rolls(rng, 200):
+        assert len(result.dice) == 1 and len(result.dropped) == 3
+        assert result.dice[0] <= min(result.dropped)
+        assert result.total == result.dice[0]
+
+    exploded = compile_expression("1d6!").roll_batch(rng, 10000)
+    assert exploded.min() >= 1 and exploded.max() > 6
+    assert not (exploded % 6 == 0).any()
+
+
+def test_attributes_are_added():
+    rng = np.random.default_rng(0)
+    result = compile_expression("1d4+STR-1").roll(rng, STARTING_ATTRIBUTES)
+    assert result.modifier == STARTING_ATTRIBUTES.strength - 1
+    assert result.total == result.dice[0] + result.modifier
+    with pytest.raises(ValueError):
+        compile_expression("1d4+STR").roll(rng)
+
+
+def test_games_with_the_same_dice_seed_roll_the_same_dice():
+    def turn(game) -> list[str]:
+        dice = game_dice(game)
+        dice.roll("2d6+STR", STARTING_ATTRIBUTES, times=3)
+        dice.randint(1, 20)
+        return list(dice.rolls)
+
+    def game(dice_seed: int):
+        game_state = make_game()
+        game_state.dice_seed = dice_seed
+        return game_state
+
+    rolls = turn(game(42))
+    assert turn(game(42)) == rolls
+    assert turn(game(43)) != rolls
+
+    # The next turn rolls other dice, the same for the same seed
+    replayed = game(42)
+    replayed.add_history_entry("Roll", "Rolled")
+    next_rolls = turn(replayed)
+    assert next_rolls != rolls
+    replayed = game(42)
+    replayed.add_history_entry("Roll again", "Rolled again")
+    assert turn(replayed) == next_rolls
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from roleplaygent_agent.storage import FileSystemGameStore
+from tests.conftest import make_game
+
+
+class BlockingStore(FileSystemGameStore):
+    """Saves only once `release` is set."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saving = threading.Event()
+        self.release = threading.Event()
+        self.released = False
+
+    def save(self, game_state):
+        self.saving.set()
+        self.released = self.release.wait(timeout=5)
+        super().save(game_state)
+
+
+def test_the_event_loop_runs_while_asave_is_blocked(tmp_path):
+    store = BlockingStore(tmp_path)
+    game = make_game(entries=1)
+
+    async def run() -> list[str]:
+        events = []
+
+        async def other():
+            await asyncio.sleep(0)
+            events.append("other ran")
+
+        saving = asyncio.create_task(store.asave(game))
+        await asyncio.to_thread(store.saving.wait, 5)
+        await asyncio.wait_for(other(), timeout=5)
+        assert not saving.done()
+        events.append("save released")
+        store.release.set()
+        await saving
+        return events
+
+    assert asyncio.run(run()) == ["other ran", "save released"]
+    assert store.released
+    assert store.load(game.id).history_length() == 1
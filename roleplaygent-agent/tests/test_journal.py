@@ -0,0 +1,56 @@
+import json
+
+from roleplaygent_agent.storage import FileSystemGameStore
+from roleplaygent_agent.storage.journal import journal_path
+from tests.conftest import make_game
+
+
+def play_turn(store: FileSystemGameStore, game_id: str, index: int) -> None:
+    game = store.load(game_id)
+    game.add_log_entry(f"The player opened door {index}")
+    game.add_history_entry(f"Open door {index}", "The door opens.")
+    game.player.health -= 1
+    store.save(game)
+
+
+def test_journals_are_replayed_up_to_a_torn_record(tmp_path):
+    store = FileSystemGameStore(tmp_path, mode="journal")
+    game = make_game(entries=2)
+    store.save(game)
+    for index in range(3):
+        play_turn(store, game.id, index)
+
+    path = journal_path(tmp_path, game.id)
+    records = path.read_text().splitlines()
+    # The player record of the last turn was only partly appended
+    assert json.loads(records[-1])["type"] == "player"
+    path.write_text("\n".join(records[:-1]) + "\n" + records[-1][:10])
+
+    loaded = store.load(game.id)
+    assert loaded.history_length() == 5
+    assert loaded.log[-1].message == "The player opened door 2"
+    assert loaded.player.health == game.player.health - 2
+    # The next save writes a fresh snapshot rather than appending to the broken journal
+    store.save(loaded)
+    assert not path.exists()
+    assert store.load(game.id).history_length() == 5
+
+
+def test_journals_are_compacted_into_the_snapshot(tmp_path):
+    store = FileSystemGameStore(tmp_path, mode="journal", compact_every=7)
+    game = make_game(entries=2)
+    store.save(game)
+    play_turn(store, game.id, 0)
+    assert journal_path(tmp_path, game.id).exists()
+
+    # Three records a turn, so the third turn reaches 7 and writes a snapshot
+    play_turn(store, game.id, 1)
+    play_turn(store, game.id, 2)
+    assert not journal_path(tmp_path, game.id).exists()
+
+    play_turn(store, game.id, 3)
+    assert store.compact() == 1
+    assert not journal_path(tmp_path, game.id).exists()
+    loaded = store.load(game.id)
+    assert loaded.history_length() == 6
+    assert loaded.player.health == game.player.health - 4
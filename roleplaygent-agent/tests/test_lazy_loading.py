@@ -0,0 +1,44 @@
+import copy
+import threading
+
+from roleplaygent_agent.storage import codec
+from roleplaygent_agent.types import GameState
+from tests.conftest import make_game
+
+
+def lazy_game(entries: int) -> tuple[GameState, GameState]:
+    game = make_game(entries)
+    data, raw_fields, lengths = codec.read_snapshot(codec.dump_snapshot(game))
+    return game, GameState.model_validate_lazy(data, raw_fields, lengths)
+
+
+def test_fields_are_parsed_once_by_concurrent_threads():
+    game, lazy = lazy_game(2000)
+    barrier = threading.Barrier(8)
+    seen, errors = [], []
+
+    def read():
+        barrier.wait()
+        try:
+            seen.append(lazy.history)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert all(history is seen[0] for history in seen)
+    assert lazy.raw_field("history") is None
+    assert lazy.model_dump() == game.model_dump()
+
+
+def test_lazy_game_states_can_be_copied():
+    game, lazy = lazy_game(3)
+    copied = copy.deepcopy(lazy)
+    copied.add_history_entry("Open the gate", "The gate opens.")
+    assert lazy.history_length() == 3
+    assert copied.history_length() == 4
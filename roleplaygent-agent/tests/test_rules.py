@@ -0,0 +1,83 @@
+import pytest
+
+from roleplaygent_agent import rules
+from roleplaygent_agent.types import Enemy
+
+
+class FixedRng:
+    """Rolls the given values one after another."""
+
+    def __init__(self, *values: int):
+        self.values = list(values)
+
+    def randint(self, a: int, b: int) -> int:
+        value = self.values.pop(0)
+        assert a <= value <= b
+        return value
+
+
+def enemy(name: str, health: int = 10, strength: int = 3, agility: int = 2) -> Enemy:
+    return Enemy(
+        name=name,
+        health=health,
+        strength=strength,
+        agility=agility,
+        intelligence=1,
+        charisma=1,
+        endurance=2,
+    )
+
+
+def test_checks_succeed_from_the_target_number():
+    character = enemy("Guard", strength=4)
+    # normal is 9: a roll of 5 plus 4 strength reaches it, 4 does not
+    result = rules.resolve_check(character, "Strength", "normal", rng=FixedRng(5))
+    assert (result.total, result.target_number, result.success, result.margin) == (9, 9, True, 0)
+    result = rules.resolve_check(character, "strength", "normal", rng=FixedRng(4))
+    assert (result.success, result.margin) == (False, -1)
+    result = rules.resolve_check(character, "strength", "very_hard", skill_bonus=5, rng=FixedRng(6))
+    assert (result.target_number, result.total, result.success) == (15, 15, True)
+    assert rules.resolve_check(character, "agility", 4, rng=FixedRng(1)).success is False
+
+
+def test_checks_reject_unknown_difficulties_and_attributes():
+    with pytest.raises(ValueError):
+        rules.resolve_check(enemy("Guard"), "strength", "impossible", rng=FixedRng(1))
+    with pytest.raises(ValueError):
+        rules.resolve_check(enemy("Guard"), "luck", "easy", rng=FixedRng(1))
+
+
+def test_initiative_ties_go_to_agility_then_to_the_order():
+    participants = [
+        enemy("Slow", agility=1),
+        enemy("First", agility=3),
+        enemy("Second", agility=3),
+        enemy("Quick", agility=4),
+    ]
+    # Totals of 7 for everyone but Quick, with 6
+    order = rules.roll_initiative(participants, rng=FixedRng(6, 4, 4, 2))
+    assert [roll.name for roll in order] == ["First", "Second", "Slow", "Quick"]
+    assert [roll.total for roll in order] == [7, 7, 7, 6]
+
+
+def test_hits_deal_the_damage_roll():
+    attacker, defender = enemy("Orc", strength=5), enemy("Goblin", health=4, agility=2)
+    # The highest roll with 5 strength misses a defense of 12, without a damage roll
+    result = rules.resolve_attack(attacker, defender, rng=FixedRng(6))
+    assert (result.total, result.defense, result.hit) == (11, 12, False)
+    assert (result.damage, defender.health) == (0, 4)
+
+    attacker.strength = 6
+    result = rules.resolve_attack(attacker, defender, rng=FixedRng(6, 3))
+    assert (result.hit, result.damage, result.defender_health, result.defeated) == (True, 3, 1, False)
+    result = rules.resolve_attack(attacker, defender, rng=FixedRng(6, 5))
+    assert (result.defender_health, result.defeated) == (0, True)
+    assert defender.health == 0
+
+
+def test_attacks_with_agility_and_against_defending_characters():
+    attacker, defender = enemy("Thief", strength=1, agility=6), enemy("Guard", agility=2)
+    result = rules.resolve_attack(attacker, defender, defending=True, rng=FixedRng(6, 2))
+    assert (result.attribute, result.total, result.defense, result.hit) == ("agility", 12, 14, False)
+    with pytest.raises(ValueError):
+        rules.resolve_attack(attacker, defender, attribute="charisma", rng=FixedRng(6))
@@ -0,0 +1,86 @@
+from roleplaygent_agent import rules
+from roleplaygent_agent.simulation import (
+    HIT_ROLL,
+    hittable_agility,
+    rebalance_encounter,
+    simulate_encounter,
+)
+from roleplaygent_agent.types import Attributes, Enemy
+
+
+def attributes(health: int = 20, strength: int = 5, agility: int = 5) -> Attributes:
+    return Attributes(
+        health=health, strength=strength, agility=agility, intelligence=5, charisma=5, endurance=5
+    )
+
+
+def enemy(name: str = "Goblin", health: int = 8, strength: int = 2, agility: int = 2) -> Enemy:
+    return Enemy(name=name, **attributes(health, strength, agility).model_dump())
+
+
+def test_hopeless_fights_are_never_won():
+    # Too agile to be hit, and hitting every time
+    stats = simulate_encounter(
+        attributes(), [enemy(health=1000, strength=20, agility=20)], fights=500, seed=1
+    )
+    assert stats.win_probability == 0
+    assert stats.hp_loss_ratio == 1
+
+
+def test_trivial_fights_are_always_won():
+    # Never hitting the player, and hit with a third of the rolls
+    stats = simulate_encounter(attributes(), [enemy(health=1, strength=0, agility=0)], fights=500, seed=1)
+    assert stats.win_probability > 0.99
+    assert stats.expected_hp_loss == 0
+
+
+def test_the_higher_initiative_acts_first():
+    # Both hit every time and kill with a single hit
+    player = attributes(health=1, strength=20, agility=20)
+    stats = simulate_encounter(player, [enemy(health=1, strength=30, agility=0)], fights=200, seed=1)
+    assert stats.win_probability == 1
+    assert stats.expected_rounds == 1
+
+    player = attributes(health=1, strength=20, agility=0)
+    stats = simulate_encounter(player, [enemy(health=1, strength=20, agility=20)], fights=200, seed=1)
+    assert stats.win_probability == 0
+
+
+def test_the_player_attacks_the_first_enemy_standing():
+    # The player acts first and kills an enemy every round, which then no
+    # longer attacks, the others hit every time
+    player = attributes(health=100, strength=20, agility=20)
+    enemies = [enemy(f"Goblin {index}", health=1, strength=30, agility=0) for index in range(3)]
+    stats = simulate_encounter(player, enemies, fights=200, seed=1)
+    assert stats.win_probability == 1
+    assert stats.expected_rounds == 3
+    # Two enemies attack in the first round, one in the second
+    assert 3 <= stats.expected_hp_loss <= 3 * rules.DAMAGE_DIE
+
+
+def test_the_same_seed_plays_the_same_fights():
+    enemies = [enemy("Goblin 1", health=20, strength=9), enemy("Goblin 2", health=20, strength=10)]
+    player = attributes(health=10, strength=8)
+    first = simulate_encounter(player, enemies, fights=3000, seed=7)
+    assert simulate_encounter(player, enemies, fights=3000, seed=7) == first
+    assert 0 < first.win_probability < 1
+
+
+def test_hittable_agility():
+    player = attributes(strength=7, agility=3)
+    agility = hittable_agility(player)
+    attack = HIT_ROLL + max(player.strength, player.agility)
+    assert attack >= rules.defense(enemy(agility=agility))
+    assert attack < rules.defense(enemy(agility=agility + 1))
+
+
+def test_rebalanced_encounters_are_won_often_enough():
+    player = attributes()
+    enemies = [enemy(f"Orc {index}", health=30, strength=8, agility=9) for index in range(2)]
+    assert simulate_encounter(player, enemies, fights=1000, seed=0).win_probability < 0.6
+
+    rebalanced, scale, stats = rebalance_encounter(player, enemies, 0.6, fights=1000)
+    assert stats.win_probability >= 0.6
+    assert scale < 1
+    assert all(orc.agility <= hittable_agility(player) for orc in rebalanced)
+    assert stats == simulate_encounter(player, rebalanced, fights=1000, seed=0)
@@ -0,0 +1,56 @@
+import asyncio
+
+from roleplaygent_agent import utils
+from roleplaygent_agent.storage import GameCache, SQLiteGameStore
+from tests.conftest import make_game
+
+
+def test_saves_of_loaded_games_do_not_write_the_adventure(tmp_path):
+    store = SQLiteGameStore(tmp_path / "games.sqlite3")
+    game = make_game(entries=2)
+    store.save(game)
+
+    loaded = store.load(game.id)
+    loaded.player.health -= 1
+    loaded.add_history_entry("Open the gate", "The gate opens.")
+    store.save(loaded)
+
+    assert loaded.raw_field("adventure") is not None
+    saved = store.load(game.id)
+    assert saved.player.health == game.player.health - 1
+    assert saved.history_length() == 3
+    assert saved.adventure == game.adventure
+    assert store.list_games()[0].title == game.adventure.title
+
+
+def test_saves_insert_games_missing_from_the_database(tmp_path):
+    store = SQLiteGameStore(tmp_path / "games.sqlite3")
+    game = make_game(entries=1)
+    store.save(game)
+    store._connect().execute("DELETE FROM games")
+    store._connect().commit()
+
+    store.save(game)
+    assert store.load(game.id).adventure == game.adventure
+
+
+def test_pages_are_read_by_the_store_after_unsaved_changes(tmp_path, monkeypatch):
+    store = SQLiteGameStore(tmp_path / "games.sqlite3")
+    cache = GameCache(store, mode="write-behind")
+    monkeypatch.setattr(utils, "get_cache", lambda: cache)
+    game = make_game(entries=5)
+    store.save(game)
+
+    async def page():
+        loaded = await cache.aget(game.id)
+        loaded.add_history_entry("Open the gate", "The gate opens.")
+        await cache.aput(loaded)
+        return await utils.aload_entries_page(game.id, "history", limit=2)
+
+    window, has_older = asyncio.run(page())
+    assert [entry.prompt for entry in window] == ["Look around (4)", "Open the gate"]
+    assert has_older
+    assert asyncio.run(utils.aload_entries_page(game.id, "history", limit=10)) == (
+        store.load_history(game.id),
+        False,
+    )
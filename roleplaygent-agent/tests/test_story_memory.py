@@ -0,0 +1,22 @@
+from roleplaygent_agent.memory import StoryMemory
+from roleplaygent_agent.types import LogEntry
+from tests.conftest import make_game
+
+
+def test_story_shows_log_entries_added_after_a_render():
+    # 8 entries over 12 scenes of one scene per chapter, the last one current
+    game = make_game(entries=8, scenes=1, history=False, spread=True)
+    memory = StoryMemory(summarizer="extractive")
+    memory.render(game)
+
+    game.add_log_entry("The player knocked on the gate")
+    # Appended to the log of the first scene, closed without a summary
+    game.log.append(LogEntry(message="The player found a key", act=0, chapter=0, scene=0))
+    story = memory.render(game)
+
+    assert "- The player knocked on the gate" in story
+    assert "The player looked around the gate (0) The player found a key" in story
+    assert [entry.message for entry in game.scene_log(0, 0, 0)] == [
+        "The player looked around the gate (0)",
+        "The player found a key",
+    ]
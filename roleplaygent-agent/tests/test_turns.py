@@ -0,0 +1,26 @@
+import asyncio
+
+from roleplaygent_agent.turns import TurnQueue
+
+
+def test_cancelled_caller_does_not_cancel_merged_prompts():
+    async def scenario():
+        queue = TurnQueue(coalesce_window=0.05)
+        runs = []
+
+        async def run(prompt):
+            runs.append(prompt)
+            await asyncio.sleep(0.01)
+            return f"answered {prompt!r}"
+
+        first = asyncio.create_task(queue.submit("game", "open the door", run))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(queue.submit("game", "look around", run))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return first, await second, runs
+
+    first, answer, runs = asyncio.run(scenario())
+    assert first.cancelled()
+    assert runs == ["open the door\nlook around"]
+    assert answer == "answered 'open the door\\nlook around'"
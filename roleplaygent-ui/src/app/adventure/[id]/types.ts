@@ -96,4 +96,17 @@ export interface GameState {
   current_scene: CurrentScene;
   log: LogEntry[];
   history: HistoryEntry[];
-} 
\ No newline at end of file
+} 
+
+export interface GameSummary {
+  id: string;
+  title: string;
+  description: string;
+  player_name: string;
+  is_running: boolean;
+  act: number;
+  chapter: number;
+  scene: number;
+  updated_at: string;
+  history_length: number;
+}
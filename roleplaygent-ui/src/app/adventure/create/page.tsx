@@ -17,6 +17,23 @@ interface CharacterForm extends Omit<Character, 'health' | 'strength' | 'agility
   class: Class;
 }
 
+interface CreateGameJob {
+  id: string;
+  status: 'queued' | 'generating_adventure' | 'opening_scene' | 'done' | 'failed';
+  game_id: string | null;
+  error: string | null;
+}
+
+const JOB_STATUS_LABELS: Record<CreateGameJob['status'], string> = {
+  queued: 'Waiting for a free game master...',
+  generating_adventure: 'Generating adventure...',
+  opening_scene: 'Opening the first scene...',
+  done: 'Done',
+  failed: 'Failed',
+};
+
+const JOB_POLL_INTERVAL = 2000;
+
 interface World {
   setting: typeof SETTINGS[number];
   matureThemes: boolean;
@@ -92,6 +109,7 @@ export default function CreateAdventure() {
   });
 
   const [isLoading, setIsLoading] = useState(false);
+  const [jobStatus, setJobStatus] = useState<CreateGameJob['status'] | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   const handleCharacterChange = (field: keyof typeof character, value: string | Race | Class) => {
@@ -123,9 +141,29 @@ export default function CreateAdventure() {
     setWorld(prev => ({ ...prev, description: generatedDescription }));
   };
 
+  // Poll the game creation job until it is done, returning the id of the game
+  const waitForJob = async (jobId: string): Promise<string> => {
+    for (;;) {
+      const response = await fetch(`${config.agentUrl}/api/jobs/${jobId}`);
+      if (!response.ok) {
+        throw new Error('Failed to create adventure');
+      }
+      const job: CreateGameJob = await response.json();
+      setJobStatus(job.status);
+      if (job.status === 'done' && job.game_id) {
+        return job.game_id;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to create adventure');
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+  };
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setIsLoading(true);
+    setJobStatus(null);
     setError(null);
 
     try {
@@ -156,8 +194,9 @@ export default function CreateAdventure() {
         throw new Error('Failed to create adventure');
       }
 
-      const data = await response.json();
-      router.push(`/adventure/${data.id}`);
+      const { job_id: jobId } = await response.json();
+      const gameId = await waitForJob(jobId);
+      router.push(`/adventure/${gameId}`);
     } catch (error) {
       console.error('Error creating adventure:', error);
       setError(error instanceof Error ? error.message : 'Failed to create adventure');
@@ -395,7 +434,7 @@ export default function CreateAdventure() {
                 disabled={isLoading}
                 className="btn-fantasy text-lg"
               >
-                {isLoading ? 'Creating...' : 'Create Adventure'}
+                {isLoading ? (jobStatus ? JOB_STATUS_LABELS[jobStatus] : 'Creating...') : 'Create Adventure'}
               </button>
             </div>
           </form>
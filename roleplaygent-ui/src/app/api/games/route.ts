@@ -1,5 +1,5 @@
 import { NextResponse } from 'next/server';
-import { GameState } from '@/app/adventure/[id]/types';
+import { GameSummary } from '@/app/adventure/[id]/types';
 
 export async function GET() {
     try {
@@ -9,33 +9,24 @@ export async function GET() {
             throw new Error('Failed to fetch games');
         }
         
-        const games: GameState[] = await response.json();
+        const games: GameSummary[] = await response.json();
         
         // Transform the games into a more API-friendly format
         const gameList = games.map(game => ({
             id: game.id,
-            title: game.adventure.title,
-            description: game.adventure.description,
+            title: game.title,
+            description: game.description,
             player: {
-                name: game.player.name,
-                description: game.player.description,
-                appearance: game.player.appearance,
-                personality: game.player.personality,
-                backstory: game.player.backstory,
-                goals: game.player.goals,
-                health: game.player.health,
-                strength: game.player.strength,
-                agility: game.player.agility,
-                intelligence: game.player.intelligence,
-                charisma: game.player.charisma,
-                endurance: game.player.endurance,
-                inventory: game.player.inventory
+                name: game.player_name
             },
+            isRunning: game.is_running,
             currentScene: {
-                act: game.current_scene.act,
-                chapter: game.current_scene.chapter,
-                scene: game.current_scene.scene
-            }
+                act: game.act,
+                chapter: game.chapter,
+                scene: game.scene
+            },
+            updatedAt: game.updated_at,
+            historyLength: game.history_length
         }));
 
         return NextResponse.json({ games: gameList });
@@ -3,12 +3,12 @@
 import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import { config } from '@/config';
-import { GameState } from '../adventure/[id]/types';
+import { GameSummary } from '../adventure/[id]/types';
 import Image from 'next/image';
 
 export default function Dashboard() {
   const router = useRouter();
-  const [games, setGames] = useState<GameState[]>([]);
+  const [games, setGames] = useState<GameSummary[]>([]);
   const [searchTerm, setSearchTerm] = useState('');
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -45,9 +45,9 @@ export default function Dashboard() {
     
     const searchLower = searchTerm.toLowerCase();
     return (
-      (game.adventure.title?.toLowerCase() || '').includes(searchLower) ||
-      (game.adventure.description?.toLowerCase() || '').includes(searchLower) ||
-      (game.player.name?.toLowerCase() || '').includes(searchLower)
+      (game.title?.toLowerCase() || '').includes(searchLower) ||
+      (game.description?.toLowerCase() || '').includes(searchLower) ||
+      (game.player_name?.toLowerCase() || '').includes(searchLower)
     );
   });
 
@@ -135,13 +135,13 @@ export default function Dashboard() {
                   onClick={() => router.push(`/adventure/${game.id}`)}
                 >
                   <h2 className="text-xl font-bold text-[#8b4513] dark:text-[#d4af37] mb-2">
-                    {game.adventure.title}
+                    {game.title}
                   </h2>
                   <p className="text-[#2c1810] dark:text-[#f4e4bc] mb-4">
-                    {game.adventure.description}
+                    {game.description}
                   </p>
                   <div className="text-sm text-[#654321] dark:text-[#d4af37]">
-                    <p>Character: {game.player.name}</p>
+                    <p>Character: {game.player_name}</p>
                     <p>Status: {game.is_running ? 'In Progress' : 'Completed'}</p>
                   </div>
                 </div>